@@ -0,0 +1,73 @@
+# benchmarks/assign_modes.py
+"""
+Сравнение режимов автоназначения: greedy (по датам) и optimal (min-cost flow).
+
+Запуск из корня репозитория:
+    python -m benchmarks.assign_modes [--employees 60] [--events 200] [--seeds 5]
+
+Для каждого seed генерирует месяц синтетического театра во временной базе
+(генератор из benchmarks.synthetic_theater), строит план обоими режимами (без записи в БД) и печатает время, число накладок
+(исполнитель + дежурный) и разброс рабочих дней по сотрудникам.
+"""
+from __future__ import annotations
+import argparse
+import statistics
+import time
+
+from benchmarks.synthetic_theater import DBI, YEAR, MONTH, populate, reset
+import services.auto_assign as aa
+
+
+def _populate(employees: int, events: int, seed: int) -> None:
+    reset(DBI)
+    populate(
+        DBI, employees=employees, spectacles=max(1, employees // 2), qualified=min(1.0, 5.5 / employees),
+        busy=0.2, tours=0.25, per_day=events / 30 / 1.25, seed=seed,
+    )
+
+
+def _score(snap: dict, plan: dict) -> tuple[int, float, int]:
+    """(накладки, stdev рабочих дней, max-min рабочих дней) по итогам плана."""
+    events = {ev["id"]: dict(ev) for ev in snap["events"]}
+    extra = []
+    for ch in plan["changes"]:
+        row = events.get(ch["id"]) if ch["id"] is not None else None
+        if row is None:
+            row = {"date": ch["date"]}
+            extra.append(row)
+        row["employee_id"], row["employee"] = ch["new_employee_id"], ch["new_employee"]
+        row["duty_employee_id"], row["duty_employee"] = ch["new_duty_employee_id"], ch["new_duty_employee"]
+    rows = list(events.values()) + extra
+    conflicts = sum(1 for r in rows if r.get("employee") == aa.CONFLICT)
+    conflicts += len({r["date"] for r in rows if r.get("duty_employee") == aa.CONFLICT})
+    days: dict[int, set[str]] = {eid: set() for eid, _, _, _ in snap["employees"]}
+    for r in rows:
+        for key in ("employee_id", "duty_employee_id"):
+            if r.get(key) is not None:
+                days[r[key]].add(r["date"])
+    load = [len(v) for v in days.values()]
+    return conflicts, statistics.pstdev(load), max(load) - min(load)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--employees", type=int, default=60)
+    ap.add_argument("--events", type=int, default=200)
+    ap.add_argument("--seeds", type=int, default=5)
+    args = ap.parse_args()
+
+    print(f"{'seed':>4} {'mode':>8} {'ms':>9} {'conflicts':>9} {'stdev':>6} {'spread':>6}")
+    for seed in range(1, args.seeds + 1):
+        _populate(args.employees, args.events, seed)
+        snap = aa.load_month_snapshot(YEAR, MONTH)
+        for mode in ("greedy", "optimal"):
+            t0 = time.perf_counter()
+            plan = aa.plan_month(snap, mode=mode)
+            ms = (time.perf_counter() - t0) * 1000
+            conflicts, stdev, spread = _score(snap, plan)
+            print(f"{seed:>4} {mode:>8} {ms:>9.1f} {conflicts:>9} {stdev:>6.2f} {spread:>6}")
+    DBI.close()
+
+
+if __name__ == "__main__":
+    main()
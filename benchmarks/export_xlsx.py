@@ -0,0 +1,107 @@
+# benchmarks/export_xlsx.py
+"""
+Бенчмарк выгрузки графика в XLSX: прежний путь (pandas.to_excel + повторное
+открытие файла для автофита) против однопроходной записи openpyxl write-only.
+
+Запуск из корня репозитория:
+    python -m benchmarks.export_xlsx [--rows 1000 --rows 10000] [--repeat 3]
+
+Для каждого размера заполняет временную базу событиями, выгружает месяц обоими
+способами и печатает среднее время и пик памяти (tracemalloc, отдельным прогоном).
+Прежний путь нужен только для сравнения: pandas в requirements.txt больше нет,
+для него поставьте отдельно (pip install pandas).
+"""
+from __future__ import annotations
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Бенчмарк чистит таблицы — только во временной базе, никогда в BOT_DB бота
+os.environ["BOT_DB"] = str(Path(tempfile.mkdtemp(prefix="pultovik_bench_")) / "bench.db")
+
+from db import DBI  # noqa: E402
+from services.excel_export import MONTH_HEADER, clear_export_cache, export_month_schedule, month_schedule_rows  # noqa: E402
+
+YEAR, MONTH = 2025, 9
+
+
+def _populate(rows: int) -> None:
+    with DBI._conn() as con:
+        con.execute("DELETE FROM events")
+    events = []
+    for i in range(rows):
+        events.append({
+            "date": f"{YEAR:04d}-{MONTH:02d}-{i % 30 + 1:02d}", "type": "Спектакль",
+            "title": f"Спектакль {i % 50}", "time": "19:00", "location": "Поварская", "city": "Москва",
+            "employee": f"Фамилия{i % 60:03d} Имя", "info": "Примечание\nвторая строка" if i % 7 == 0 else None,
+            "duty_employee": None,
+        })
+    DBI.insert_events(events)
+
+
+def _legacy_export(year: int, month: int) -> Path:
+    """Прежняя выгрузка: DataFrame → to_excel → load_workbook → автофит → save."""
+    import pandas as pd
+    from openpyxl import load_workbook
+    from openpyxl.styles import Alignment
+
+    df = pd.DataFrame(month_schedule_rows(year, month), columns=MONTH_HEADER)
+    out_path = Path(tempfile.gettempdir()) / f"legacy_{year}-{month:02d}.xlsx"
+    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="График")
+    wb = load_workbook(filename=str(out_path))
+    ws = wb["График"]
+    n_cols = ws.max_column
+    col_max = {c: 0 for c in range(1, n_cols + 1)}
+    for row_idx in range(2, ws.max_row + 1):
+        lines_in_row = 1
+        for col_idx in range(1, n_cols + 1):
+            cell = ws.cell(row=row_idx, column=col_idx)
+            lines = ("" if cell.value is None else str(cell.value)).replace("\r\n", "\n").replace("\r", "\n").split("\n")
+            col_max[col_idx] = max(col_max[col_idx], max(len(line.expandtabs(4)) for line in lines))
+            lines_in_row = max(lines_in_row, len(lines))
+            cell.alignment = Alignment(wrap_text=True, vertical="top")
+        ws.row_dimensions[row_idx].height = 15 * lines_in_row
+    for col_idx, longest in col_max.items():
+        ws.column_dimensions[ws.cell(row=1, column=col_idx).column_letter].width = max(10, min(longest + 1, 80))
+    wb.save(str(out_path))
+    return out_path
+
+
+def _measure(fn, repeat: int) -> tuple[float, float]:
+    # кэш выгрузок выключаем: меряем именно построение книги
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        clear_export_cache()
+        fn(YEAR, MONTH)
+    ms = (time.perf_counter() - t0) / repeat * 1000
+    clear_export_cache()
+    tracemalloc.start()
+    try:
+        fn(YEAR, MONTH)
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    return ms, peak
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, action="append", help="можно несколько; по умолчанию 1000 и 10000")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'rows':>6} {'method':>10} {'ms':>9} {'peak KiB':>10}")
+    for rows in args.rows or [1000, 10000]:
+        _populate(rows)
+        for name, fn in (("legacy", _legacy_export), ("write-only", export_month_schedule)):
+            ms, peak = _measure(fn, args.repeat)
+            print(f"{rows:>6} {name:>10} {ms:>9.1f} {peak:>10.1f}")
+    DBI.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# benchmarks/import_xlsx.py
+"""
+Бенчмарк разбора Excel с расписанием: прежний путь (pandas.read_excel + iterrows)
+против потокового чтения openpyxl read-only.
+
+Запуск из корня репозитория:
+    python -m benchmarks.import_xlsx [--sheets 12] [--rows 2000] [--repeat 3]
+
+Генерирует «сезонную» книгу (по листу на месяц), разбирает каждый лист обоими
+способами и печатает среднее время и пик памяти (tracemalloc, отдельным прогоном).
+Прежний путь нужен только для сравнения: pandas в requirements.txt больше нет,
+для него поставьте отдельно (pip install pandas).
+"""
+from __future__ import annotations
+import argparse
+import calendar
+import datetime
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+os.environ["BOT_DB"] = str(Path(tempfile.mkdtemp(prefix="pultovik_bench_")) / "bench.db")
+
+from openpyxl import Workbook, load_workbook  # noqa: E402
+from db import DBI  # noqa: E402
+from services.excel_import import EXPECTED_EVENT_COLUMNS, iter_sheet_events  # noqa: E402
+
+YEAR = 2025
+HEADER = ["Дата", "Тип", "Название", "Время", "Локация", "Город", "Сотрудник", "Дежурный сотрудник", "Инфо"]
+
+
+def _make_workbook(path: Path, sheets: int, rows: int, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    wb = Workbook(write_only=True)
+    for m in range(1, sheets + 1):
+        ws = wb.create_sheet(f"{m:02d}.{YEAR}")
+        ws.append(HEADER)
+        days = calendar.monthrange(YEAR, m)[1]
+        for _ in range(rows):
+            ws.append([
+                datetime.datetime(YEAR, m, rnd.randint(1, days)), "Спектакль", f"Спектакль {rnd.randint(1, 60)}",
+                "19:00", "Поварская", "Москва", None, None, rnd.choice([None, "Примечание"]),
+            ])
+    wb.save(path)
+
+
+def _legacy_sheet(path: Path, sheet: str, year: int, month: int) -> list[dict]:
+    """Прежний разбор одного листа: read_excel → map/query → iterrows + pd.isna."""
+    import re
+    import pandas as pd
+
+    df = pd.read_excel(path, sheet_name=sheet)
+    df = df.rename(columns={c: EXPECTED_EVENT_COLUMNS[str(c).strip().lower()] for c in df.columns
+                            if str(c).strip().lower() in EXPECTED_EVENT_COLUMNS})
+    max_day = calendar.monthrange(year, month)[1]
+
+    def _to_day(v):
+        if pd.isna(v):
+            return None
+        if hasattr(v, 'day'):
+            d = int(v.day)
+        elif isinstance(v, (int, float)):
+            d = int(v)
+        else:
+            m = re.search(r"\d+", str(v))
+            if not m:
+                return None
+            d = int(m.group(0))
+        return d if 1 <= d <= max_day else None
+
+    df = df.assign(_day=df['date'].map(_to_day)).query("_day.notna()")
+    df['date'] = df['_day'].astype(int).map(lambda d: f"{year:04d}-{month:02d}-{d:02d}")
+    out = []
+    for _, r in df.iterrows():
+        ev = {'date': r['date']}
+        for k in ('type', 'title', 'time', 'location', 'city', 'employee', 'duty_employee', 'info'):
+            ev[k] = None if pd.isna(r[k]) else str(r[k])
+        out.append(ev)
+    return out
+
+
+def _legacy(path: Path) -> int:
+    import pandas as pd
+    names = pd.ExcelFile(path).sheet_names
+    return sum(len(_legacy_sheet(path, name, YEAR, i)) for i, name in enumerate(names, start=1))
+
+
+def _streaming(path: Path) -> int:
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        return sum(sum(1 for _ in iter_sheet_events(ws, YEAR, i)) for i, ws in enumerate(wb.worksheets, start=1))
+    finally:
+        wb.close()
+
+
+def _measure(fn, path: Path, repeat: int) -> tuple[float, float, int]:
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        n = fn(path)
+    ms = (time.perf_counter() - t0) / repeat * 1000
+    tracemalloc.start()
+    try:
+        fn(path)
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+    return ms, peak, n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sheets", type=int, default=12)
+    ap.add_argument("--rows", type=int, default=2000, help="строк на лист")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "season.xlsx"
+        _make_workbook(path, args.sheets, args.rows)
+        print(f"{args.sheets} sheets × {args.rows} rows, {path.stat().st_size // 1024} KiB\n")
+        print(f"{'method':>10} {'ms':>9} {'peak KiB':>10} {'events':>7}")
+        for name, fn in (("pandas", _legacy), ("streaming", _streaming)):
+            ms, peak, n = _measure(fn, path, args.repeat)
+            print(f"{name:>10} {ms:>9.1f} {peak:>10.1f} {n:>7}")
+    DBI.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/month_queries.py
+"""
+Бенчмарк помесячных запросов: план выполнения и время без индексов и с индексами миграций.
+
+Запуск из корня репозитория:
+    python -m benchmarks.month_queries [--years 5] [--employees 60] [--repeat 200]
+
+Создаёт временную базу с несколькими годами истории, затем прогоняет горячие
+запросы дважды: без индексов idx_* (как до миграций) и с ними, и печатает
+EXPLAIN QUERY PLAN + среднее время на запрос.
+"""
+from __future__ import annotations
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+# импорт db применяет миграции — только во временной базе, никогда в BOT_DB бота (в т.ч. из .env)
+os.environ["BOT_DB"] = str(Path(tempfile.mkdtemp(prefix="pultovik_bench_")) / "bench.db")
+
+from db import DB  # noqa: E402
+from migrations import MIGRATIONS  # noqa: E402
+
+def _populate(db: DB, years: int, employees: int, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    for i in range(employees):
+        db.upsert_employee(f"Фамилия{i:03d}", f"Имя{i:03d}", str(100000 + i))
+    displays = db.list_employees()
+    ids = [eid for eid, _ in db.list_employees_full()]
+    events = []
+    busy = []
+    for y in range(2025 - years + 1, 2026):
+        for m in range(1, 13):
+            for d in range(1, 29):
+                date_str = f"{y:04d}-{m:02d}-{d:02d}"
+                for _ in range(rnd.randint(1, 4)):
+                    events.append({
+                        "date": date_str, "type": "Спектакль", "title": f"Спектакль {rnd.randint(1, 40)}",
+                        "time": "19:00", "location": "Поварская", "city": "Москва",
+                        "employee": rnd.choice(displays), "info": None,
+                        "duty_employee": rnd.choice(displays),
+                    })
+                for eid in rnd.sample(ids, k=max(1, employees // 10)):
+                    busy.append((eid, date_str))
+    db.insert_events(events)
+    with db._conn() as con:
+        con.executemany("INSERT OR IGNORE INTO employee_busy(employee_id, date_str) VALUES(?,?)", busy)
+        con.commit()
+
+
+def _queries(employee_id: int) -> list[tuple[str, str, tuple]]:
+    first, last = DB.month_range(2025, 9)
+    return [
+        ("events of month", "SELECT id, date, type, title, city, employee FROM events WHERE date BETWEEN ? AND ?", (first, last)),
+        ("assigned count", "SELECT COUNT(*) FROM events WHERE employee_id=? AND date BETWEEN ? AND ?", (employee_id, first, last)),
+        ("duty count", "SELECT COUNT(*) FROM events WHERE duty_employee_id=? AND date BETWEEN ? AND ?", (employee_id, first, last)),
+        ("busy of month", "SELECT employee_id, date_str FROM employee_busy WHERE date_str BETWEEN ? AND ?", (first, last)),
+        ("employee by tg", "SELECT id, display FROM employees WHERE tg_id=?", ("100007",)),
+    ]
+
+
+def _run(con: sqlite3.Connection, repeat: int, employee_id: int) -> list[tuple[str, str, float]]:
+    out = []
+    for name, sql, params in _queries(employee_id):
+        plan = "; ".join(r[3] for r in con.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall())
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            con.execute(sql, params).fetchall()
+        out.append((name, plan, (time.perf_counter() - t0) / repeat * 1000))
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--employees", type=int, default=60)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "bench.db")
+        db = DB(path)
+        _populate(db, args.years, args.employees)
+        employee_id = db.list_employees_full()[7][0]
+        total = db._read_conn().execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        print(f"events: {total}, years: {args.years}, employees: {args.employees}\n")
+
+        with db._conn() as wcon:
+            names = [r[0] for r in wcon.execute("SELECT name FROM sqlite_master WHERE type='index' AND name LIKE 'idx\\_%' ESCAPE '\\'")]
+            for idx in names:
+                wcon.execute(f"DROP INDEX IF EXISTS {idx}")
+        db.close()  # свежие соединения — без закэшированной схемы и планов
+        before = _run(db._read_conn(), args.repeat, employee_id)
+
+        with db._conn() as wcon:
+            for _, _, step in MIGRATIONS:
+                step(wcon)
+        db.close()
+        after = _run(db._read_conn(), args.repeat, employee_id)
+        db.close()
+
+    for (name, plan_b, ms_b), (_, plan_a, ms_a) in zip(before, after):
+        print(f"{name}:")
+        print(f"  before: {ms_b:8.3f} ms  {plan_b}")
+        print(f"  after:  {ms_a:8.3f} ms  {plan_a}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# benchmarks/pdf_extract.py
+"""
+Время разбора PDF-репертуара: локально (pdfminer) против GPT.
+
+Запуск из корня репозитория:
+    python -m benchmarks.pdf_extract                      # синтетические PDF
+    python -m benchmarks.pdf_extract afisha.pdf ...       # свои файлы
+    python -m benchmarks.pdf_extract afisha.pdf --llm     # плюс GPT (нужен OPENAI_API_KEY, платно)
+
+Без файлов генерирует несколько PDF с таблицей «число | спектакль | площадка |
+время» (месяц с 1–3 событиями в день, «/» в названиях, шапка и подписи) и
+печатает время локального разбора, уверенность и число событий. С --llm тот же
+файл дополнительно прогоняется через build_excel_from_file с выключенным
+локальным разбором.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import calendar
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+# импорт db применяет миграции — только во временной базе, никогда в BOT_DB бота (в т.ч. из .env)
+os.environ["BOT_DB"] = str(Path(tempfile.mkdtemp(prefix="pultovik_bench_")) / "bench.db")
+os.environ.setdefault("OPENAI_API_KEY", "x")
+
+from pdfminer.glyphlist import glyphname2unicode  # noqa: E402
+from services.pdf_extract import extract_schedule_pdf  # noqa: E402
+
+_TITLES = ["Гамлет", "Чайка", "Вишнёвый сад", "Ревизор", "Горе от ума", "12", "Репетиция «Чайка»", "Монтаж «Гамлет»"]
+_PLACES = ["ПОВАРСКАЯ", "ПОВАРСКАЯ", "ПОВАРСКАЯ", "Липецк", "Пятигорск"]
+_WEEKDAYS = ["пн", "вт", "ср", "чт", "пт", "сб", "вс"]
+_MONTHS = ["ЯНВАРЬ", "ФЕВРАЛЬ", "МАРТ", "АПРЕЛЬ", "МАЙ", "ИЮНЬ", "ИЮЛЬ", "АВГУСТ", "СЕНТЯБРЬ", "ОКТЯБРЬ", "НОЯБРЬ", "ДЕКАБРЬ"]
+
+
+class _PdfWriter:
+    """Минимальный PDF: Type1-шрифт с явными /Widths с перекодировкой кириллицы в байты 128..255 через /Differences."""
+
+    def __init__(self):
+        by_char = {v: k for k, v in glyphname2unicode.items()}
+        chars = [chr(c) for c in range(0x410, 0x450)] + ["Ё", "ё", "«", "»", "№", "—"]
+        self.code = {ch: 128 + i for i, ch in enumerate(chars)}
+        self.names = [by_char[ch] for ch in chars]
+        self.pages: list[list[str]] = []
+
+    def page(self) -> None:
+        self.pages.append([])
+
+    def text(self, x: float, y: float, s: str, size: int = 10) -> None:
+        raw = "".join(f"\\{self.code[ch]:03o}" if ch in self.code else ch.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for ch in s)
+        self.pages[-1].append(f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({raw}) Tj ET")
+
+    def save(self, path: Path) -> None:
+        objs = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+                "<< /Type /Font /Subtype /Type1 /BaseFont /PTSans-Regular /FirstChar 32 /LastChar 255 /FontDescriptor 4 0 R "
+                f"/Widths [{' '.join(['556'] * 224)}] "
+                f"/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding /Differences [128 {' '.join('/' + n for n in self.names)}] >> >>",
+                "<< /Type /FontDescriptor /FontName /PTSans-Regular /Flags 32 /FontBBox [-100 -250 1000 900] "
+                "/ItalicAngle 0 /Ascent 900 /Descent -250 /CapHeight 700 /StemV 80 >>"]
+        kids = []
+        for ops in self.pages:
+            stream = "\n".join(ops).encode("latin-1")
+            objs.append(f"<< /Length {len(stream)} >>\nstream\n".encode("latin-1") + stream + b"\nendstream")
+            objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs)} 0 R >>")
+            kids.append(len(objs))
+        objs[1] = f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] /Count {len(kids)} >>"
+        out = bytearray(b"%PDF-1.4\n")
+        offsets = []
+        for i, obj in enumerate(objs, start=1):
+            offsets.append(len(out))
+            body = obj if isinstance(obj, bytes) else obj.encode("latin-1")
+            out += f"{i} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+        out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+        out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        path.write_bytes(bytes(out))
+
+
+def make_sample_pdf(path: Path, year: int, month: int, seed: int = 1) -> int:
+    """Синтетический репертуар месяца. Возвращает число событий (после разбиения по «/»)."""
+    rnd = random.Random(seed)
+    pdf = _PdfWriter()
+    pdf.page()
+    y = 800
+    pdf.text(200, y, "УТВЕРЖДАЮ", 12)
+    y -= 24
+    pdf.text(160, y, f"РЕПЕРТУАР НА {_MONTHS[month-1]} {year}", 14)
+    y -= 30
+    for x, h in ((40, "Число"), (110, "Спектакль"), (360, "Место"), (480, "Время")):
+        pdf.text(x, y, h)
+    total = 0
+    for day in range(1, calendar.monthrange(year, month)[1] + 1):
+        wd = _WEEKDAYS[calendar.weekday(year, month, day)]
+        for k in range(rnd.choice([1, 1, 1, 2, 3])):
+            y -= 18
+            if y < 60:
+                pdf.page()
+                y = 800
+            if k == 0:
+                pdf.text(40, y, f"{day} {wd}")
+            if rnd.random() < 0.1:
+                title = " / ".join(rnd.sample(_TITLES[:5], 2))
+                total += 2
+            else:
+                title = rnd.choice(_TITLES)
+                total += 1
+            pdf.text(110, y, title)
+            pdf.text(360, y, rnd.choice(_PLACES))
+            pdf.text(480, y, rnd.choice(["12:00", "15:00", "19:00"]))
+    y -= 40
+    pdf.text(300, max(y, 30), "Заведующий труппой Иванов И. И.")
+    pdf.save(path)
+    return total
+
+
+def _llm(path: Path) -> float:
+    import services.ai_fill as ai
+    orig = ai.PDF_MIN_CONFIDENCE
+    ai.PDF_MIN_CONFIDENCE = 2.0  # локальный разбор не пройдёт порог — только GPT
+    try:
+        t0 = time.perf_counter()
+        asyncio.run(ai.build_excel_from_file(path))
+        return (time.perf_counter() - t0) * 1000
+    finally:
+        ai.PDF_MIN_CONFIDENCE = orig
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("pdf", nargs="*", type=Path)
+    ap.add_argument("--samples", type=int, default=3, help="сколько синтетических PDF, если файлы не заданы")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--llm", action="store_true", help="также замерить GPT (сеть, платно)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files: list[tuple[Path, int | None]] = [(p, None) for p in args.pdf]
+        if not files:
+            for i in range(args.samples):
+                p = Path(tmp) / f"sample_{i + 1}.pdf"
+                files.append((p, make_sample_pdf(p, 2025, 9 + i % 4, seed=i + 1)))
+        print(f"{'file':>14} {'expected':>8} {'events':>6} {'confidence':>10} {'local ms':>9} {'gpt ms':>9}")
+        for path, expected in files:
+            t0 = time.perf_counter()
+            for _ in range(args.repeat):
+                rows, confidence = extract_schedule_pdf(path)
+            ms = (time.perf_counter() - t0) / args.repeat * 1000
+            gpt = f"{_llm(path):9.0f}" if args.llm else f"{'—':>9}"
+            print(f"{path.name[-14:]:>14} {expected if expected is not None else '—':>8} {len(rows):>6} {confidence:>10.2f} {ms:>9.1f} {gpt}")
+
+
+if __name__ == "__main__":
+    main()
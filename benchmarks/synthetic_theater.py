@@ -0,0 +1,211 @@
+# benchmarks/synthetic_theater.py
+"""
+Бенчмарк планировщика на синтетических театрах разного размера.
+
+Запуск из корня репозитория:
+    python -m benchmarks.synthetic_theater                        # все профили
+    python -m benchmarks.synthetic_theater --profile large --mode optimal
+    python -m benchmarks.synthetic_theater --write-baseline benchmarks/baseline.json
+    python -m benchmarks.synthetic_theater --baseline benchmarks/baseline.json
+
+Для каждого профиля генерирует месяц (seed фиксирован) во временной SQLite-базе,
+прогоняет auto_assign_events_for_month и отдельно assign_duty_for_month и печатает
+время, число SQL-запросов, пик памяти (tracemalloc), число накладок и разброс
+нагрузки (рабочие дни: исполнитель или дежурный). С --baseline сравнивает с
+сохранённым JSON и завершается с кодом 1 при регрессии.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Бенчмарк чистит таблицы — только во временной базе, никогда в BOT_DB бота
+os.environ["BOT_DB"] = str(Path(tempfile.mkdtemp(prefix="pultovik_bench_")) / "bench.db")
+
+from db import DB, DBI  # noqa: E402
+import services.auto_assign as aa  # noqa: E402
+
+YEAR, MONTH = 2025, 9
+
+# employees, spectacles, qualified (доля сотрудников на спектакль), busy (доля дней),
+# tours (доля выездных событий), per_day (событий в день, в среднем)
+PROFILES = {
+    "small":  dict(employees=10,  spectacles=8,  qualified=0.4,  busy=0.2,  tours=0.1,  per_day=1.5),
+    "medium": dict(employees=30,  spectacles=25, qualified=0.2,  busy=0.25, tours=0.15, per_day=4.0),
+    "large":  dict(employees=60,  spectacles=50, qualified=0.12, busy=0.3,  tours=0.2,  per_day=7.0),
+    "tight":  dict(employees=20,  spectacles=20, qualified=0.15, busy=0.4,  tours=0.1,  per_day=5.0),
+}
+
+# Допуски при сравнении с baseline: время/память — во сколько раз можно вырасти,
+# остальные метрики детерминированы при фиксированном seed и сравниваются «не хуже».
+TIME_FACTOR = 1.5
+TIME_SLACK_MS = 25.0   # шум таймера на коротких прогонах
+MEMORY_FACTOR = 1.5
+
+
+def reset(db: DB) -> None:
+    with db._conn() as con:
+        for table in ("events", "employee_busy", "spectacle_employees", "spectacles", "employees"):
+            con.execute(f"DELETE FROM {table}")
+
+
+def populate(db: DB, *, employees: int, spectacles: int, qualified: float, busy: float,
+             tours: float, per_day: float, seed: int = 1, year: int = YEAR, month: int = MONTH) -> int:
+    """Заполняет базу синтетическим театром на месяц. Возвращает число событий."""
+    import calendar
+    rnd = random.Random(seed)
+    for i in range(employees):
+        db.upsert_employee(f"Фамилия{i:03d}", f"Имя{i:03d}")
+    displays = db.list_employees()
+    titles = [f"Спектакль {j}" for j in range(spectacles)]
+    k = max(1, round(employees * qualified))
+    for t in titles:
+        db.set_spectacle_employees(t, rnd.sample(displays, k=min(k, len(displays))))
+    days = calendar.monthrange(year, month)[1]
+    for eid, _ in db.list_employees_full():
+        n = min(days, round(days * busy * rnd.uniform(0.5, 1.5)))
+        db.add_busy_dates(eid, [f"{year:04d}-{month:02d}-{d:02d}" for d in rnd.sample(range(1, days + 1), k=n)])
+    rows = []
+    for d in range(1, days + 1):
+        for _ in range(max(0, round(rnd.gauss(per_day, per_day / 3)))):
+            title = rnd.choice(titles)
+            tour = rnd.random() < tours
+            for show in range(rnd.choice([1, 1, 1, 2])):
+                rows.append({
+                    "date": f"{year:04d}-{month:02d}-{d:02d}",
+                    "type": rnd.choice(["Спектакль", "Спектакль", "Спектакль", "Репетиция", "Монтаж"]),
+                    "title": title, "time": f"{12 + 7 * show}:00", "location": "Поварская",
+                    "city": "Липецк" if tour else "Москва",
+                    "employee": None, "info": None, "duty_employee": None,
+                })
+    db.insert_events(rows)
+    return len(rows)
+
+
+def score(db: DB, year: int = YEAR, month: int = MONTH) -> dict:
+    """Накладки и разброс нагрузки по текущему содержимому месяца."""
+    con = db._read_conn()
+    first, last = db.month_range(year, month)
+    conflicts = con.execute(
+        "SELECT COUNT(*) FROM events WHERE employee=? AND date BETWEEN ? AND ?", (aa.CONFLICT, first, last)
+    ).fetchone()[0]
+    conflicts += con.execute(
+        "SELECT COUNT(DISTINCT date) FROM events WHERE duty_employee=? AND date BETWEEN ? AND ?", (aa.CONFLICT, first, last)
+    ).fetchone()[0]
+    days = {eid: 0 for eid, _ in db.list_employees_full()}
+    for eid, n in con.execute(
+        """
+        SELECT eid, COUNT(DISTINCT date) FROM (
+            SELECT employee_id AS eid, date FROM events WHERE employee_id IS NOT NULL AND date BETWEEN ?1 AND ?2
+            UNION ALL
+            SELECT duty_employee_id, date FROM events WHERE duty_employee_id IS NOT NULL AND date BETWEEN ?1 AND ?2
+        ) GROUP BY eid
+        """,
+        (first, last),
+    ):
+        days[eid] = n
+    load = list(days.values()) or [0]
+    return {"conflicts": conflicts, "load_stdev": round(statistics.pstdev(load), 3), "load_spread": max(load) - min(load)}
+
+
+def _timed(fn, *args, **kwargs) -> dict:
+    statements = [0]
+    DBI.pool.set_trace(lambda _sql: statements.__setitem__(0, statements[0] + 1))
+    t0 = time.perf_counter()
+    try:
+        fn(*args, **kwargs)
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        DBI.pool.set_trace(None)
+    return {"ms": round(ms, 2), "sql": statements[0]}
+
+
+def _peak_kib(fn, *args, **kwargs) -> float:
+    tracemalloc.start()
+    try:
+        fn(*args, **kwargs)
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run_profile(name: str, mode: str, seed: int = 1) -> dict:
+    aa.set_notify_loop(None)
+    # время и SQL — отдельным прогоном: tracemalloc сам по себе замедляет Python в разы
+    reset(DBI)
+    events = populate(DBI, seed=seed, **PROFILES[name])
+    assign = _timed(aa.auto_assign_events_for_month, YEAR, MONTH, mode=mode)
+    result = {"profile": name, "mode": mode, "events": events, **score(DBI)}
+    duty = _timed(aa.assign_duty_for_month, YEAR, MONTH, mode=mode)
+    reset(DBI)
+    populate(DBI, seed=seed, **PROFILES[name])
+    assign["peak_kib"] = _peak_kib(aa.auto_assign_events_for_month, YEAR, MONTH, mode=mode)
+    duty["peak_kib"] = _peak_kib(aa.assign_duty_for_month, YEAR, MONTH, mode=mode)
+    result.update(assign=assign, duty=duty)
+    return result
+
+
+def compare(results: list[dict], baseline: list[dict]) -> list[str]:
+    """Список регрессий относительно baseline (пустой — всё в порядке)."""
+    base = {(r["profile"], r["mode"]): r for r in baseline}
+    problems = []
+    for r in results:
+        b = base.get((r["profile"], r["mode"]))
+        if b is None:
+            continue
+        tag = f"{r['profile']}/{r['mode']}"
+        for phase in ("assign", "duty"):
+            if r[phase]["ms"] > b[phase]["ms"] * TIME_FACTOR + TIME_SLACK_MS:
+                problems.append(f"{tag}: {phase} time {r[phase]['ms']} ms > {b[phase]['ms']} ms × {TIME_FACTOR} + {TIME_SLACK_MS}")
+            if r[phase]["peak_kib"] > b[phase]["peak_kib"] * MEMORY_FACTOR:
+                problems.append(f"{tag}: {phase} memory {r[phase]['peak_kib']} KiB > {b[phase]['peak_kib']} KiB × {MEMORY_FACTOR}")
+            if r[phase]["sql"] > b[phase]["sql"]:
+                problems.append(f"{tag}: {phase} SQL statements {r[phase]['sql']} > {b[phase]['sql']}")
+        for key in ("conflicts", "load_spread"):
+            if r[key] > b[key]:
+                problems.append(f"{tag}: {key} {r[key]} > {b[key]}")
+    return problems
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--profile", choices=sorted(PROFILES), action="append", help="можно несколько; по умолчанию все")
+    ap.add_argument("--mode", choices=["greedy", "optimal"], action="append", help="по умолчанию greedy")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--baseline", type=Path, help="сравнить с сохранённым JSON")
+    ap.add_argument("--write-baseline", type=Path, help="сохранить результаты как baseline")
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'profile':>8} {'mode':>8} {'events':>6} {'assign ms':>10} {'sql':>6} {'peak KiB':>9} {'duty ms':>8} {'conflicts':>9} {'stdev':>6} {'spread':>6}")
+    for name in args.profile or list(PROFILES):
+        for mode in args.mode or ["greedy"]:
+            r = run_profile(name, mode, seed=args.seed)
+            results.append(r)
+            a = r["assign"]
+            print(f"{name:>8} {mode:>8} {r['events']:>6} {a['ms']:>10.1f} {a['sql']:>6} {a['peak_kib']:>9.1f} "
+                  f"{r['duty']['ms']:>8.1f} {r['conflicts']:>9} {r['load_stdev']:>6.2f} {r['load_spread']:>6}")
+    DBI.close()
+
+    if args.write_baseline:
+        args.write_baseline.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"\nbaseline written: {args.write_baseline}")
+    if args.baseline:
+        problems = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")))
+        if problems:
+            print("\nREGRESSIONS:")
+            for p in problems:
+                print("  " + p)
+            sys.exit(1)
+        print("\nno regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
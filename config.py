@@ -22,6 +22,8 @@ if load_dotenv:
 OPENAI_API_KEY: str = (os.getenv("OPENAI_API_KEY") or "").strip()
 GPT_MODEL: str = (os.getenv("GPT_MODEL") or "gpt-4o-mini").strip()
 ENABLE_AI_FILL: bool = (os.getenv("ENABLE_AI_FILL", "1").strip().lower() not in {"0", "false", "no"})
+# PDF сначала разбирается локально (pdfminer); ниже этой уверенности файл уходит в GPT
+PDF_MIN_CONFIDENCE: float = float(os.getenv("PDF_MIN_CONFIDENCE") or 0.8)
 
 # --- Playbill scraping
 # You can override via .env: PLAYBILL_URL_TEMPLATE="https://mikhalkov12.ru/playbill/?month={m}&year={y}"
@@ -51,6 +53,30 @@ if _aid.isdigit():
 
 DB_PATH = str(os.getenv("BOT_DB") or (ROOT_DIR / "bot.db"))
 
+# --- auto-assign
+# "greedy" — по датам, кто меньше всех занят; "optimal" — min-cost flow по всему месяцу
+ASSIGN_MODE: str = (os.getenv("ASSIGN_MODE") or "greedy").strip().lower()
+
+# --- exports
+# XLSX собирается в памяти; файлы больше порога уходят во временный файл на время отправки
+EXPORT_SPILL_BYTES: int = int(os.getenv("EXPORT_SPILL_BYTES") or 8 * 1024 * 1024)
+# готовые книги кэшируются по отпечатку строк (LRU по суммарному размеру)
+EXPORT_CACHE_BYTES: int = int(os.getenv("EXPORT_CACHE_BYTES") or 32 * 1024 * 1024)
+# сколько дней повторно отправлять уже загруженный файл по его Telegram file_id
+SENT_DOCUMENT_TTL_DAYS: int = int(os.getenv("SENT_DOCUMENT_TTL_DAYS") or 30)
+
+# --- schedule view
+# «Посмотреть расписание» читает локальную копию опубликованного листа; старше TTL — перечитывается из Sheets
+SCHEDULE_REPLICA_TTL_MINUTES: int = int(os.getenv("SCHEDULE_REPLICA_TTL_MINUTES") or 30)
+
+# --- Google Sheets publishing
+# Квота Sheets API по умолчанию — 60 запросов в минуту на пользователя; все вызовы идут через одно ведро токенов
+SHEETS_REQUESTS_PER_MINUTE: int = int(os.getenv("SHEETS_REQUESTS_PER_MINUTE") or 60)
+# Публикации идут фоновой очередью; 429/5xx и сетевые сбои повторяются с экспоненциальной паузой
+PUBLISH_MAX_ATTEMPTS: int = int(os.getenv("PUBLISH_MAX_ATTEMPTS") or 6)
+PUBLISH_BACKOFF_BASE_SECONDS: float = float(os.getenv("PUBLISH_BACKOFF_BASE_SECONDS") or 5)
+PUBLISH_BACKOFF_MAX_SECONDS: float = float(os.getenv("PUBLISH_BACKOFF_MAX_SECONDS") or 300)
+
 # --- locale
 RU_MONTHS = [
     "Январь","Февраль","Март","Апрель","Май","Июнь",
@@ -1,16 +1,136 @@
 # db.py
+import asyncio
+import calendar
+import functools
+import json
 import sqlite3
-from datetime import datetime, UTC
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
 from typing import List
 from config import DB_PATH
+from migrations import add_column_if_missing, apply_migrations
+
+# PRAGMA'ы, которые применяются к каждому соединению пула
+_CONN_PRAGMAS = (
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",      # ~16 MiB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MiB memory-mapped I/O
+)
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections, one writer and one reader per thread.
+
+    Connections are opened lazily and reused for the lifetime of the process,
+    so callers keep using ``with pool.writer() as con:`` exactly like a fresh
+    ``sqlite3.connect`` (the context manager commits / rolls back, it does not
+    close). The database runs in WAL mode, so readers never block the writer.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._roles = threading.local()  # не сбрасывается в close()
+        self._lock = threading.Lock()
+        self._all: list[sqlite3.Connection] = []
+        self._trace = None
+        with self._lock:
+            con = sqlite3.connect(self.path)
+            try:
+                con.execute("PRAGMA journal_mode=WAL")
+            finally:
+                con.close()
+
+    def _open(self, readonly: bool) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=5.0)
+        for pragma in _CONN_PRAGMAS:
+            con.execute(pragma)
+        if readonly:
+            con.execute("PRAGMA query_only=ON")
+        with self._lock:
+            self._all.append(con)
+            if self._trace is not None:
+                con.set_trace_callback(self._trace)
+        return con
+
+    def set_trace(self, callback) -> None:
+        """Вешает ``callback(sql)`` на все соединения пула, текущие и будущие (None — снять).
+        Нужен бенчмаркам для подсчёта SQL-запросов."""
+        with self._lock:
+            self._trace = callback
+            for con in self._all:
+                con.set_trace_callback(callback)
+
+    def forbid_writes_in_thread(self) -> None:
+        """Marks the current thread as read-only: ``writer()`` will raise in it.
+
+        Used as the initializer of AsyncDB reader threads, so a write that was
+        routed to the reader pool by mistake fails loudly instead of opening a
+        second writer connection next to the ``db-write`` thread.
+        """
+        self._roles.read_only = True
+
+    def writer(self) -> sqlite3.Connection:
+        if getattr(self._roles, "read_only", False):
+            raise RuntimeError(f"write connection requested from read-only thread {threading.current_thread().name}")
+        con = getattr(self._local, "writer", None)
+        if con is None:
+            con = self._local.writer = self._open(readonly=False)
+        return con
+
+    def reader(self) -> sqlite3.Connection:
+        con = getattr(self._local, "reader", None)
+        if con is None:
+            con = self._local.reader = self._open(readonly=True)
+        return con
+
+    def close(self) -> None:
+        with self._lock:
+            conns, self._all = self._all, []
+        for con in conns:
+            try:
+                con.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
 
 class DB:
+    # employee_id / duty_employee_id резолвятся по display прямо в INSERT
+    INSERT_EVENT_SQL = """
+        INSERT INTO events(date, type, title, time, location, city, employee, info, duty_employee,
+                           employee_id, duty_employee_id)
+        VALUES(:date, :type, :title, :time, :location, :city, :employee, :info, :duty_employee,
+               (SELECT id FROM employees WHERE display=:employee),
+               (SELECT id FROM employees WHERE display=:duty_employee))
+    """
+
     def __init__(self, path: str):
         self.path = path
+        self.pool = ConnectionPool(path)
         self._ensure()
 
     def _conn(self):
-        return sqlite3.connect(self.path)
+        """Writer connection of the current thread (reused, not closed by ``with``)."""
+        return self.pool.writer()
+
+    def _read_conn(self):
+        """Read-only connection of the current thread."""
+        return self.pool.reader()
+
+    def close(self) -> None:
+        self.pool.close()
+
+    @staticmethod
+    def month_range(year: int, month: int) -> tuple[str, str]:
+        """Границы месяца для ``date BETWEEN ? AND ?`` по ISO-датам 'YYYY-MM-DD' (включительно)."""
+        last = calendar.monthrange(year, month)[1]
+        return f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-{last:02d}"
 
     def _ensure(self):
         with self._conn() as con:
@@ -79,11 +199,8 @@ class DB:
                     info TEXT
                 )
             """)
-            # MIGRATION: Add duty_employee column if not exists
-            cur.execute("PRAGMA table_info(events)")
-            columns = [row[1] for row in cur.fetchall()]
-            if "duty_employee" not in columns:
-                cur.execute("ALTER TABLE events ADD COLUMN duty_employee TEXT")
+            # duty_employee появился до версионных миграций — досоздаём в старых базах
+            add_column_if_missing(con, "events", "duty_employee", "TEXT")
             cur.execute(
                 """
                 CREATE TABLE IF NOT EXISTS pending_auth (
@@ -96,6 +213,7 @@ class DB:
                 """
             )
             con.commit()
+            apply_migrations(con)
 
     # --- windows / broadcast
     def ensure_window(self, year: int, month: int):
@@ -107,7 +225,7 @@ class DB:
             con.commit()
 
     def get_window(self, year: int, month: int):
-        with self._conn() as con:
+        with self._read_conn() as con:
             return con.execute(
                 "SELECT year, month, opened_at, broadcast_sent FROM busy_window WHERE year=? AND month=?",
                 (year, month),
@@ -119,7 +237,7 @@ class DB:
             con.commit()
 
     def list_employees_with_tg(self) -> list[tuple[int, str, int]]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             rows = con.execute("SELECT id, display, tg_id FROM employees WHERE tg_id IS NOT NULL AND LENGTH(tg_id)>0").fetchall()
             out = []
             for i, d, tg in rows:
@@ -131,11 +249,11 @@ class DB:
 
     # --- spectacles / employees
     def list_spectacles(self) -> List[str]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             return [r[0] for r in con.execute("SELECT title FROM spectacles ORDER BY title").fetchall()]
 
     def list_spectacles_with_ids(self) -> list[tuple[int, str]]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             rows = con.execute("SELECT id, title FROM spectacles ORDER BY title").fetchall()
             return [(r[0], r[1]) for r in rows]
 
@@ -145,23 +263,66 @@ class DB:
             con.commit()
 
     def get_spectacle_id(self, title: str):
-        with self._conn() as con:
+        with self._read_conn() as con:
             row = con.execute("SELECT id FROM spectacles WHERE title=?", (title,)).fetchone()
             return row[0] if row else None
 
-    def list_employees(self) -> List[str]:
+    def get_spectacle_title(self, spectacle_id: int) -> str | None:
+        with self._read_conn() as con:
+            row = con.execute("SELECT title FROM spectacles WHERE id=?", (spectacle_id,)).fetchone()
+            return row[0] if row else None
+
+    def rename_spectacle(self, spectacle_id: int, title: str) -> None:
         with self._conn() as con:
+            con.execute("UPDATE spectacles SET title=? WHERE id=?", (title, spectacle_id))
+            con.commit()
+
+    def delete_spectacle(self, spectacle_id: int) -> str | None:
+        """Удаляет спектакль вместе со связками. Возвращает его название или None, если не найден."""
+        with self._conn() as con:
+            row = con.execute("SELECT title FROM spectacles WHERE id=?", (spectacle_id,)).fetchone()
+            if not row:
+                return None
+            con.execute("DELETE FROM spectacles WHERE id=?", (spectacle_id,))
+            con.execute("DELETE FROM spectacle_employees WHERE spectacle_id=?", (spectacle_id,))
+            con.execute("DELETE FROM spectacle_aliases WHERE spectacle_id=?", (spectacle_id,))
+            con.commit()
+            return row[0]
+
+    def list_spectacle_aliases(self) -> list[tuple[str, int]]:
+        with self._read_conn() as con:
+            return [(r[0], r[1]) for r in con.execute("SELECT alias, spectacle_id FROM spectacle_aliases").fetchall()]
+
+    def add_spectacle_alias(self, alias: str, spectacle_id: int) -> None:
+        """alias — уже нормализованный ключ (services.titles.normalize_title)."""
+        with self._conn() as con:
+            con.execute("INSERT OR REPLACE INTO spectacle_aliases(alias, spectacle_id) VALUES(?,?)", (alias, spectacle_id))
+            con.commit()
+
+    def list_employees(self) -> List[str]:
+        with self._read_conn() as con:
             return [r[0] for r in con.execute("SELECT display FROM employees ORDER BY last_name, first_name").fetchall()]
 
     def list_employees_full(self) -> list[tuple[int, str]]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             return [(r[0], r[1]) for r in con.execute("SELECT id, display FROM employees ORDER BY last_name, first_name").fetchall()]
 
+    def list_employees_names(self) -> list[tuple[int, str, str]]:
+        """Return list of (id, first_name, last_name) ordered by last_name, first_name."""
+        with self._read_conn() as con:
+            rows = con.execute("SELECT id, first_name, last_name FROM employees ORDER BY last_name, first_name").fetchall()
+            return [(r[0], r[1], r[2]) for r in rows]
+
+    def get_employee_by_display(self, display: str):
+        """Return (id, last_name, first_name, tg_id) or None."""
+        with self._read_conn() as con:
+            return con.execute("SELECT id, last_name, first_name, tg_id FROM employees WHERE display=?", (display,)).fetchone()
+
     def list_all_employees(self) -> list[tuple[int, str]]:
         """Return list of (id, display) for all employees ordered by last_name, first_name.
         Wrapper kept for backward compatibility with older handlers expecting this name.
         """
-        with self._conn() as con:
+        with self._read_conn() as con:
             rows = con.execute(
                 "SELECT id, display FROM employees ORDER BY last_name, first_name"
             ).fetchall()
@@ -190,12 +351,12 @@ class DB:
             con.commit()
 
     def get_employee_id(self, display: str):
-        with self._conn() as con:
+        with self._read_conn() as con:
             row = con.execute("SELECT id FROM employees WHERE display=?", (display,)).fetchone()
             return row[0] if row else None
 
     def get_employee_by_tg(self, tg_id: int | str):
-        with self._conn() as con:
+        with self._read_conn() as con:
             return con.execute("SELECT id, display FROM employees WHERE tg_id=?", (str(tg_id),)).fetchone()
 
     # --- auth / pending users
@@ -211,14 +372,14 @@ class DB:
             con.commit()
 
     def get_pending_auth(self, tg_id: int | str):
-        with self._conn() as con:
+        with self._read_conn() as con:
             return con.execute(
                 "SELECT tg_id, first_name, last_name, username, requested_at FROM pending_auth WHERE tg_id=?",
                 (str(tg_id),),
             ).fetchone()
 
     def list_pending_auths(self) -> list[tuple[str, str, str, str, str]]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             rows = con.execute(
                 "SELECT tg_id, first_name, last_name, username, requested_at FROM pending_auth ORDER BY requested_at"
             ).fetchall()
@@ -241,7 +402,7 @@ class DB:
             con.commit()
 
     def get_spectacle_employees(self, title: str) -> List[str]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             row = con.execute("SELECT id FROM spectacles WHERE title=?", (title,)).fetchone()
             if not row:
                 return []
@@ -255,13 +416,36 @@ class DB:
             return [r[0] for r in rows]
 
     def get_spectacle_employee_ids(self, title: str) -> set[int]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             row = con.execute("SELECT id FROM spectacles WHERE title=?", (title,)).fetchone()
             if not row:
                 return set()
             sid = row[0]
             return {r[0] for r in con.execute("SELECT employee_id FROM spectacle_employees WHERE spectacle_id=?", (sid,)).fetchall()}
 
+    def get_spectacle_employees_by_id(self, spectacle_id: int) -> List[str]:
+        with self._read_conn() as con:
+            rows = con.execute("""
+                SELECT e.display FROM spectacle_employees se
+                JOIN employees e ON e.id = se.employee_id
+                WHERE se.spectacle_id=?
+                ORDER BY e.last_name, e.first_name
+            """, (spectacle_id,)).fetchall()
+            return [r[0] for r in rows]
+
+    def get_spectacle_employee_ids_by_id(self, spectacle_id: int) -> set[int]:
+        with self._read_conn() as con:
+            return {r[0] for r in con.execute("SELECT employee_id FROM spectacle_employees WHERE spectacle_id=?", (spectacle_id,)).fetchall()}
+
+    def set_spectacle_employee_ids(self, spectacle_id: int, employee_ids: list[int]) -> None:
+        with self._conn() as con:
+            con.execute("DELETE FROM spectacle_employees WHERE spectacle_id=?", (spectacle_id,))
+            con.executemany(
+                "INSERT OR IGNORE INTO spectacle_employees(spectacle_id, employee_id) VALUES(?,?)",
+                [(spectacle_id, eid) for eid in employee_ids],
+            )
+            con.commit()
+
     def toggle_spectacle_employee(self, spectacle_id: int, employee_id: int) -> None:
         with self._conn() as con:
             exists = con.execute("SELECT 1 FROM spectacle_employees WHERE spectacle_id=? AND employee_id=?", (spectacle_id, employee_id)).fetchone()
@@ -283,9 +467,27 @@ class DB:
         return added
 
     def list_busy_dates(self, employee_id: int) -> list[str]:
-        with self._conn() as con:
+        with self._read_conn() as con:
             return [r[0] for r in con.execute("SELECT date_str FROM employee_busy WHERE employee_id=? ORDER BY date_str", (employee_id,)).fetchall()]
 
+    def list_busy_dates_for_month(self, employee_id: int, year: int, month: int) -> list[str]:
+        with self._read_conn() as con:
+            return [r[0] for r in con.execute(
+                "SELECT date_str FROM employee_busy WHERE employee_id=? AND date_str BETWEEN ? AND ? ORDER BY date_str",
+                (employee_id, *self.month_range(year, month)),
+            ).fetchall()]
+
+    def list_busy_for_month(self, year: int, month: int) -> dict[int, set[str]]:
+        """Занятость всех сотрудников за месяц одним запросом: {employee_id: {date_str, ...}}."""
+        out: dict[int, set[str]] = {}
+        with self._read_conn() as con:
+            for eid, ds in con.execute(
+                "SELECT employee_id, date_str FROM employee_busy WHERE date_str BETWEEN ? AND ?",
+                self.month_range(year, month),
+            ):
+                out.setdefault(eid, set()).add(ds)
+        return out
+
     def remove_busy_dates(self, employee_id: int, dates: list[str]) -> list[str]:
         removed = []
         with self._conn() as con:
@@ -313,30 +515,29 @@ class DB:
             con.commit()
 
     def has_submitted(self, employee_id: int, year: int, month: int) -> bool:
-        with self._conn() as con:
+        with self._read_conn() as con:
             return bool(con.execute("SELECT 1 FROM user_submissions WHERE employee_id=? AND year=? AND month=?",(employee_id, year, month)).fetchone())
 
     def count_busy_for_month(self, employee_id: int, year: int, month: int) -> int:
-        prefix = f"{year:04d}-{month:02d}-"
-        with self._conn() as con:
-            row = con.execute("SELECT COUNT(*) FROM employee_busy WHERE employee_id=? AND date_str LIKE ?", (employee_id, prefix+'%')).fetchone()
+        with self._read_conn() as con:
+            row = con.execute(
+                "SELECT COUNT(*) FROM employee_busy WHERE employee_id=? AND date_str BETWEEN ? AND ?",
+                (employee_id, *self.month_range(year, month)),
+            ).fetchone()
             return int(row[0] if row and row[0] is not None else 0)
 
     def count_assigned_for_month(self, employee_id: int, year: int, month: int) -> int:
-        prefix = f"{year:04d}-{month:02d}-"
-        with self._conn() as con:
-            row = con.execute("""
-                SELECT COUNT(*) FROM events ev
-                JOIN employees e ON e.display = ev.employee
-                WHERE e.id=? AND ev.date LIKE ?
-            """, (employee_id, prefix+'%')).fetchone()
+        with self._read_conn() as con:
+            row = con.execute(
+                "SELECT COUNT(*) FROM events WHERE employee_id=? AND date BETWEEN ? AND ?",
+                (employee_id, *self.month_range(year, month)),
+            ).fetchone()
             return int(row[0] if row and row[0] is not None else 0)
 
     # --- events
     def delete_events_for_month(self, year: int, month: int):
-        prefix = f"{year:04d}-{month:02d}-"
         with self._conn() as con:
-            con.execute("DELETE FROM events WHERE date LIKE ?", (prefix + '%',))
+            con.execute("DELETE FROM events WHERE date BETWEEN ? AND ?", self.month_range(year, month))
             con.commit()
 
     def insert_events(self, rows: list[dict]):
@@ -347,40 +548,299 @@ class DB:
             if "duty_employee" not in row:
                 row["duty_employee"] = None
         with self._conn() as con:
-            con.executemany("""
-                INSERT INTO events(date, type, title, time, location, city, employee, info, duty_employee)
-                VALUES(:date, :type, :title, :time, :location, :city, :employee, :info, :duty_employee)
-            """, rows)
+            con.executemany(self.INSERT_EVENT_SQL, rows)
             con.commit()
 
-    def get_employee_display_by_id(self, employee_id: int) -> str | None:
+    # --- staged import: строки разобраны один раз и ждут, пока админ разберёт незнакомые названия
+    def stage_events(self, rows: list[dict], max_age_days: int = 2) -> str:
+        """Кладёт разобранные строки в staged_events; возвращает upload_id. Брошенные импорты старше max_age_days вычищаются."""
+        upload_id = uuid.uuid4().hex
+        now = datetime.now(UTC)
+        with self._conn() as con:
+            con.execute("DELETE FROM staged_events WHERE staged_at<?", ((now - timedelta(days=max_age_days)).isoformat(),))
+            con.executemany(
+                """
+                INSERT INTO staged_events(upload_id, staged_at, date, type, title, time, location, city, employee, info, duty_employee)
+                VALUES(:upload_id, :staged_at, :date, :type, :title, :time, :location, :city, :employee, :info, :duty_employee)
+                """,
+                [{**r, "upload_id": upload_id, "staged_at": now.isoformat()} for r in rows],
+            )
+            con.commit()
+        return upload_id
+
+    def pop_staged_events(self, upload_id: str | None) -> list[dict]:
+        """
+        Забирает отложенные строки импорта: читает и удаляет их на соединении писателя
+        без commit — вызывающий держит транзакцию (with DBI._conn()) и применяет строки
+        в ней же, так что при ошибке строки остаются на месте.
+        """
+        if not upload_id:
+            return []
+        con = self._conn()
+        cur = con.execute(
+            "SELECT date, type, title, time, location, city, employee, info, duty_employee "
+            "FROM staged_events WHERE upload_id=? ORDER BY rowid",
+            (upload_id,),
+        )
+        names = [d[0] for d in cur.description]
+        rows = [dict(zip(names, r)) for r in cur.fetchall()]
+        con.execute("DELETE FROM staged_events WHERE upload_id=?", (upload_id,))
+        return rows
+
+    def drop_staged_events(self, upload_id: str | None) -> None:
+        """Выбрасывает отложенные строки импорта (админ отменил импорт)."""
+        if not upload_id:
+            return
         with self._conn() as con:
+            con.execute("DELETE FROM staged_events WHERE upload_id=?", (upload_id,))
+            con.commit()
+
+    def get_employee_display_by_id(self, employee_id: int) -> str | None:
+        with self._read_conn() as con:
             row = con.execute("SELECT display FROM employees WHERE id=?", (employee_id,)).fetchone()
             return row[0] if row else None
 
     def count_duty_for_month(self, employee_id: int, year: int, month: int) -> int:
-        """Count events in the given month where duty_employee is this employee's display name."""
-        prefix = f"{year:04d}-{month:02d}-"
-        display = self.get_employee_display_by_id(employee_id)
-        if not display:
-            return 0
-        with self._conn() as con:
+        """Count events in the given month where this employee is on duty."""
+        with self._read_conn() as con:
             row = con.execute(
-                "SELECT COUNT(*) FROM events WHERE duty_employee=? AND date LIKE ?",
-                (display, prefix + "%")
+                "SELECT COUNT(*) FROM events WHERE duty_employee_id=? AND date BETWEEN ? AND ?",
+                (employee_id, *self.month_range(year, month))
             ).fetchone()
             return int(row[0] if row and row[0] is not None else 0)
 
     def update_event_duty_by_ids(self, event_ids: list[int], employee_id: int) -> None:
-        """Set duty_employee for all given event ids to the employee's display name."""
+        """Set the duty employee for all given event ids (id plus display snapshot)."""
         display = self.get_employee_display_by_id(employee_id)
         if not display or not event_ids:
             return
         with self._conn() as con:
             con.executemany(
-                "UPDATE events SET duty_employee=? WHERE id=?",
-                [(display, eid) for eid in event_ids]
+                "UPDATE events SET duty_employee_id=?, duty_employee=? WHERE id=?",
+                [(employee_id, display, eid) for eid in event_ids]
+            )
+            con.commit()
+
+    # --- Telegram file_id уже отправленных документов
+    def get_sent_document(self, sha256: str, filename: str, max_age_days: int) -> str | None:
+        """file_id ранее загруженного документа с теми же байтами и именем, если запись не старше max_age_days."""
+        since = (datetime.now(UTC) - timedelta(days=max_age_days)).isoformat()
+        with self._read_conn() as con:
+            row = con.execute(
+                "SELECT file_id FROM sent_documents WHERE sha256=? AND filename=? AND sent_at>=?",
+                (sha256, filename, since),
+            ).fetchone()
+            return row[0] if row else None
+
+    def remember_sent_document(self, sha256: str, filename: str, file_id: str, max_age_days: int) -> None:
+        """Сохраняет file_id и заодно вычищает записи старше max_age_days."""
+        now = datetime.now(UTC)
+        with self._conn() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO sent_documents(sha256, filename, file_id, sent_at) VALUES(?,?,?,?)",
+                (sha256, filename, file_id, now.isoformat()),
+            )
+            con.execute("DELETE FROM sent_documents WHERE sent_at<?", ((now - timedelta(days=max_age_days)).isoformat(),))
+            con.commit()
+
+    def forget_sent_document(self, sha256: str, filename: str) -> None:
+        with self._conn() as con:
+            con.execute("DELETE FROM sent_documents WHERE sha256=? AND filename=?", (sha256, filename))
+            con.commit()
+
+    def replace_schedule_replica(self, year: int, month: int, header: list[str], rows: list[tuple[str | None, list[str]]]) -> None:
+        """Заменяет копию листа месяца целиком. rows — [(день 'YYYY-MM-DD' или None, ячейки)] в порядке листа."""
+        key = f"{year:04d}-{month:02d}"
+        with self._conn() as con:
+            con.execute("DELETE FROM schedule_replica_rows WHERE month=?", (key,))
+            con.execute(
+                "INSERT OR REPLACE INTO schedule_replica(month, header, synced_at) VALUES(?,?,?)",
+                (key, json.dumps(header, ensure_ascii=False), datetime.now(UTC).isoformat()),
+            )
+            con.executemany(
+                "INSERT INTO schedule_replica_rows(month, pos, day, cells) VALUES(?,?,?,?)",
+                [(key, pos, day, json.dumps(cells, ensure_ascii=False)) for pos, (day, cells) in enumerate(rows)],
+            )
+            con.commit()
+
+    def get_schedule_replica_day(self, day: str) -> tuple[list[str], list[list[str]], str] | None:
+        """(заголовок, строки дня, synced_at) из копии листа; None, если месяц ещё не копировался."""
+        with self._read_conn() as con:
+            meta = con.execute(
+                "SELECT header, synced_at FROM schedule_replica WHERE month=?", (day[:7],)
+            ).fetchone()
+            if not meta:
+                return None
+            rows = con.execute(
+                "SELECT cells FROM schedule_replica_rows WHERE day=? ORDER BY pos", (day,)
+            ).fetchall()
+        return json.loads(meta[0]), [json.loads(r[0]) for r in rows], meta[1]
+
+    # --- publish_jobs: статусы queued → running → done | failed | superseded
+    _PUBLISH_JOB_COLUMNS = "id, year, month, chat_id, status, attempts, next_attempt_at, last_error"
+
+    def enqueue_publish_job(self, year: int, month: int, chat_id: int | None) -> tuple[int, bool]:
+        """Ставит публикацию месяца в очередь. Если такая уже ждёт — склеивает с ней: (id, True)."""
+        now = datetime.now(UTC).isoformat()
+        with self._conn() as con:
+            row = con.execute(
+                "SELECT id FROM publish_jobs WHERE year=? AND month=? AND status='queued'", (year, month)
+            ).fetchone()
+            if row:
+                # строки месяца читаются при запуске задачи, так что ждущая опубликует и эти правки
+                con.execute("UPDATE publish_jobs SET chat_id=?, updated_at=? WHERE id=?", (chat_id, now, row[0]))
+                con.commit()
+                return int(row[0]), True
+            cur = con.execute(
+                "INSERT INTO publish_jobs(year, month, chat_id, status, attempts, next_attempt_at, created_at, updated_at) "
+                "VALUES(?,?,?,'queued',0,?,?,?)",
+                (year, month, chat_id, now, now, now),
+            )
+            con.commit()
+            return int(cur.lastrowid), False
+
+    def claim_publish_job(self) -> dict | None:
+        """Берёт в работу самую раннюю задачу, чей срок подошёл (queued → running, attempts+1)."""
+        now = datetime.now(UTC).isoformat()
+        with self._conn() as con:
+            row = con.execute(
+                f"SELECT {self._PUBLISH_JOB_COLUMNS} FROM publish_jobs "
+                "WHERE status='queued' AND next_attempt_at<=? ORDER BY next_attempt_at, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if not row:
+                return None
+            con.execute(
+                "UPDATE publish_jobs SET status='running', attempts=attempts+1, updated_at=? WHERE id=?", (now, row[0])
             )
             con.commit()
+        job = dict(zip(self._PUBLISH_JOB_COLUMNS.split(", "), row))
+        job["attempts"] += 1
+        return job
+
+    def next_publish_due(self) -> str | None:
+        with self._read_conn() as con:
+            row = con.execute("SELECT MIN(next_attempt_at) FROM publish_jobs WHERE status='queued'").fetchone()
+            return row[0] if row else None
 
-DBI = DB(DB_PATH)
\ No newline at end of file
+    def count_publish_jobs(self, status: str) -> int:
+        with self._read_conn() as con:
+            return int(con.execute("SELECT COUNT(*) FROM publish_jobs WHERE status=?", (status,)).fetchone()[0])
+
+    def retry_publish_job(self, job_id: int, next_attempt_at: str, error: str) -> bool:
+        """
+        Возвращает задачу в очередь на next_attempt_at. Если за это время на тот же
+        месяц встала новая — эта помечается superseded (её опубликует новая); тогда False.
+        """
+        now = datetime.now(UTC).isoformat()
+        with self._conn() as con:
+            newer = con.execute(
+                "SELECT 1 FROM publish_jobs p JOIN publish_jobs j ON j.year=p.year AND j.month=p.month "
+                "WHERE j.id=? AND p.status='queued'",
+                (job_id,),
+            ).fetchone()
+            status = "superseded" if newer else "queued"
+            con.execute(
+                "UPDATE publish_jobs SET status=?, next_attempt_at=?, last_error=?, updated_at=? WHERE id=?",
+                (status, next_attempt_at, error, now, job_id),
+            )
+            con.commit()
+        return not newer
+
+    def finish_publish_job(self, job_id: int, status: str, error: str | None = None, max_age_days: int = 30) -> None:
+        """Закрывает задачу (done/failed) и вычищает закрытые старше max_age_days."""
+        now = datetime.now(UTC)
+        with self._conn() as con:
+            con.execute(
+                "UPDATE publish_jobs SET status=?, last_error=?, updated_at=? WHERE id=?",
+                (status, error, now.isoformat(), job_id),
+            )
+            con.execute(
+                "DELETE FROM publish_jobs WHERE status IN ('done','failed','superseded') AND updated_at<?",
+                ((now - timedelta(days=max_age_days)).isoformat(),),
+            )
+            con.commit()
+
+    def requeue_interrupted_publish_jobs(self) -> int:
+        """После рестарта: задачи, оборванные в running, снова в очередь (или superseded, если на месяц уже есть ждущая)."""
+        now = datetime.now(UTC).isoformat()
+        with self._conn() as con:
+            con.execute(
+                "UPDATE publish_jobs SET status='superseded', updated_at=? WHERE status='running' AND EXISTS ("
+                "SELECT 1 FROM publish_jobs q WHERE q.status='queued' AND q.year=publish_jobs.year AND q.month=publish_jobs.month)",
+                (now,),
+            )
+            cur = con.execute(
+                "UPDATE publish_jobs SET status='queued', next_attempt_at=?, updated_at=? WHERE status='running'",
+                (now, now),
+            )
+            con.commit()
+            return cur.rowcount
+
+
+class AsyncDB:
+    """Awaitable mirror of :class:`DB` for aiogram handlers.
+
+    ``await ADBI.list_employees()`` runs ``DBI.list_employees()`` off the event
+    loop: reads go to a bounded pool of reader threads, writes are queued onto
+    a single writer thread so they are applied one at a time, in order.
+    Arbitrary sync callables that touch the DB (planner, exports, keyboards)
+    go through :meth:`run_read` / :meth:`run_write`.
+    """
+
+    # Методы DB, которые только читают. Всё, чего здесь нет, уходит в поток
+    # записи: забытый в списке метод чтения просто встанет в очередь, а забытый
+    # метод записи не откроет второй writer в потоке чтения.
+    READ_METHODS = frozenset({
+        "get_window", "list_employees_with_tg",
+        "list_spectacles", "list_spectacles_with_ids", "get_spectacle_id", "get_spectacle_title",
+        "list_spectacle_aliases",
+        "list_employees", "list_employees_full", "list_employees_names", "list_all_employees",
+        "get_employee_by_display", "get_employee_id", "get_employee_by_tg", "get_employee_display_by_id",
+        "is_authorized", "get_pending_auth", "list_pending_auths",
+        "get_spectacle_employees", "get_spectacle_employee_ids",
+        "get_spectacle_employees_by_id", "get_spectacle_employee_ids_by_id",
+        "list_busy_dates", "list_busy_dates_for_month", "list_busy_for_month",
+        "has_submitted", "count_busy_for_month", "count_assigned_for_month", "count_duty_for_month",
+        "get_sent_document", "get_schedule_replica_day",
+        "next_publish_due", "count_publish_jobs",
+    })
+
+    def __init__(self, db: DB, max_readers: int = 4):
+        self.db = db
+        self._readers = ThreadPoolExecutor(
+            max_workers=max_readers, thread_name_prefix="db-read",
+            initializer=db.pool.forbid_writes_in_thread,
+        )
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+
+    async def _submit(self, executor: ThreadPoolExecutor, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+
+    async def run_read(self, fn, *args, **kwargs):
+        return await self._submit(self._readers, fn, *args, **kwargs)
+
+    async def run_write(self, fn, *args, **kwargs):
+        return await self._submit(self._writer, fn, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.db, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+        runner = self.run_read if name in self.READ_METHODS else self.run_write
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            return await runner(attr, *args, **kwargs)
+
+        setattr(self, name, call)
+        return call
+
+    def close(self) -> None:
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+
+DBI = DB(DB_PATH)
+ADBI = AsyncDB(DBI)
\ No newline at end of file
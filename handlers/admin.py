@@ -4,7 +4,7 @@ from datetime import date
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from config import is_admin
-from db import DBI
+from db import ADBI
 from keyboards.reply import get_user_busy_reply_kb
 from services.auto_assign import auto_assign_events_for_month
 from aiogram.fsm.context import FSMContext
@@ -17,10 +17,10 @@ async def handle_auto_assign(message: Message):
     m = re.search(r"(?i)^автоназначение\\s*(\\d{4})-(\\d{2})\\s*$", message.text or "")
     if m:
         y = int(m.group(1)); mo = int(m.group(2))
-        updated = auto_assign_events_for_month(y, mo)
+        updated = await ADBI.run_write(auto_assign_events_for_month, y, mo)
         await message.answer(f"Автоназначение за {mo:02d}.{y}: обновлено {updated}")
     else:
-        updated = auto_assign_events_for_month()
+        updated = await ADBI.run_write(auto_assign_events_for_month)
         await message.answer(f"Автоназначение (все события): обновлено {updated}")
 
 async def monthly_broadcast_task(bot):
@@ -30,16 +30,17 @@ async def monthly_broadcast_task(bot):
             m = today.month + 1
             y = today.year + (1 if m == 13 else 0)
             m = 1 if m == 13 else m
-            DBI.ensure_window(y, m)
-            wnd = DBI.get_window(y, m)
+            await ADBI.ensure_window(y, m)
+            wnd = await ADBI.get_window(y, m)
             sent = wnd[3] if wnd else 0
             if today.day == 1 and not sent:
-                for eid, disp, tg in DBI.list_employees_with_tg():
+                for eid, disp, tg in await ADBI.list_employees_with_tg():
                     try:
-                        await bot.send_message(tg, f"{disp}, пришлите занятые даты за {['Январь','Февраль','Март','Апрель','Май','Июнь','Июль','Август','Сентябрь','Октябрь','Ноябрь','Декабрь'][m-1]}", reply_markup=get_user_busy_reply_kb(tg))
+                        kb = await ADBI.run_read(get_user_busy_reply_kb, tg)
+                        await bot.send_message(tg, f"{disp}, пришлите занятые даты за {['Январь','Февраль','Март','Апрель','Май','Июнь','Июль','Август','Сентябрь','Октябрь','Ноябрь','Декабрь'][m-1]}", reply_markup=kb)
                     except Exception:
                         continue
-                DBI.mark_broadcast_sent(y, m)
+                await ADBI.mark_broadcast_sent(y, m)
         except Exception:
             pass
         await asyncio.sleep(3600)
@@ -62,7 +63,7 @@ async def auth_list_employees(callback: CallbackQuery):
         await callback.answer("Ошибка данных", show_alert=True); return
 
     # собрать список сотрудников
-    rows = DBI.list_all_employees()
+    rows = await ADBI.list_all_employees()
     if not rows:
         kb = InlineKeyboardBuilder()
         kb.button(text="➕ Новый сотрудник", callback_data=f"auth:new:{target_tg}")
@@ -95,20 +96,18 @@ async def auth_approve(callback: CallbackQuery):
         await callback.answer("Ошибка данных", show_alert=True); return
 
     # Привязываем TG к сотруднику
-    DBI.set_employee_tg_by_id(eid, str(target_tg))
-    DBI.delete_pending_auth(target_tg)
+    await ADBI.set_employee_tg_by_id(eid, str(target_tg))
+    await ADBI.delete_pending_auth(target_tg)
 
     # Узнаем отображаемое имя
-    with DBI._conn() as con:
-        row = con.execute("SELECT display FROM employees WHERE id=?", (eid,)).fetchone()
-    disp = row[0] if row else "сотрудник"
+    disp = await ADBI.get_employee_display_by_id(eid) or "сотрудник"
 
     # Уведомляем пользователя
     try:
         await callback.bot.send_message(
             chat_id=target_tg,
             text=f"Вы авторизованы как: {disp}",
-            reply_markup=get_user_busy_reply_kb(target_tg)
+            reply_markup=await ADBI.run_read(get_user_busy_reply_kb, target_tg)
         )
     except Exception:
         pass
@@ -127,7 +126,7 @@ async def auth_deny(callback: CallbackQuery):
     except Exception:
         await callback.answer("Ошибка данных", show_alert=True); return
 
-    DBI.delete_pending_auth(target_tg)
+    await ADBI.delete_pending_auth(target_tg)
     # Уведомляем пользователя
     try:
         await callback.bot.send_message(chat_id=target_tg, text="Авторизация отклонена. Обратитесь к администратору.")
@@ -175,9 +174,9 @@ async def auth_new_first_name(message: Message, state: FSMContext):
     target_tg = data.get('auth_new_tg')
     try:
         # создаём и сразу привязываем TG
-        DBI.upsert_employee(ln, fn, str(target_tg))
+        await ADBI.upsert_employee(ln, fn, str(target_tg))
         try:
-            DBI.delete_pending_auth(target_tg)
+            await ADBI.delete_pending_auth(target_tg)
         except Exception:
             pass
         disp = f"{ln} {fn}".strip()
@@ -186,7 +185,7 @@ async def auth_new_first_name(message: Message, state: FSMContext):
             await message.bot.send_message(
                 chat_id=target_tg,
                 text=f"Вы авторизованы как: {disp}",
-                reply_markup=get_user_busy_reply_kb(target_tg)
+                reply_markup=await ADBI.run_read(get_user_busy_reply_kb, target_tg)
             )
         except Exception:
             pass
@@ -5,7 +5,8 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.exceptions import TelegramBadRequest
 from config import is_admin
-from db import DBI
+from db import ADBI
+from services.busy_flow import replan_after_busy_add
 from utils.dates import next_month_and_year, parse_days_for_month, format_busy_dates_for_month, human_ru_date
 import datetime
 import traceback
@@ -37,8 +38,8 @@ async def admin_busy_panel(message: Message):
         return
     m, y, mname = next_month_and_year()
     submitted, missing = [], []
-    for eid, disp in DBI.list_all_employees():
-        (submitted if DBI.has_submitted(eid, y, m) else missing).append(disp)
+    for eid, disp in await ADBI.list_all_employees():
+        (submitted if await ADBI.has_submitted(eid, y, m) else missing).append(disp)
     text = [f"Статус подачи за {mname}:"]
     text.append("\nПодали (" + str(len(submitted)) + "): " + (", ".join(submitted) if submitted else "—"))
     text.append("Не подали (" + str(len(missing)) + "): " + (", ".join(missing) if missing else "—"))
@@ -85,8 +86,7 @@ async def emp_busy_view(callback: CallbackQuery, state: FSMContext):
             except Exception:
                 view_year, view_month = today.year, today.month
 
-        prefix = f"{view_year:04d}-{view_month:02d}-"
-        dates = [d for d in DBI.list_busy_dates(eid) if d.startswith(prefix)]
+        dates = await ADBI.list_busy_dates_for_month(eid, view_year, view_month)
         txt = "\n".join(human_ru_date(d) for d in dates) if dates else "пусто"
 
         kb = InlineKeyboardBuilder()
@@ -149,9 +149,10 @@ async def admin_handle_busy_add_text(message: Message, state: FSMContext):
     month, year, _ = next_month_and_year()
     days = parse_days_for_month(message.text, month, year)
     dates = format_busy_dates_for_month(days, month, year)
-    added = DBI.add_busy_dates(eid, dates)
+    added = await ADBI.add_busy_dates(eid, dates)
     if added:
-        DBI.set_submitted(eid, year, month)
+        await ADBI.set_submitted(eid, year, month)
+        await replan_after_busy_add(message.bot, eid, added)
     await message.answer(f"Добавлено: {', '.join(added) if added else 'ничего нового'}")
     await state.clear()
 
@@ -165,14 +166,13 @@ async def admin_handle_busy_remove_text(message: Message, state: FSMContext):
     month, year, _ = next_month_and_year()
     raw = (message.text or '').strip().lower()
     if raw in {"очистить","очистка","clear"}:
-        DBI.clear_busy_dates(eid)
-        DBI.unset_submitted(eid, year, month)
+        await ADBI.clear_busy_dates(eid)
+        await ADBI.unset_submitted(eid, year, month)
         await message.answer("Все даты удалены."); await state.clear(); return
     days = parse_days_for_month(raw, month, year)
     dates = format_busy_dates_for_month(days, month, year)
-    removed = DBI.remove_busy_dates(eid, dates)
-    remaining = [d for d in DBI.list_busy_dates(eid) if d.startswith(f"{year:04d}-{month:02d}-")]
-    if not remaining:
-        DBI.unset_submitted(eid, year, month)
+    removed = await ADBI.remove_busy_dates(eid, dates)
+    if not await ADBI.count_busy_for_month(eid, year, month):
+        await ADBI.unset_submitted(eid, year, month)
     await message.answer(f"Удалено: {', '.join(removed) if removed else 'ничего не удалено'}")
     await state.clear()
\ No newline at end of file
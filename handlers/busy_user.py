@@ -4,9 +4,9 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from keyboards.inline import get_user_busy_manage_kb
 from keyboards.reply import get_user_busy_reply_kb
-from db import DBI
+from db import ADBI
 from utils.dates import next_month_and_year, parse_days_for_month, format_busy_dates_for_month, human_ru_date
-from services.busy_flow import ensure_known_user_or_report_message, notify_admin_busy_change
+from services.busy_flow import ensure_known_user_or_report_message, notify_admin_busy_change, replan_after_busy_add
 from datetime import date
 import datetime
 from config import ADMIN_ID
@@ -60,9 +60,7 @@ async def busy_view_text(message: Message, state: FSMContext):
 
     today = datetime.date.today()
     view_year, view_month = today.year, today.month
-    prefix = f"{view_year:04d}-{view_month:02d}-"
-
-    dates = [d for d in DBI.list_busy_dates(eid) if d.startswith(prefix)]
+    dates = await ADBI.list_busy_dates_for_month(eid, view_year, view_month)
     txt = "\n".join(human_ru_date(d) for d in dates) if dates else "пусто"
 
     kb = InlineKeyboardBuilder()
@@ -79,7 +77,7 @@ async def busy_view_text(message: Message, state: FSMContext):
     await message.answer(f"{title}\nВаши даты:\n{txt}", reply_markup=kb.as_markup())
 
 async def busy_submit(callback: CallbackQuery, state: FSMContext):
-    row = DBI.get_employee_by_tg(callback.from_user.id)
+    row = await ADBI.get_employee_by_tg(callback.from_user.id)
     if not row:
         await callback.message.answer("Неизвестный пользователь. Администратор сопоставит ваш аккаунт.")
         await callback.answer(); return
@@ -93,7 +91,7 @@ async def busy_submit(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 async def busy_view(callback: CallbackQuery, state: FSMContext):
-    row = DBI.get_employee_by_tg(callback.from_user.id)
+    row = await ADBI.get_employee_by_tg(callback.from_user.id)
     if not row:
         await callback.message.answer("Неизвестный пользователь. Администратор сопоставит ваш аккаунт.")
         await callback.answer()
@@ -114,8 +112,7 @@ async def busy_view(callback: CallbackQuery, state: FSMContext):
         except Exception:
             view_year, view_month = today.year, today.month
 
-    prefix = f"{view_year:04d}-{view_month:02d}-"
-    dates = [d for d in DBI.list_busy_dates(eid) if d.startswith(prefix)]
+    dates = await ADBI.list_busy_dates_for_month(eid, view_year, view_month)
     txt = "\n".join(human_ru_date(d) for d in dates) if dates else "пусто"
 
     kb = InlineKeyboardBuilder()
@@ -140,17 +137,18 @@ async def handle_busy_add_text(message: Message, state: FSMContext):
     eid = await ensure_known_user_or_report_message(message)
     if eid is None: await state.clear(); return
     if _after_25_for_non_admin(message.from_user.id):
-        await message.answer("Подать даты можно с 1 по 25 числа.", reply_markup=get_user_busy_reply_kb(message.from_user.id))
+        await message.answer("Подать даты можно с 1 по 25 числа.", reply_markup=await ADBI.run_read(get_user_busy_reply_kb, message.from_user.id))
         await state.clear()
         return
     month, year, _ = next_month_and_year()
     days = parse_days_for_month(message.text, month, year)
     dates = format_busy_dates_for_month(days, month, year)
-    added = DBI.add_busy_dates(eid, dates)
+    added = await ADBI.add_busy_dates(eid, dates)
     if added:
-        DBI.set_submitted(eid, year, month)
+        await ADBI.set_submitted(eid, year, month)
         await notify_admin_busy_change(message.bot, eid, 'add', added, message)
-    await message.answer(f"Добавлено: {', '.join(added) if added else 'ничего нового'}", reply_markup=get_user_busy_reply_kb(message.from_user.id))
+        await replan_after_busy_add(message.bot, eid, added)
+    await message.answer(f"Добавлено: {', '.join(added) if added else 'ничего нового'}", reply_markup=await ADBI.run_read(get_user_busy_reply_kb, message.from_user.id))
     await state.clear()
 
 async def handle_busy_remove_text(message: Message, state: FSMContext):
@@ -159,20 +157,19 @@ async def handle_busy_remove_text(message: Message, state: FSMContext):
     month, year, _ = next_month_and_year()
     raw = (message.text or '').strip().lower()
     if raw in {"очистить","очистка","clear"}:
-        DBI.clear_busy_dates(eid)
-        DBI.unset_submitted(eid, year, month)
+        await ADBI.clear_busy_dates(eid)
+        await ADBI.unset_submitted(eid, year, month)
         await notify_admin_busy_change(message.bot, eid, 'clear', [], message)
-        await message.answer("Все даты удалены.", reply_markup=get_user_busy_reply_kb(message.from_user.id))
+        await message.answer("Все даты удалены.", reply_markup=await ADBI.run_read(get_user_busy_reply_kb, message.from_user.id))
         await state.clear(); return
     days = parse_days_for_month(raw, month, year)
     dates = format_busy_dates_for_month(days, month, year)
-    removed = DBI.remove_busy_dates(eid, dates)
+    removed = await ADBI.remove_busy_dates(eid, dates)
     if removed:
         await notify_admin_busy_change(message.bot, eid, 'remove', removed, message)
-    remaining = [d for d in DBI.list_busy_dates(eid) if d.startswith(f"{year:04d}-{month:02d}-")]
-    if not remaining:
-        DBI.unset_submitted(eid, year, month)
-    await message.answer(f"Удалено: {', '.join(removed) if removed else 'ничего не удалено'}", reply_markup=get_user_busy_reply_kb(message.from_user.id))
+    if not await ADBI.count_busy_for_month(eid, year, month):
+        await ADBI.unset_submitted(eid, year, month)
+    await message.answer(f"Удалено: {', '.join(removed) if removed else 'ничего не удалено'}", reply_markup=await ADBI.run_read(get_user_busy_reply_kb, message.from_user.id))
     await state.clear()
 
 
@@ -4,7 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from config import is_admin
-from db import DBI
+from db import ADBI
 from keyboards.inline import get_employees_inline_kb
 from utils.dates import human_ru_date
 
@@ -19,11 +19,11 @@ class EditEmployeeTg(StatesGroup):
 async def handle_workers(message: Message, state: FSMContext):
     if not is_admin(message.from_user.id):
         await message.answer("Только для админа"); return
-    emps = DBI.list_employees()
+    emps = await ADBI.list_employees()
     txt = "Выберите сотрудника или добавьте нового:" if emps else "Список пуст. Нажмите «➕ Добавить»."
     # если сотрудников нет — показываем хотя бы одну кнопку «➕ Добавить»
     if emps:
-        kb = get_employees_inline_kb()
+        kb = await ADBI.run_read(get_employees_inline_kb)
     else:
         builder = InlineKeyboardBuilder()
         builder.button(text="➕ Добавить", callback_data="emp:add")
@@ -41,8 +41,7 @@ async def employees_menu_router(callback: CallbackQuery, state: FSMContext):
         await callback.answer(); return
     if data.startswith("emp:show:"):
         disp = data.split(":", 2)[2]
-        with DBI._conn() as con:
-            row = con.execute("SELECT id, last_name, first_name, tg_id FROM employees WHERE display=?", (disp,)).fetchone()
+        row = await ADBI.get_employee_by_display(disp)
         if not row:
             await callback.message.answer("Не найден сотрудник"); await callback.answer(); return
         eid, ln, fn, tg = row
@@ -76,7 +75,7 @@ async def emp_del_yes(callback: CallbackQuery, state: FSMContext):
         eid = int((callback.data or "").split(":", 3)[3])
     except Exception:
         await callback.answer("Ошибка", show_alert=True); return
-    DBI.delete_employee(eid)
+    await ADBI.delete_employee(eid)
     await callback.message.answer("Сотрудник удалён ✅")
     await callback.answer()
 
@@ -106,9 +105,9 @@ async def emp_tg_set_value(message: Message, state: FSMContext):
     if raw == 'пропустить':
         await message.answer("Изменение отменено."); await state.clear(); return
     if raw in {'очистить','удалить','-'}:
-        DBI.set_employee_tg_by_id(eid, None)
+        await ADBI.set_employee_tg_by_id(eid, None)
         await message.answer("Telegram ID очищен ✅"); await state.clear(); return
-    DBI.set_employee_tg_by_id(eid, (message.text or '').strip())
+    await ADBI.set_employee_tg_by_id(eid, (message.text or '').strip())
     await message.answer("Telegram ID обновлён ✅")
     await state.clear()
 
@@ -151,7 +150,7 @@ async def add_employee_tg(message: Message, state: FSMContext):
     tg_raw = (message.text or '').strip()
     tg_id = None if tg_raw.lower() == 'пропустить' else tg_raw
     try:
-        DBI.upsert_employee(ln, fn, tg_id)
+        await ADBI.upsert_employee(ln, fn, tg_id)
         await message.answer(f"Сотрудник сохранён: {ln} {fn}")
     except Exception as e:
         await message.answer(f"Ошибка сохранения: {e}")
@@ -159,5 +158,5 @@ async def add_employee_tg(message: Message, state: FSMContext):
         return
     await state.clear()
     # Показать актуальный список после добавления
-    txt = "Выберите сотрудника или добавьте нового:" if DBI.list_employees() else "Список пуст. Нажмите «➕ Добавить»."
-    await message.answer(txt, reply_markup=get_employees_inline_kb())
\ No newline at end of file
+    txt = "Выберите сотрудника или добавьте нового:" if await ADBI.list_employees() else "Список пуст. Нажмите «➕ Добавить»."
+    await message.answer(txt, reply_markup=await ADBI.run_read(get_employees_inline_kb))
\ No newline at end of file
@@ -1,7 +1,6 @@
 # handlers/excel.py
 from pathlib import Path
 import tempfile
-import pandas as pd
 import calendar
 from datetime import date
 from aiogram.types import Message, CallbackQuery
@@ -11,37 +10,50 @@ from aiogram import Router, F
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from config import is_admin, RU_MONTHS
 from keyboards.inline import get_month_pick_inline, get_edit_employees_inline_kb
-from services.excel_import import import_events_from_excel
-from services.excel_export import export_month_schedule, file_as_input, month_caption, export_spectacles_table
-from services.auto_assign import auto_assign_events_for_month
-from services.google_sheets import publish_schedule_to_sheets, fetch_schedule_for_date
-from db import DBI
+from services.excel_import import parse_events_excel, parse_season_excel, sync_events, format_import_report, commit_staged_import, format_season_preview
+from services.excel_export import export_month_schedule, month_caption, export_spectacles_table, release_export, export_cache_stats, send_export
+from services.titles import normalize_title, title_candidates
+from services.auto_assign import auto_assign_events_for_month, apply_changes, format_changes
+from services.google_sheets import sheets_stats
+from services.schedule_replica import day_schedule_text
+from services.publish_queue import enqueue_publish
+from db import ADBI
 
 router = Router()
 
 class UploadExcel(StatesGroup):
     waiting_for_file = State()
     waiting_for_month = State()
+    waiting_for_confirm = State()
 
 class AssignUnknown(StatesGroup):
     waiting = State()
 
-async def _ask_unknown_spectacle(message: Message, state: FSMContext, title: str):
-    data = await state.get_data()
-    selected = set(data.get('current_selected') or [])
-    # загрузим всех сотрудников
-    with DBI._conn() as con:
-        rows = con.execute("SELECT id, first_name, last_name FROM employees ORDER BY last_name, first_name").fetchall()
+def _unknown_spectacle_kb(employees: list, selected: set, candidates: list):
     kb = InlineKeyboardBuilder()
-    for emp_id, fn, ln in rows:
+    # сначала «это X?» — похожие уже известные спектакли, в одно касание
+    for sid, known_title in candidates:
+        kb.button(text=f"Это «{known_title}»?", callback_data=f"unkalias:{sid}")
+    for emp_id, fn, ln in employees:
         mark = "✅" if emp_id in selected else "☐"
         kb.button(text=f"{mark} {ln} {fn}", callback_data=f"unkemp:{emp_id}")
     kb.button(text="Сохранить", callback_data="unksave")
     kb.adjust(1)
-    await message.answer(
-        f"Неизвестный спектакль:\n<b>{title}</b>\nВыберите сотрудников и нажмите «Сохранить».",
-        reply_markup=kb.as_markup()
-    )
+    return kb.as_markup()
+
+async def _ask_unknown_spectacle(message: Message, state: FSMContext, title: str):
+    data = await state.get_data()
+    selected = set(data.get('current_selected') or [])
+    candidates = [[sid, t] for sid, t, _ in await ADBI.run_read(title_candidates, title)]
+    await state.update_data(current_candidates=candidates)
+    # загрузим всех сотрудников
+    rows = await ADBI.list_employees_names()
+    text = f"Неизвестный спектакль:\n<b>{title}</b>\n"
+    if candidates:
+        text += "Если это вариант названия известного спектакля — выберите его. Иначе отметьте сотрудников и нажмите «Сохранить»."
+    else:
+        text += "Выберите сотрудников и нажмите «Сохранить»."
+    await message.answer(text, reply_markup=_unknown_spectacle_kb(rows, selected, candidates))
 
 
 # Рендерим inline-календарь месяца
@@ -91,10 +103,75 @@ async def handle_excel_upload(message: Message, state: FSMContext):
     suffix = Path(doc.file_name or 'upload.xlsx').suffix or '.xlsx'
     tmp = Path(tempfile.gettempdir()) / f"pultovik_upload_{message.from_user.id}{suffix}"
     await message.bot.download_file(file.file_path, destination=tmp)
+    # Книга на сезон (по листу на месяц): без вопроса о месяце, но найденные месяцы с годами админ подтверждает
+    if suffix.lower() in ('.xlsx', '.xlsm'):
+        try:
+            months, titles, skipped, origins = await ADBI.run_read(parse_season_excel, tmp, date.today().year)
+        except Exception:
+            months, titles, skipped, origins = {}, [], [], {}
+        if len(months) > 1:
+            await _confirm_season(message, state, months, titles, skipped, origins)
+            return
     await state.update_data(upload_path=str(tmp))
     await state.set_state(UploadExcel.waiting_for_month)
     await message.answer("На какой месяц?", reply_markup=get_month_pick_inline(prefix='xlsmonth:'))
 
+async def _import_months(message: Message, state: FSMContext, months: dict, titles: list[str], skipped: list[str] | None = None):
+    """Общий хвост импорта: сразу применяет месяцы или откладывает строки до разбора незнакомых названий."""
+    if titles:
+        # Оставим в очереди только реально неизвестные названия
+        known = set(await ADBI.list_spectacles())
+        unknown_titles = [t for t in titles if t and t not in known]
+        if unknown_titles:
+            # разобранные строки откладываем в staged_events — после разбора названий файл не перечитываем
+            upload_id = await ADBI.stage_events([ev for rows in months.values() for ev in rows])
+            await state.update_data(unknown_titles=unknown_titles, import_months=[list(ym) for ym in months],
+                                    import_upload=upload_id, import_skipped=skipped or [], current_selected=[])
+            await state.set_state(AssignUnknown.waiting)
+            await _ask_unknown_spectacle(message, state, unknown_titles[0])
+            return
+    diffs = await ADBI.run_write(sync_events, months)
+    await state.clear()
+    await message.answer(format_import_report(diffs, skipped))
+
+async def _confirm_season(message: Message, state: FSMContext, months: dict, titles: list[str], skipped: list[str], origins: dict):
+    """Откладывает строки сезона в staged_events и спрашивает админа, верно ли определены месяцы и годы."""
+    upload_id = await ADBI.stage_events([ev for rows in months.values() for ev in rows])
+    await state.update_data(import_months=[list(ym) for ym in months], import_upload=upload_id,
+                            import_skipped=skipped or [], import_titles=titles, current_selected=[])
+    await state.set_state(UploadExcel.waiting_for_confirm)
+    kb = InlineKeyboardBuilder()
+    kb.button(text="Импортировать", callback_data="seasonok")
+    kb.button(text="Отмена", callback_data="seasonno")
+    kb.adjust(2)
+    await message.answer(format_season_preview(months, origins, skipped), reply_markup=kb.as_markup())
+
+@router.callback_query(F.data == 'seasonok', UploadExcel.waiting_for_confirm)
+async def season_confirm(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для админа", show_alert=True); return
+    st = await state.get_data()
+    if not st.get('import_upload'):
+        await state.clear()
+        await callback.answer("Импорт устарел, пришлите файл заново", show_alert=True); return
+    known = set(await ADBI.list_spectacles())
+    unknown_titles = [t for t in st.get('import_titles') or [] if t and t not in known]
+    if unknown_titles:
+        await state.update_data(unknown_titles=unknown_titles)
+        await state.set_state(AssignUnknown.waiting)
+        await _ask_unknown_spectacle(callback.message, state, unknown_titles[0])
+        await callback.answer()
+        return
+    await _next_unknown_or_commit(callback, state)
+
+@router.callback_query(F.data == 'seasonno', UploadExcel.waiting_for_confirm)
+async def season_cancel(callback: CallbackQuery, state: FSMContext):
+    st = await state.get_data()
+    await ADBI.drop_staged_events(st.get('import_upload'))
+    await state.clear()
+    await callback.message.answer("Импорт отменён, расписание не изменено.")
+    await callback.answer()
+
 @router.callback_query(F.data.startswith('xlsmonth:'))
 async def handle_excel_month_pick(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
@@ -111,28 +188,13 @@ async def handle_excel_month_pick(callback: CallbackQuery, state: FSMContext):
     if not p:
         await callback.answer("Файл не найден. Пришлите Excel заново.", show_alert=True); return
     try:
-        unknown_count, inserted, titles = import_events_from_excel(Path(p), year, month)
+        # разбор файла — в потоке чтения, в очередь записи уходит только сама запись месяца
+        rows, titles = await ADBI.run_read(parse_events_excel, Path(p), year, month)
+        await _import_months(callback.message, state, {(year, month): rows}, titles)
     except Exception as e:
         await callback.message.answer(f"Ошибка импорта: {e}")
-        await state.clear(); await callback.answer(); return
-
-    if unknown_count > 0:
-        # Оставим в очереди только реально неизвестные названия
-        known = set(DBI.list_spectacles())
-        unknown_titles = [t for t in titles if t and t not in known]
-        if unknown_titles:
-            await state.update_data(unknown_titles=unknown_titles, import_year=year, import_month=month, import_path=str(p))
-            # start with first unknown title (пошаговый опрос)
-            await state.update_data(current_selected=[])
-            await state.set_state(AssignUnknown.waiting)
-            first_title = unknown_titles[0]
-            await _ask_unknown_spectacle(callback.message, state, first_title)
-            await callback.answer()
-            return
-
-    await state.clear()
-    await callback.message.answer(f"Импорт завершён: {inserted} записей за {RU_MONTHS[month-1]} {year}")
-    await callback.answer("Готово")
+        await state.clear()
+    await callback.answer()
 
 @router.message(F.text == "Сделать график")
 async def handle_make_schedule(message: Message, state: FSMContext):
@@ -152,14 +214,75 @@ async def handle_make_schedule_pick(callback: CallbackQuery, state: FSMContext):
     except Exception:
         await callback.answer("Неверный месяц", show_alert=True); return
 
-    updated = auto_assign_events_for_month(year, month)
-    path, _ = export_month_schedule(year, month)
+    updated = await ADBI.run_write(auto_assign_events_for_month, year, month)
+    export, _ = await ADBI.run_read(export_month_schedule, year, month)
     try:
-        await callback.message.answer_document(file_as_input(path), caption=month_caption(year, month, updated))
+        await send_export(callback.message, export, month_caption(year, month, updated))
     except Exception as e:
         await callback.message.answer(f"Не удалось отправить файл: {e}")
+    finally:
+        release_export(export)
     await callback.answer("Готово")
 
+@router.message(F.text == "Предпросмотр графика")
+async def handle_preview_schedule(message: Message, state: FSMContext):
+    if not is_admin(message.from_user.id):
+        await message.answer("Только для админа"); return
+    await message.answer("Для какого месяца показать предпросмотр графика?", reply_markup=get_month_pick_inline(prefix='pvmonth:'))
+
+@router.callback_query(F.data.startswith('pvmonth:'))
+async def handle_preview_schedule_pick(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для админа", show_alert=True); return
+    try:
+        year, month = map(int, (callback.data or '').split(':',1)[1].split('-',1))
+    except Exception:
+        await callback.answer("Неверный месяц", show_alert=True); return
+
+    # dry run только читает — идёт в пул чтения, не в очередь записи
+    plan = await ADBI.run_read(auto_assign_events_for_month, year, month, dry_run=True)
+    changes = plan["changes"]
+    head = f"Предпросмотр: {RU_MONTHS[month-1]} {year}\nИзменений: {len(changes)}, накладок: {len(plan['conflicts'])}"
+    if not changes:
+        await callback.message.answer(head + "\nГрафик уже актуален.")
+        await callback.answer(); return
+    await state.update_data(preview_changes=changes, preview_year=year, preview_month=month, preview_updated=plan["updated"])
+    kb = InlineKeyboardBuilder()
+    kb.button(text="Применить", callback_data="pvapply")
+    kb.button(text="Отмена", callback_data="pvcancel")
+    kb.adjust(2)
+    await callback.message.answer(f"{head}\n\n{format_changes(changes)}", reply_markup=kb.as_markup())
+    await callback.answer()
+
+@router.callback_query(F.data == 'pvapply')
+async def handle_preview_apply(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для админа", show_alert=True); return
+    st = await state.get_data()
+    changes = st.get('preview_changes')
+    if not changes:
+        await callback.answer("Предпросмотр устарел, постройте его заново", show_alert=True); return
+    year, month = int(st['preview_year']), int(st['preview_month'])
+    await state.update_data(preview_changes=None)
+    ok = await ADBI.run_write(apply_changes, changes, expect_old=True)
+    if not ok:
+        await callback.message.answer("График изменился после предпросмотра — ничего не применено. Постройте предпросмотр заново.")
+        await callback.answer(); return
+    export, _ = await ADBI.run_read(export_month_schedule, year, month)
+    try:
+        await send_export(callback.message, export, month_caption(year, month, int(st.get('preview_updated') or 0)))
+    except Exception as e:
+        await callback.message.answer(f"Применено, но не удалось отправить файл: {e}")
+    finally:
+        release_export(export)
+    await callback.answer("Применено")
+
+@router.callback_query(F.data == 'pvcancel')
+async def handle_preview_cancel(callback: CallbackQuery, state: FSMContext):
+    await state.update_data(preview_changes=None)
+    await callback.message.answer("Предпросмотр отменён, график не изменён.")
+    await callback.answer()
+
 @router.message(F.text == "Опубликовать")
 async def publish_start(message: Message, state: FSMContext):
     if not is_admin(message.from_user.id):
@@ -185,36 +308,44 @@ async def publish_month_pick(callback: CallbackQuery, state: FSMContext):
         await callback.answer("Неверный месяц", show_alert=True);
         return
 
-    # Сначала сформируем файл (на всякий случай) и посчитаем записи
+    # Публикует фоновый воркер (services.publish_queue): повторы, квота и склейка — там
     try:
-        xlsx_path, count = export_month_schedule(year, month)
+        job_id, coalesced = await enqueue_publish(year, month, callback.message.chat.id)
     except Exception as e:
-        await callback.message.answer(f"Ошибка формирования файла перед публикацией: {e}")
+        await callback.message.answer(f"Не удалось поставить публикацию в очередь: {e}")
         await callback.answer();
         return
 
-    # Прочитаем сформированный файл в DataFrame для публикации
+    # Файл собирается только по кнопке — параллельно с публикацией, если админ его попросил
+    kb = InlineKeyboardBuilder()
+    kb.button(text="Скачать XLSX", callback_data=f"pubxlsx:{year}-{month:02d}")
+    if coalesced:
+        text = f"{RU_MONTHS[month-1]} {year} уже ждёт публикации (#{job_id}) — уйдёт актуальная версия."
+    else:
+        text = f"Публикация {RU_MONTHS[month-1]} {year} поставлена в очередь (#{job_id})."
+    await callback.message.answer(text, reply_markup=kb.as_markup())
+    await callback.answer("В очереди")
+
+@router.callback_query(F.data.startswith('pubxlsx:'))
+async def publish_xlsx(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для админа", show_alert=True); return
     try:
-        df = pd.read_excel(xlsx_path)
+        year, month = map(int, (callback.data or '').split(':', 1)[1].split('-', 1))
+    except Exception:
+        await callback.answer("Неверный месяц", show_alert=True); return
+    await callback.answer()
+    try:
+        export, count = await ADBI.run_read(export_month_schedule, year, month)
     except Exception as e:
-        await callback.message.answer(f"Не удалось прочитать XLSX перед публикацией: {e}")
-        await callback.answer()
+        await callback.message.answer(f"Не удалось сформировать XLSX: {e}")
         return
-
-    # Публикация в Google Sheets
     try:
-        sheet_url, sheet_title = publish_schedule_to_sheets(year, month, df)
+        await send_export(callback.message, export, f"График на {RU_MONTHS[month-1]} {year} — {count} событ.")
     except Exception as e:
-        await callback.message.answer(f"Ошибка публикации в Google Sheets: {e}")
-        await callback.answer();
-        return
-
-    caption = f"Опубликовано: {RU_MONTHS[month-1]} {year} — {count} событ."
-    if sheet_url:
-        caption += f"\nЛист: {sheet_title} — {sheet_url}"
-
-    await callback.message.answer(caption)
-    await callback.answer("Готово")
+        await callback.message.answer(f"Не удалось отправить файл: {e}")
+    finally:
+        release_export(export)
 
 @router.callback_query(F.data.startswith('unkemp:'), AssignUnknown.waiting)
 async def unknown_toggle_employee(callback: CallbackQuery, state: FSMContext):
@@ -233,16 +364,11 @@ async def unknown_toggle_employee(callback: CallbackQuery, state: FSMContext):
     await state.update_data(current_selected=list(selected))
 
     # Перерисуем клавиатуру на текущем сообщении
-    with DBI._conn() as con:
-        rows = con.execute("SELECT id, first_name, last_name FROM employees ORDER BY last_name, first_name").fetchall()
-    kb = InlineKeyboardBuilder()
-    for rid, fn, ln in rows:
-        mark = "✅" if rid in selected else "☐"
-        kb.button(text=f"{mark} {ln} {fn}", callback_data=f"unkemp:{rid}")
-    kb.button(text="Сохранить", callback_data="unksave")
-    kb.adjust(1)
+    rows = await ADBI.list_employees_names()
     try:
-        await callback.message.edit_reply_markup(reply_markup=kb.as_markup())
+        await callback.message.edit_reply_markup(
+            reply_markup=_unknown_spectacle_kb(rows, selected, data.get('current_candidates') or [])
+        )
     except Exception:
         pass
     await callback.answer()
@@ -260,37 +386,53 @@ async def unknown_save_current(callback: CallbackQuery, state: FSMContext):
     selected = list(set(data.get('current_selected') or []))
 
     # создаём/получаем спектакль и сохраняем сотрудников
-    DBI.upsert_spectacle(title)
-    sid = DBI.get_spectacle_id(title)
-    with DBI._conn() as con:
-        con.execute("DELETE FROM spectacle_employees WHERE spectacle_id=?", (sid,))
-        for eid in selected:
-            con.execute(
-                "INSERT OR IGNORE INTO spectacle_employees(spectacle_id, employee_id) VALUES(?,?)",
-                (sid, eid),
-            )
-        con.commit()
+    await ADBI.upsert_spectacle(title)
+    sid = await ADBI.get_spectacle_id(title)
+    await ADBI.set_spectacle_employee_ids(sid, selected)
 
     await state.update_data(unknown_titles=queue, current_selected=[])
     await callback.message.answer(f"Сохранено: «{title}» — назначено: {len(selected)}")
+    await _next_unknown_or_commit(callback, state)
+
+@router.callback_query(F.data.startswith('unkalias:'), AssignUnknown.waiting)
+async def unknown_pick_alias(callback: CallbackQuery, state: FSMContext):
+    """«Это «X»?» — незнакомое название запоминается как вариант X и дальше узнаётся само."""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("Только для админа", show_alert=True); return
+    try:
+        sid = int((callback.data or '').split(':', 1)[1])
+    except Exception:
+        await callback.answer(); return
+    data = await state.get_data()
+    queue = list(data.get('unknown_titles') or [])
+    known_title = await ADBI.get_spectacle_title(sid)
+    if not queue or not known_title:
+        await callback.answer("Спектакль не найден", show_alert=True); return
+    title = queue.pop(0)
+    await ADBI.add_spectacle_alias(normalize_title(title), sid)
+    await state.update_data(unknown_titles=queue, current_selected=[])
+    await callback.message.answer(f"Запомнил: «{title}» — это «{known_title}»")
+    await _next_unknown_or_commit(callback, state)
 
+async def _next_unknown_or_commit(callback: CallbackQuery, state: FSMContext):
+    data = await state.get_data()
+    queue = data.get('unknown_titles') or []
     if queue:
         # следующий неизвестный
         await _ask_unknown_spectacle(callback.message, state, queue[0])
         await callback.answer()
         return
 
-    # Очередь закончилась — повторяем импорт
+    # Очередь закончилась — применяем отложенные строки одной транзакцией
     st = await state.get_data()
-    p = st.get('import_path')
-    year = int(st.get('import_year'))
-    month = int(st.get('import_month'))
-    unknown_count, inserted, _ = import_events_from_excel(Path(p), year, month)
+    months = [tuple(ym) for ym in st.get('import_months') or []]
+    try:
+        diffs = await ADBI.run_write(commit_staged_import, st.get('import_upload'), months)
+    except Exception as e:
+        await callback.message.answer(f"Ошибка импорта: {e}")
+        await state.clear(); await callback.answer(); return
     await state.clear()
-    if unknown_count:
-        await callback.message.answer("Ещё остались неизвестные названия, повторим цикл импорта…")
-    else:
-        await callback.message.answer(f"Импорт завершён: {inserted} записей за {RU_MONTHS[month-1]} {year}")
+    await callback.message.answer(format_import_report(diffs, st.get('import_skipped')))
     await callback.answer()
 
 @router.message(F.text == "Посмотреть расписание")
@@ -335,7 +477,7 @@ async def view_schedule_day_pick(callback: CallbackQuery, state: FSMContext):
         return
 
     try:
-        text = fetch_schedule_for_date(day_dt)
+        text = await day_schedule_text(day_dt)
     except Exception as e:
         await callback.message.answer(f"Не удалось получить данные из Google Sheets: {e}")
         await callback.answer()
@@ -355,15 +497,49 @@ async def spectacles_table_export(message: Message, state: FSMContext):
         return
 
     try:
-        xlsx_path = export_spectacles_table()
+        export = await ADBI.run_read(export_spectacles_table)
     except Exception as e:
         await message.answer(f"Не удалось сформировать XLSX: {e}")
         return
 
     try:
-        await message.answer_document(
-            file_as_input(xlsx_path),
-            caption="Таблица спектаклей и сотрудников"
-        )
+        await send_export(message, export, "Таблица спектаклей и сотрудников")
     except Exception as e:
-        await message.answer(f"Не удалось отправить файл: {e}")
\ No newline at end of file
+        await message.answer(f"Не удалось отправить файл: {e}")
+    finally:
+        release_export(export)
+
+@router.message(F.text.lower() == "export_stats")
+async def export_stats(message: Message, state: FSMContext):
+    """Админская команда: состояние кэша готовых XLSX-выгрузок."""
+    if not is_admin(message.from_user.id):
+        return
+    st = export_cache_stats()
+    total = st["hits"] + st["misses"]
+    ratio = f"{st['hits'] * 100 // total}%" if total else "—"
+    await message.answer(
+        "Кэш выгрузок:\n"
+        f"попаданий: {st['hits']}, промахов: {st['misses']} (доля попаданий {ratio})\n"
+        f"записей: {st['entries']}, занято: {st['bytes'] // 1024} КиБ из {st['limit'] // 1024} КиБ\n"
+        f"вытеснено: {st['evictions']}"
+    )
+
+@router.message(F.text.lower() == "sheets_stats")
+async def sheets_stats_cmd(message: Message, state: FSMContext):
+    """Админская команда: вызовы Google Sheets API и кэш открытых таблиц/листов."""
+    if not is_admin(message.from_user.id):
+        return
+    st = sheets_stats()
+    h = st["handles"]
+    lines = [
+        "Google Sheets:",
+        f"клиент: {'авторизован' if st['authorized'] else 'ещё не создан'}",
+        f"handles: попаданий {h['hits']}, промахов {h['misses']} (таблиц {h['spreadsheets']}, листов {h['worksheets']})",
+    ]
+    for op, o in sorted(st["ops"].items()):
+        avg = o["ms"] / o["calls"] if o["calls"] else 0
+        lines.append(f"{op}: {o['calls']} выз., ошибок {o['errors']}, ср. {avg:.0f} мс, макс. {o['max_ms']:.0f} мс")
+    lines.append(f"ожидание квоты: {st['limiter']['waits']} раз, {st['limiter']['ms'] / 1000:.1f} с")
+    lines.append(f"очередь публикаций: ждут {await ADBI.count_publish_jobs('queued')}, "
+                 f"идёт {await ADBI.count_publish_jobs('running')}")
+    await message.answer("\n".join(lines))
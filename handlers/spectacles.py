@@ -5,7 +5,7 @@ from aiogram.fsm.state import StatesGroup, State
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.exceptions import TelegramBadRequest
 from config import is_admin
-from db import DBI
+from db import ADBI
 from keyboards.inline import get_spectacles_inline_kb, get_edit_employees_inline_kb, get_spectacle_info_kb
 
 class AddSpectacle(StatesGroup):
@@ -17,8 +17,8 @@ class RenameSpectacle(StatesGroup):
 async def handle_spectacles(message: Message, state: FSMContext):
     if not is_admin(message.from_user.id):
         await message.answer("Только для админа"); return
-    txt = "Выберите спектакль или добавьте новый:" if DBI.list_spectacles() else "Список пуст. Нажмите «➕ Добавить»."
-    await message.answer(txt, reply_markup=get_spectacles_inline_kb())
+    txt = "Выберите спектакль или добавьте новый:" if await ADBI.list_spectacles() else "Список пуст. Нажмите «➕ Добавить»."
+    await message.answer(txt, reply_markup=await ADBI.run_read(get_spectacles_inline_kb))
 
 async def spectacles_menu_router(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
@@ -36,21 +36,10 @@ async def spectacles_menu_router(callback: CallbackQuery, state: FSMContext):
         except Exception:
             await callback.answer("Ошибка формата", show_alert=True); return
         # Fetch title and employees by spectacle id
-        with DBI._conn() as con:
-            row = con.execute("SELECT title FROM spectacles WHERE id=?", (sid,)).fetchone()
-            if not row:
-                await callback.answer("Не найдено", show_alert=True); return
-            title = row[0]
-            rows = con.execute(
-                """
-                SELECT e.display FROM spectacle_employees se
-                JOIN employees e ON e.id = se.employee_id
-                WHERE se.spectacle_id=?
-                ORDER BY e.last_name, e.first_name
-                """,
-                (sid,),
-            ).fetchall()
-        emps = [r[0] for r in rows]
+        title = await ADBI.get_spectacle_title(sid)
+        if title is None:
+            await callback.answer("Не найдено", show_alert=True); return
+        emps = await ADBI.get_spectacle_employees_by_id(sid)
         await callback.message.answer(
             f"Спектакль: {title}\nСотрудники: {', '.join(emps) if emps else 'нет'}",
             reply_markup=get_spectacle_info_kb(sid),
@@ -63,7 +52,8 @@ async def spectacles_menu_router(callback: CallbackQuery, state: FSMContext):
             sid = int(data.rsplit(":", 1)[-1])
         except Exception:
             await callback.answer("Ошибка формата", show_alert=True); return
-        await callback.message.answer("Изменение списка сотрудников:", reply_markup=get_edit_employees_inline_kb(sid))
+        kb = await ADBI.run_read(get_edit_employees_inline_kb, sid)
+        await callback.message.answer("Изменение списка сотрудников:", reply_markup=kb)
         await callback.answer()
         return
     await callback.answer("Выберите спектакль из списка или '➕ Добавить'.", show_alert=True)
@@ -76,7 +66,8 @@ async def edit_employees_start(callback: CallbackQuery, state: FSMContext):
         sid = int(data.rsplit(":", 1)[-1])
     except Exception:
         await callback.answer("Ошибка формата", show_alert=True); return
-    await callback.message.answer("Изменение списка сотрудников:", reply_markup=get_edit_employees_inline_kb(sid))
+    kb = await ADBI.run_read(get_edit_employees_inline_kb, sid)
+    await callback.message.answer("Изменение списка сотрудников:", reply_markup=kb)
     await callback.answer()
 
 async def edit_employees_toggle(callback: CallbackQuery, state: FSMContext):
@@ -87,8 +78,8 @@ async def edit_employees_toggle(callback: CallbackQuery, state: FSMContext):
         sid = int(sid_s); eid = int(eid_s)
     except Exception:
         await callback.answer("Ошибка формата", show_alert=True); return
-    DBI.toggle_spectacle_employee(sid, eid)
-    kb = get_edit_employees_inline_kb(sid)
+    await ADBI.toggle_spectacle_employee(sid, eid)
+    kb = await ADBI.run_read(get_edit_employees_inline_kb, sid)
     try:
         await callback.message.edit_reply_markup(reply_markup=kb)
     except TelegramBadRequest as e:
@@ -104,16 +95,9 @@ async def edit_employees_done(callback: CallbackQuery, state: FSMContext):
         sid = int((callback.data or "").split(":", 1)[1])
     except Exception:
         await callback.answer("Готово"); return
-    with DBI._conn() as con:
-        row = con.execute("SELECT title FROM spectacles WHERE id=?", (sid,)).fetchone()
-        title = row[0] if row else "Спектакль"
-        rows = con.execute("""
-            SELECT e.display FROM spectacle_employees se
-            JOIN employees e ON e.id = se.employee_id
-            WHERE se.spectacle_id=?
-            ORDER BY e.last_name, e.first_name
-        """, (sid,)).fetchall()
-    final_list = ", ".join(r[0] for r in rows) if rows else "нет"
+    title = await ADBI.get_spectacle_title(sid) or "Спектакль"
+    emps = await ADBI.get_spectacle_employees_by_id(sid)
+    final_list = ", ".join(emps) if emps else "нет"
     await callback.message.answer(f"Сохранено. {title}: {final_list}")
     await callback.answer()
 
@@ -121,7 +105,7 @@ async def add_spectacle_name(message: Message, state: FSMContext):
     name = (message.text or "").strip()
     if not name:
         await message.answer("Название не может быть пустым. Введите ещё раз."); return
-    DBI.upsert_spectacle(name)
+    await ADBI.upsert_spectacle(name)
     await state.clear()
     await message.answer(f"Сохранено!\nСпектакль «{name}» добавлен.")
 
@@ -132,14 +116,9 @@ async def delete_spectacle(callback: CallbackQuery, state: FSMContext):
         sid = int((callback.data or "").split(":", 1)[1])
     except Exception:
         await callback.answer("Ошибка формата", show_alert=True); return
-    with DBI._conn() as con:
-        row = con.execute("SELECT title FROM spectacles WHERE id=?", (sid,)).fetchone()
-        if not row:
-            await callback.answer("Не найдено", show_alert=True); return
-        title = row[0]
-        con.execute("DELETE FROM spectacles WHERE id=?", (sid,))
-        con.execute("DELETE FROM spectacle_employees WHERE spectacle_id=?", (sid,))
-        con.commit()
+    title = await ADBI.delete_spectacle(sid)
+    if title is None:
+        await callback.answer("Не найдено", show_alert=True); return
     await callback.message.answer(f"Спектакль «{title}» удалён.")
     await callback.answer()
 
@@ -172,9 +151,7 @@ async def rename_spectacle_save(message: Message, state: FSMContext):
         return
 
     try:
-        with DBI._conn() as con:
-            con.execute("UPDATE spectacles SET title=? WHERE id=?", (new_title, int(sid)))
-            con.commit()
+        await ADBI.rename_spectacle(int(sid), new_title)
     except Exception as e:
         await message.answer("Ошибка при сохранении названия: " + str(e))
         return
@@ -199,6 +176,6 @@ async def edit_spectacle_start(callback: CallbackQuery, state: FSMContext):
 
     await callback.message.answer(
         "Изменение списка сотрудников:",
-        reply_markup=get_edit_employees_inline_kb(sid)
+        reply_markup=await ADBI.run_read(get_edit_employees_inline_kb, sid)
     )
     await callback.answer()
\ No newline at end of file
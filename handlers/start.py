@@ -4,7 +4,7 @@ from aiogram.fsm.context import FSMContext
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from keyboards.reply import get_user_busy_reply_kb
-from db import DBI
+from db import ADBI
 from config import ADMIN_ID
 
 
@@ -16,17 +16,18 @@ async def cmd_start(message: Message, state: FSMContext):
     tg_id = user.id
 
     # Если уже авторизован — показываем обычное меню (админские/пользовательские кнопки решает reply-клавиатура)
-    if DBI.is_authorized(tg_id):
-        await message.answer("Выберите раздел:", reply_markup=get_user_busy_reply_kb(tg_id))
+    if await ADBI.is_authorized(tg_id):
+        kb = await ADBI.run_read(get_user_busy_reply_kb, tg_id)
+        await message.answer("Выберите раздел:", reply_markup=kb)
         return
 
     # Если уже есть заявка на авторизацию — просто напоминаем
-    if DBI.get_pending_auth(tg_id):
+    if await ADBI.get_pending_auth(tg_id):
         await message.answer("Новый пользователь. Нужна авторизация.\nЗаявка уже отправлена администратору — ожидайте.")
         return
 
     # Кладём запрос в очередь
-    DBI.add_pending_auth(
+    await ADBI.add_pending_auth(
         tg_id=tg_id,
         first_name=user.first_name,
         last_name=user.last_name,
@@ -29,9 +29,7 @@ def get_employees_inline_kb() -> InlineKeyboardMarkup:
     return b.as_markup()
 
 def get_edit_employees_inline_kb(sid: int) -> InlineKeyboardMarkup:
-    with DBI._conn() as con:
-        rows = con.execute("SELECT employee_id FROM spectacle_employees WHERE spectacle_id=?", (sid,)).fetchall()
-        current = {r[0] for r in rows}
+    current = DBI.get_spectacle_employee_ids_by_id(sid)
     b = InlineKeyboardBuilder()
     for eid, disp in DBI.list_employees_full():
         mark = "✅ " if eid in current else ""
@@ -14,7 +14,7 @@ def get_user_busy_reply_kb(user_id: int) -> ReplyKeyboardMarkup:
             [KeyboardButton(text="Спектакли"), KeyboardButton(text="Сотрудники")],
             [KeyboardButton(text="AI заполнить шаблон")],
             [KeyboardButton(text="Импорт расписания")],
-            [KeyboardButton(text="Сделать график")],
+            [KeyboardButton(text="Сделать график"), KeyboardButton(text="Предпросмотр графика")],
             [KeyboardButton(text="Опубликовать")],
             [KeyboardButton(text="Спектакли (таблица)")]
         ]
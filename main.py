@@ -3,11 +3,14 @@ import asyncio
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from config import BOT_TOKEN
+from db import DBI, ADBI
 from routing import register
+from services.auto_assign import set_notify_loop
 
 # фоновые задачи
 from handlers.admin import monthly_broadcast_task
 from services.busy_flow import monthly_reminders_task
+from services.publish_queue import publish_worker
 
 async def main():
     if not BOT_TOKEN:
@@ -16,11 +19,14 @@ async def main():
     bot = Bot(BOT_TOKEN)
     dp = Dispatcher(storage=MemoryStorage())
     register(dp)
+    # сводки планировщика отправляются из потока ADBI в этот loop
+    set_notify_loop(asyncio.get_running_loop())
 
     # ---- старт фоновых задач (живут всё время работы процесса) ----
     bg_tasks = [
         asyncio.create_task(monthly_broadcast_task(bot)),   # hourly loop
         asyncio.create_task(monthly_reminders_task(bot)),   # reminders on 12 и 24
+        asyncio.create_task(publish_worker(bot)),           # очередь публикаций в Google Sheets
     ]
 
     print("Bot is running… Press Ctrl+C to stop.")
@@ -31,6 +37,8 @@ async def main():
         for t in bg_tasks:
             t.cancel()
         await asyncio.gather(*bg_tasks, return_exceptions=True)
+        ADBI.close()
+        DBI.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,207 @@
+# migrations.py
+"""Numbered schema migrations for db.DB.
+
+Each migration is ``(version, name, step)``; ``step(con)`` must be idempotent
+(``IF NOT EXISTS``, column checks), so re-running it over a partially migrated
+database is harmless. Applied versions are recorded in ``schema_version``.
+New migrations are appended to ``MIGRATIONS`` with the next number — never
+edit or renumber one that has already shipped.
+"""
+import sqlite3
+from datetime import datetime, UTC
+
+
+def _columns(con: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in con.execute(f"PRAGMA table_info({table})").fetchall()}
+
+
+def add_column_if_missing(con: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    if column not in _columns(con, table):
+        con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _m001_hot_path_indexes(con: sqlite3.Connection) -> None:
+    # помесячные выборки (диапазоны по date) и подсчёты назначений
+    con.execute("CREATE INDEX IF NOT EXISTS idx_events_date ON events(date)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_events_employee ON events(employee)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_events_duty_employee ON events(duty_employee)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_employee_busy_date ON employee_busy(date_str)")
+    # get_employee_by_tg / is_authorized — на каждое сообщение
+    con.execute("CREATE INDEX IF NOT EXISTS idx_employees_tg_id ON employees(tg_id)")
+
+
+def _m002_event_assignee_ids(con: sqlite3.Connection) -> None:
+    # Назначения храним как id сотрудника; текстовые employee/duty_employee остаются
+    # для пометок («НАКЛАДКА!!!», имена из импорта) и как снимок имени на момент записи.
+    add_column_if_missing(con, "events", "employee_id", "INTEGER REFERENCES employees(id) ON DELETE SET NULL")
+    add_column_if_missing(con, "events", "duty_employee_id", "INTEGER REFERENCES employees(id) ON DELETE SET NULL")
+    con.execute(
+        """
+        UPDATE events SET employee_id = (SELECT e.id FROM employees e WHERE e.display = events.employee)
+        WHERE employee_id IS NULL AND employee IS NOT NULL AND employee <> ''
+        """
+    )
+    con.execute(
+        """
+        UPDATE events SET duty_employee_id = (SELECT e.id FROM employees e WHERE e.display = events.duty_employee)
+        WHERE duty_employee_id IS NULL AND duty_employee IS NOT NULL AND duty_employee <> ''
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_events_employee_id ON events(employee_id, date)")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_events_duty_employee_id ON events(duty_employee_id, date)")
+
+
+def _m003_drop_text_assignee_indexes(con: sqlite3.Connection) -> None:
+    # После перехода на employee_id/duty_employee_id по тексту никто не ищет —
+    # эти индексы только удорожают запись.
+    con.execute("DROP INDEX IF EXISTS idx_events_employee")
+    con.execute("DROP INDEX IF EXISTS idx_events_duty_employee")
+
+
+def _m004_sent_documents(con: sqlite3.Connection) -> None:
+    # Telegram file_id уже загруженных выгрузок: одинаковые байты повторно не грузим
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS sent_documents (
+            sha256 TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            sent_at TEXT NOT NULL,
+            PRIMARY KEY (sha256, filename)
+        )
+        """
+    )
+
+
+def _m005_staged_events(con: sqlite3.Connection) -> None:
+    # Разобранные, но ещё не применённые строки импорта (ждут разбора незнакомых названий)
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS staged_events (
+            upload_id TEXT NOT NULL,
+            staged_at TEXT NOT NULL,
+            date TEXT NOT NULL,
+            type TEXT,
+            title TEXT,
+            time TEXT,
+            location TEXT,
+            city TEXT,
+            employee TEXT,
+            info TEXT,
+            duty_employee TEXT
+        )
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_staged_events_upload ON staged_events(upload_id)")
+
+
+def _m006_spectacle_aliases(con: sqlite3.Connection) -> None:
+    # Подтверждённые админом варианты названий (ключ services.titles.normalize_title)
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS spectacle_aliases (
+            alias TEXT PRIMARY KEY,
+            spectacle_id INTEGER NOT NULL REFERENCES spectacles(id) ON DELETE CASCADE
+        )
+        """
+    )
+
+
+def _m007_schedule_replica(con: sqlite3.Connection) -> None:
+    # Локальная копия опубликованных листов Google Sheets для «Посмотреть расписание»
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schedule_replica (
+            month TEXT PRIMARY KEY,
+            header TEXT NOT NULL,
+            synced_at TEXT NOT NULL
+        )
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schedule_replica_rows (
+            month TEXT NOT NULL REFERENCES schedule_replica(month) ON DELETE CASCADE,
+            pos INTEGER NOT NULL,
+            day TEXT,
+            cells TEXT NOT NULL,
+            PRIMARY KEY (month, pos)
+        )
+        """
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_schedule_replica_rows_day ON schedule_replica_rows(day)")
+
+
+def _m008_publish_jobs(con: sqlite3.Connection) -> None:
+    # Фоновая очередь публикаций в Google Sheets (services.publish_queue)
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS publish_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            year INTEGER NOT NULL,
+            month INTEGER NOT NULL,
+            chat_id INTEGER,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            last_error TEXT
+        )
+        """
+    )
+    # на месяц — не больше одной ждущей задачи: повторные публикации склеиваются
+    con.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_publish_jobs_queued_month "
+        "ON publish_jobs(year, month) WHERE status='queued'"
+    )
+    con.execute("CREATE INDEX IF NOT EXISTS idx_publish_jobs_due ON publish_jobs(status, next_attempt_at)")
+
+
+MIGRATIONS = [
+    (1, "hot-path indexes", _m001_hot_path_indexes),
+    (2, "integer assignee ids on events", _m002_event_assignee_ids),
+    (3, "drop text assignee indexes", _m003_drop_text_assignee_indexes),
+    (4, "sent documents file_id cache", _m004_sent_documents),
+    (5, "staged import rows", _m005_staged_events),
+    (6, "spectacle title aliases", _m006_spectacle_aliases),
+    (7, "published schedule replica", _m007_schedule_replica),
+    (8, "publish job queue", _m008_publish_jobs),
+]
+
+
+def current_version(con: sqlite3.Connection) -> int:
+    row = con.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def apply_migrations(con: sqlite3.Connection) -> list[int]:
+    """Применяет недостающие миграции по порядку. Возвращает номера применённых."""
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+        """
+    )
+    con.commit()
+    applied = []
+    version_now = current_version(con)
+    for version, name, step in MIGRATIONS:
+        if version <= version_now:
+            continue
+        con.execute("BEGIN")
+        try:
+            step(con)
+            con.execute(
+                "INSERT INTO schema_version(version, name, applied_at) VALUES(?,?,?)",
+                (version, name, datetime.now(UTC).isoformat()),
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        applied.append(version)
+    return applied
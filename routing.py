@@ -12,16 +12,22 @@ from handlers.excel import (
     import_schedule_start,
     handle_excel_upload,
     handle_excel_month_pick,
+    season_confirm,
+    season_cancel,
     handle_make_schedule,
     handle_make_schedule_pick,
+    handle_preview_schedule,
+    handle_preview_schedule_pick,
     UploadExcel,
     unknown_toggle_employee,
     unknown_save_current,
+    unknown_pick_alias,
     AssignUnknown,
     view_schedule_start,
     view_schedule_pick,
     publish_start,
     publish_month_pick,
+    publish_xlsx,
 )
 from handlers import excel
 from handlers.admin import handle_auto_assign, auth_list_employees, auth_approve, auth_deny, auth_new_start, auth_new_last_name, auth_new_first_name, NewAuthEmployee
@@ -43,6 +49,7 @@ def register(dp: Dispatcher):
     dp.message.register(handle_auto_assign, F.text.regexp(r"(?i)^автоназначение"))
     dp.message.register(import_schedule_start, F.text.lower() == "импорт расписания")
     dp.message.register(handle_make_schedule, F.text.lower() == "сделать график")
+    dp.message.register(handle_preview_schedule, F.text.lower() == "предпросмотр графика")
     dp.message.register(publish_start, F.text == "Опубликовать")
     dp.message.register(admin_busy_panel, F.text.lower() == "busy_admin")
 
@@ -73,6 +80,7 @@ def register(dp: Dispatcher):
     # unknown spectacle handlers (after Excel registrations)
     dp.callback_query.register(unknown_toggle_employee, StateFilter(AssignUnknown.waiting), F.data.startswith('unkemp:'))
     dp.callback_query.register(unknown_save_current,    StateFilter(AssignUnknown.waiting), F.data == 'unksave')
+    dp.callback_query.register(unknown_pick_alias,      StateFilter(AssignUnknown.waiting), F.data.startswith('unkalias:'))
 
     # admin auth callbacks
     dp.callback_query.register(auth_list_employees, F.data.startswith('auth:list:'))
@@ -120,8 +128,12 @@ def register(dp: Dispatcher):
         (F.document | F.photo)
     )
     dp.callback_query.register(handle_excel_month_pick, StateFilter(UploadExcel.waiting_for_month), F.data.startswith('xlsmonth:'))
+    dp.callback_query.register(season_confirm, StateFilter(UploadExcel.waiting_for_confirm), F.data == 'seasonok')
+    dp.callback_query.register(season_cancel,  StateFilter(UploadExcel.waiting_for_confirm), F.data == 'seasonno')
     dp.callback_query.register(handle_make_schedule_pick, F.data.startswith('mkmonth:'))
+    dp.callback_query.register(handle_preview_schedule_pick, F.data.startswith('pvmonth:'))
     dp.callback_query.register(publish_month_pick, F.data.startswith('pubmonth:'))
+    dp.callback_query.register(publish_xlsx, F.data.startswith('pubxlsx:'))
 
     # AI fill FSM
     dp.message.register(ai_fill_cancel,  StateFilter(AIFillStates.waiting_for_file), F.text.lower() == "отмена")
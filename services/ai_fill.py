@@ -1,6 +1,7 @@
 # services/ai_fill.py
 from __future__ import annotations
 from pathlib import Path
+import asyncio
 import base64
 import csv
 import io
@@ -12,7 +13,8 @@ from openai import OpenAI
 from openpyxl import Workbook
 from openpyxl.styles import Font, Alignment
 from .prompt import SYSTEM_PROMPT
-from config import OPENAI_API_KEY, GPT_MODEL
+from .pdf_extract import extract_schedule_pdf
+from config import OPENAI_API_KEY, GPT_MODEL, PDF_MIN_CONFIDENCE
 
 client = OpenAI(api_key=OPENAI_API_KEY)
 
@@ -132,7 +134,10 @@ def _human_ru_date(d: _dt.date) -> str:
 def _normalize_csv(csv_text: str) -> list[list[str]]:
     f = io.StringIO(csv_text)
     reader = csv.reader(f)
-    rows = [[c.strip() for c in r] for r in reader]
+    return _normalize_rows([[c.strip() for c in r] for r in reader])
+
+
+def _normalize_rows(rows: list[list[str]]) -> list[list[str]]:
     if not rows:
         return [CSV_HEADERS]
 
@@ -226,6 +231,18 @@ async def build_excel_from_file(path: Path) -> FSInputFile:
     )
 
     ext = (path.suffix or '').lower()
+    out_path = path.parent / f"ai_out_{path.stem}.xlsx"
+    if ext == '.pdf':
+        # Сначала локальный разбор — быстро и бесплатно; в GPT только если таблица не узналась
+        try:
+            local_rows, confidence = await asyncio.to_thread(extract_schedule_pdf, path)
+        except Exception as e:
+            print(f"Локальный разбор PDF не удался: {e}")
+            local_rows, confidence = [], 0.0
+        if local_rows and confidence >= PDF_MIN_CONFIDENCE:
+            _rows_to_xlsx(_normalize_rows([CSV_HEADERS] + local_rows), out_path)
+            return FSInputFile(str(out_path))
+
     if ext in {'.jpg', '.jpeg', '.png', '.webp'}:
         content = [
             {"type": "input_text", "text": instructions},
@@ -250,7 +267,6 @@ async def build_excel_from_file(path: Path) -> FSInputFile:
     # Нормализуем: полное покрытие месяца + сохранение всех строк
     rows = _normalize_csv(csv_text)
 
-    out_path = path.parent / f"ai_out_{path.stem}.xlsx"
     _rows_to_xlsx(rows, out_path)
 
     return FSInputFile(str(out_path))
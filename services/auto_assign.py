@@ -1,13 +1,17 @@
 # services/auto_assign.py
-from config import ADMIN_ID, RU_MONTHS
+from config import ADMIN_ID, RU_MONTHS, ASSIGN_MODE
 from aiogram import Bot
 import os
 import asyncio
 import calendar
 # services/auto_assign.py
 from db import DBI
+from services.flow import MinCostFlow
+from services.titles import TitleIndex
+from utils.dates import human_ru_date
 
 TYPE_ORDER = {"монтаж":0, "репетиция":1, "репетиции":1, "спектакль":2}
+CONFLICT = "НАКЛАДКА!!!"
 
 def _normalize_type(tp: str | None) -> str:
     if not tp: return "спектакль"
@@ -17,23 +21,78 @@ def _normalize_type(tp: str | None) -> str:
     if s.startswith("спект"):  return "спектакль"
     return s
 
-def _get_qualified_employee_ids(title: str) -> set[int]:
-    return DBI.get_spectacle_employee_ids(title)
+# --- снимок месяца
+# Планировщик читает месяц целиком несколькими запросами, считает всё в памяти
+# и пишет изменения одной транзакцией (см. apply_changes).
 
-def _date_busy_map_for_employees(emp_ids: set[int]) -> dict[int, set[str]]:
-    return {eid: set(DBI.list_busy_dates(eid)) for eid in emp_ids}
+EVENT_FIELDS = ("id", "date", "type", "title", "time", "city", "employee", "employee_id", "duty_employee", "duty_employee_id")
+
+def load_month_snapshot(year: int | None = None, month: int | None = None) -> dict:
+    """События месяца (или все, если месяц не задан), связки спектаклей, занятость и сотрудники.
+    Возвращает dict: events, qualified {title: {employee_id}}, busy {employee_id: {date}}, employees [(id, display, last, first)]."""
+    cols = ", ".join(EVENT_FIELDS)
+    with DBI._read_conn() as con:
+        if year and month:
+            rows = con.execute(f"SELECT {cols} FROM events WHERE date BETWEEN ? AND ? ORDER BY id", DBI.month_range(year, month)).fetchall()
+        else:
+            rows = con.execute(f"SELECT {cols} FROM events ORDER BY id").fetchall()
+        qualified: dict[str, set[int]] = {}
+        for title, eid in con.execute(
+            "SELECT s.title, se.employee_id FROM spectacle_employees se JOIN spectacles s ON s.id = se.spectacle_id"
+        ):
+            qualified.setdefault(title, set()).add(eid)
+        # варианты написания («Репетиция «X»», псевдонимы из импорта) — к тем же людям, что и X
+        unresolved = {r[3] for r in rows if r[3]} - qualified.keys()
+        if unresolved:
+            titles = [tuple(r) for r in con.execute("SELECT id, title FROM spectacles")]
+            index, by_id = TitleIndex(titles, DBI.list_spectacle_aliases()), dict(titles)
+            for title in unresolved:
+                sid = index.resolve(title)
+                if sid is not None and by_id[sid] in qualified:
+                    qualified[title] = qualified[by_id[sid]]
+        employees = [tuple(r) for r in con.execute("SELECT id, display, last_name, first_name FROM employees ORDER BY last_name, first_name")]
+        if year and month:
+            busy = DBI.list_busy_for_month(year, month)
+        else:
+            busy = {}
+            for eid, ds in con.execute("SELECT employee_id, date_str FROM employee_busy"):
+                busy.setdefault(eid, set()).add(ds)
+    return {
+        "year": year, "month": month,
+        "events": [dict(zip(EVENT_FIELDS, r)) for r in rows],
+        "qualified": qualified,
+        "busy": busy,
+        "employees": employees,
+    }
+
+def _is_assigned(ev: dict) -> bool:
+    return bool(ev.get("employee_id") is not None or ev.get("employee"))
 
 def _already_assigned_dates_map(events: list[dict]) -> dict[str, set[int]]:
     m: dict[str, set[int]] = {}
     for ev in events:
-        d = ev.get("date"); disp = ev.get("employee")
-        if not d or not disp: continue
-        eid = DBI.get_employee_id(disp)
-        if eid is not None:
-            m.setdefault(d, set()).add(eid)
+        d = ev.get("date"); eid = ev.get("employee_id")
+        if not d or eid is None: continue
+        m.setdefault(d, set()).add(eid)
     return m
 
-def _pick_employee_for_block(block: list[dict], qualified_ids: set[int], busy_map: dict[int, set[str]], assigned_dates: dict[str, set[int]], prefer_not: int | None = None) -> int | None:
+def _main_counts(events: list[dict]) -> dict[tuple[int, str], int]:
+    """Число назначений по (employee_id, 'YYYY-MM')."""
+    counts: dict[tuple[int, str], int] = {}
+    for ev in events:
+        if ev["employee_id"] is not None:
+            k = (ev["employee_id"], ev["date"][:7])
+            counts[k] = counts.get(k, 0) + 1
+    return counts
+
+def _duty_counts(events: list[dict]) -> dict[int, int]:
+    counts: dict[int, int] = {}
+    for ev in events:
+        if ev["duty_employee_id"] is not None:
+            counts[ev["duty_employee_id"]] = counts.get(ev["duty_employee_id"], 0) + 1
+    return counts
+
+def _pick_employee_for_block(block: list[dict], qualified_ids: set[int], busy_map: dict[int, set[str]], assigned_dates: dict[str, set[int]], main_counts: dict[tuple[int, str], int], prefer_not: int | None = None) -> int | None:
     if not block or not qualified_ids: return None
     date = block[0].get("date")
     if not date: return None
@@ -43,96 +102,15 @@ def _pick_employee_for_block(block: list[dict], qualified_ids: set[int], busy_ma
         if eid in assigned_dates.get(date, set()): continue
         candidates.append(eid)
     if not candidates: return None
-    try:
-        y = int(date[0:4]); m = int(date[5:7])
-    except Exception:
-        y, m = 1970, 1
-    scored = [(DBI.count_assigned_for_month(eid, y, m), eid) for eid in candidates]
+    ym = date[:7]
+    scored = [(main_counts.get((eid, ym), 0), eid) for eid in candidates]
     scored.sort()
     ordered = [eid for _, eid in scored]
     if prefer_not is not None and len(ordered) > 1 and ordered[0] == prefer_not:
         return ordered[1]
     return ordered[0]
 
-def _update_event_employee_by_ids(event_ids: list[int], employee_id: int):
-    with DBI._conn() as con:
-        row = con.execute("SELECT display FROM employees WHERE id=?", (employee_id,)).fetchone()
-        if not row: return
-        disp = row[0]
-        for eid in event_ids:
-            con.execute("UPDATE events SET employee=? WHERE id=?", (disp, eid))
-        con.commit()
-
-# Set a literal value into the employee field for given event ids
-def _update_event_employee_literal(event_ids: list[int], value: str):
-    if not event_ids:
-        return
-    with DBI._conn() as con:
-        for eid in event_ids:
-            con.execute("UPDATE events SET employee=? WHERE id=?", (value, eid))
-        con.commit()
-
-def _all_employee_ids() -> list[int]:
-    with DBI._conn() as con:
-        rows = con.execute("SELECT id FROM employees ORDER BY last_name, first_name").fetchall()
-        return [r[0] for r in rows]
-
-def _employee_display_by_id(employee_id: int) -> str | None:
-    with DBI._conn() as con:
-        row = con.execute("SELECT display FROM employees WHERE id=?", (employee_id,)).fetchone()
-        return row[0] if row else None
-
-def _count_duty_for_month(employee_id: int, year: int, month: int) -> int:
-    prefix = f"{year:04d}-{month:02d}-"
-    with DBI._conn() as con:
-        row = con.execute(
-            "SELECT COUNT(*) FROM events WHERE duty_employee IS NOT NULL AND duty_employee <> '' AND duty_employee IN (SELECT display FROM employees WHERE id=?) AND date LIKE ?",
-            (employee_id, prefix + '%'),
-        ).fetchone()
-        return int(row[0] if row and row[0] is not None else 0)
-
-def _assigned_main_set_for_date(date_str: str) -> set[int]:
-    """Возвращает множество id сотрудников, назначенных в поле employee на заданную дату."""
-    with DBI._conn() as con:
-        rows = con.execute(
-            "SELECT DISTINCT e.id FROM events ev JOIN employees e ON e.display = ev.employee WHERE ev.date=?",
-            (date_str,),
-        ).fetchall()
-        return {r[0] for r in rows}
-
-def _set_duty_for_date(date_str: str, duty_display: str) -> int:
-    """Ставит (или обновляет) дежурного на дату. Если событий нет — добавляет пустую запись дня.
-    Возвращает число обновлённых/вставленных строк events."""
-    updated = 0
-    with DBI._conn() as con:
-        cur = con.execute("UPDATE events SET duty_employee=? WHERE date=?", (duty_display, date_str))
-        updated += cur.rowcount
-        if updated == 0:
-            # Нет событий в этот день — создаём отдельную запись дня
-            con.execute(
-                "INSERT INTO events(date, type, title, time, location, city, employee, info, duty_employee) VALUES(?,?,?,?,?,?,?,?,?)",
-                (date_str, None, None, None, None, None, None, None, duty_display),
-            )
-            updated = 1
-        con.commit()
-    return updated
-
-def _set_duty_literal(date_str: str, value: str) -> int:
-    """Ставит буквальный текст в duty_employee на дату (или создаёт пустую запись дня)."""
-    updated = 0
-    with DBI._conn() as con:
-        cur = con.execute("UPDATE events SET duty_employee=? WHERE date=?", (value, date_str))
-        updated += cur.rowcount
-        if updated == 0:
-            con.execute(
-                "INSERT INTO events(date, type, title, time, location, city, employee, info, duty_employee) VALUES(?,?,?,?,?,?,?,?,?)",
-                (date_str, None, None, None, None, None, None, None, value),
-            )
-            updated = 1
-        con.commit()
-    return updated
-
-def _pick_duty_for_date(date_str: str, candidate_ids: list[int], busy_map: dict[int, set[str]], forbidden_ids: set[int], year: int, month: int, prefer_not: int | None = None) -> int | None:
+def _pick_duty_for_date(date_str: str, candidate_ids: list[int], busy_map: dict[int, set[str]], forbidden_ids: set[int], main_counts: dict[tuple[int, str], int], duty_counts: dict[int, int], prefer_not: int | None = None) -> int | None:
     """Выбираем дежурного на дату с учётом занятости и баланса (минимум рабочих дней = employee+дюти).
     forbidden_ids — те, кто уже назначен в employee в этот день (должны отличаться)."""
     # Отфильтровать занятых и запрещённых
@@ -146,11 +124,8 @@ def _pick_duty_for_date(date_str: str, candidate_ids: list[int], busy_map: dict[
     if not pool:
         return None
     # Баланс: считаем employee + duty за месяц
-    scored = []
-    for eid in pool:
-        main_cnt = DBI.count_assigned_for_month(eid, year, month)
-        duty_cnt = _count_duty_for_month(eid, year, month)
-        scored.append((main_cnt + duty_cnt, eid))
+    ym = date_str[:7]
+    scored = [(main_counts.get((eid, ym), 0) + duty_counts.get(eid, 0), eid) for eid in pool]
     scored.sort()
     # Избегаем подряд того же дежурного, если есть альтернатива
     if prefer_not is not None and len(scored) > 1 and scored[0][1] == prefer_not:
@@ -160,68 +135,27 @@ def _pick_duty_for_date(date_str: str, candidate_ids: list[int], busy_map: dict[
                 return cand
     return scored[0][1] if scored else None
 
-def assign_duty_for_month(year: int, month: int) -> int:
-    """Назначает дежурного сотрудника на КАЖДЫЙ день месяца.
-    Правила:
-      - дежурный ≠ любой из назначенных по employee в этот день;
-      - учитывать занятость (employee_busy);
-      - не зависит от спектаклей/связок;
-      - балансировать суммарные рабочие дни за месяц (employee + дежурства).
-    Возвращает число затронутых строк events."""
-    # Подготовим пул кандидатов и карту занятости
-    all_ids = _all_employee_ids()
-    busy_map = {eid: set(DBI.list_busy_dates(eid)) for eid in all_ids}
-
-    total_updated = 0
-    days_in_month = calendar.monthrange(year, month)[1]
-    last_duty_id: int | None = None
-    for d in range(1, days_in_month + 1):
-        date_str = f"{year:04d}-{month:02d}-{d:02d}"
-        forbidden = _assigned_main_set_for_date(date_str)
-        eid = _pick_duty_for_date(date_str, all_ids, busy_map, forbidden, year, month, prefer_not=last_duty_id)
-        if eid is None:
-            # Полная недоступность — фиксируем «НАКЛАДКА!!!» в duty_employee
-            total_updated += _set_duty_literal(date_str, "НАКЛАДКА!!!")
-            last_duty_id = None
-            continue
-        disp = _employee_display_by_id(eid)
-        if not disp:
-            last_duty_id = None
-            continue
-        total_updated += _set_duty_for_date(date_str, disp)
-        last_duty_id = eid
-    return total_updated
+def _blocks(events: list[dict]) -> dict[tuple, list[dict]]:
+    """Группирует события в блоки (дата, тип, спектакль, город) — один исполнитель на блок."""
+    blocks: dict[tuple, list[dict]] = {}
+    for ev in events:
+        blocks.setdefault(_block_key(ev), []).append(ev)
+    return blocks
 
-async def _notify_admin_summary(text: str):
-    token = os.getenv("BOT_TOKEN")
-    if not (token and ADMIN_ID):
-        return
-    # Open and close client session properly
-    async with Bot(token=token) as bot:
-        try:
-            await bot.send_message(ADMIN_ID, text)
-        except Exception as e:
-            print("Failed to send summary to admin:", e)
+def _block_key(ev: dict) -> tuple:
+    return (ev["date"], _normalize_type(ev["type"]), ev["title"], (ev["city"] or '').strip())
 
-def auto_assign_events_for_month(year: int | None = None, month: int | None = None) -> int:
-    with DBI._conn() as con:
-        if year and month:
-            prefix = f"{year:04d}-{month:02d}-"
-            rows = con.execute("SELECT id, date, type, title, city, employee FROM events WHERE date LIKE ?", (prefix+'%',)).fetchall()
-        else:
-            rows = con.execute("SELECT id, date, type, title, city, employee FROM events").fetchall()
-    blocks: dict[tuple, list[dict]] = {}
-    for eid, d, tp, title, city, emp in rows:
-        k = (d, _normalize_type(tp), title, (city or '').strip())
-        blocks.setdefault(k, []).append({'id': eid, 'date': d, 'type': tp, 'title': title, 'city': city, 'employee': emp})
+def _plan_main(snap: dict, events: list[dict], main_counts: dict[tuple[int, str], int], chosen: dict[tuple, int | None] | None = None, only_blocks: set[tuple] | None = None) -> int:
+    """Назначает исполнителей блокам прямо в events. Возвращает число строк.
+    chosen — готовое решение {блок: employee_id | None} (режим optimal); без него — жадный выбор.
+    only_blocks — планировать только эти блоки, остальные незаполненные оставить как есть."""
+    displays = {eid: disp for eid, disp, _, _ in snap["employees"]}
+    blocks = _blocks(events)
 
     updated = 0
-    all_titles = {t for (_, _, t, _) in blocks.keys() if t}
-    all_emp_ids = set()
-    for t in all_titles:
-        all_emp_ids |= _get_qualified_employee_ids(t)
-    busy_map = _date_busy_map_for_employees(all_emp_ids)
-    assigned_dates = _already_assigned_dates_map([ev for v in blocks.values() for ev in v])
+    # занятость дополняется назначениями ниже — работаем с копией снимка
+    busy_map = {eid: set(ds) for eid, ds in snap["busy"].items()}
+    assigned_dates = _already_assigned_dates_map(events)
     last_moscow: dict[str, int] = {}
 
     def sort_key(k):  # (date, type, title, city)
@@ -231,65 +165,374 @@ def auto_assign_events_for_month(year: int | None = None, month: int | None = No
     for k in sorted(blocks, key=sort_key):
         date, tp, title, city = k
         block = blocks[k]
-        if all(ev.get("employee") for ev in block):
+        if (only_blocks is not None and k not in only_blocks) or all(_is_assigned(ev) for ev in block):
             continue
-        qualified = _get_qualified_employee_ids(title)
+        qualified = snap["qualified"].get(title, set())
         prefer_not = last_moscow.get(title) if (city or '').strip().lower() == 'москва' else None
-        eid = _pick_employee_for_block(block, qualified, busy_map, assigned_dates, prefer_not=prefer_not)
+        if chosen is not None:
+            eid = chosen.get(k)
+        else:
+            eid = _pick_employee_for_block(block, qualified, busy_map, assigned_dates, main_counts, prefer_not=prefer_not)
+        todo = [ev for ev in block if not _is_assigned(ev)]
         if eid is None:
-            # Если есть квалифицированные, но все заняты/недоступны, ставим пометку "НАКЛАДКА!!!"
+            # Есть квалифицированные, но все заняты/недоступны — ставим пометку "НАКЛАДКА!!!"
             if qualified:
-                # дата блока
-                date = block[0].get("date")
-                # есть ли хоть один свободный на эту дату
-                available = [q for q in qualified if (date not in busy_map.get(q, set()) and q not in assigned_dates.get(date or "", set()))]
-                if not available:
-                    ids_to_update = [ev['id'] for ev in block if not ev.get('employee')]
-                    if ids_to_update:
-                        _update_event_employee_literal(ids_to_update, "НАКЛАДКА!!!")
-                        updated += len(ids_to_update)
+                for ev in todo:
+                    ev["employee_id"], ev["employee"] = None, CONFLICT
+                updated += len(todo)
             continue
-        ids_to_update = [ev['id'] for ev in block if not ev.get('employee')]
-        _update_event_employee_by_ids(ids_to_update, eid)
-        updated += len(ids_to_update)
+        for ev in todo:
+            ev["employee_id"], ev["employee"] = eid, displays.get(eid)
+        main_counts[(eid, date[:7])] = main_counts.get((eid, date[:7]), 0) + len(todo)
+        updated += len(todo)
         assigned_dates.setdefault(date, set()).add(eid)
         busy_map.setdefault(eid, set()).add(date)
         if (city or '').strip().lower() == 'москва':
             last_moscow[title] = eid
-    # Подготовка отчёта по загруженности: исполнители + дежурства
-    summary: dict[int, tuple[int,int]] = {}
-    # Соберём всех сотрудников, участвовавших в этом месяце (по связям спектаклей) — или всех, если хочется полный отчёт
-    all_emp_ids_for_report = _all_employee_ids()
+    return updated
+
+def _plan_duty(snap: dict, events: list[dict], main_counts: dict[tuple[int, str], int], year: int, month: int, chosen: dict[str, int | None] | None = None, only_days: set[str] | None = None) -> int:
+    """Дежурный на каждый день месяца; дни без событий получают пустую запись (id=None) в events.
+    chosen — готовое решение {дата: employee_id | None} (режим optimal); без него — жадный выбор.
+    only_days — перепланировать только эти даты, остальные дежурства не трогать."""
+    displays = {eid: disp for eid, disp, _, _ in snap["employees"]}
+    all_ids = [eid for eid, _, _, _ in snap["employees"]]
+    duty_counts = _duty_counts(events)
+    by_date: dict[str, list[dict]] = {}
+    for ev in events:
+        by_date.setdefault(ev["date"], []).append(ev)
+
+    total_updated = 0
+    last_duty_id: int | None = None
+    for d in range(1, calendar.monthrange(year, month)[1] + 1):
+        date_str = f"{year:04d}-{month:02d}-{d:02d}"
+        day_rows = by_date.get(date_str)
+        if only_days is not None and date_str not in only_days:
+            last_duty_id = day_rows[0]["duty_employee_id"] if day_rows else None
+            continue
+        forbidden = {ev["employee_id"] for ev in day_rows or () if ev["employee_id"] is not None}
+        if chosen is not None:
+            eid = chosen.get(date_str)
+        else:
+            eid = _pick_duty_for_date(date_str, all_ids, snap["busy"], forbidden, main_counts, duty_counts, prefer_not=last_duty_id)
+        # Полная недоступность — фиксируем «НАКЛАДКА!!!» в duty_employee
+        value = (eid, displays[eid]) if eid is not None else (None, CONFLICT)
+        if not day_rows:
+            # Нет событий в этот день — создаём отдельную запись дня
+            day_rows = [dict.fromkeys(EVENT_FIELDS, None) | {"date": date_str}]
+            events.extend(day_rows)
+            by_date[date_str] = day_rows
+        for ev in day_rows:
+            old = ev["duty_employee_id"]
+            if old is not None:
+                duty_counts[old] -= 1
+            ev["duty_employee_id"], ev["duty_employee"] = value
+            if eid is not None:
+                duty_counts[eid] = duty_counts.get(eid, 0) + 1
+        total_updated += len(day_rows)
+        last_duty_id = eid
+    return total_updated
+
+# --- режим optimal: min-cost flow вместо жадного выбора по дате
+# Накладка стоит дороже любой перестановки нагрузки, поэтому поток сначала
+# минимизирует число накладок, а затем сумму квадратов рабочих дней сотрудников
+# (k-й рабочий день стоит 2k-1) — то есть разброс нагрузки.
+_CONFLICT_COST = 10**6
+
+def _add_workload_arcs(g: MinCostFlow, node: int, sink: int, base: int, units: int) -> None:
+    for j in range(units):
+        g.add_edge(node, sink, 1, 2 * (base + j) + 1)
+
+def _solve_main(snap: dict, events: list[dict], only_blocks: set[tuple] | None = None) -> dict[tuple, int | None]:
+    """Исполнители блокам: блок → (сотрудник, дата) → сотрудник → сток; один блок в день на человека.
+    only_blocks — решать только для этих блоков (остальные назначения учитываются как уже занятые дни)."""
+    busy = snap["busy"]
+    assigned_dates = _already_assigned_dates_map(events)
+    days: dict[int, int] = {}
+    for ids in assigned_dates.values():
+        for eid in ids:
+            days[eid] = days.get(eid, 0) + 1
+    g = MinCostFlow(2)
+    source, sink = 0, 1
+    pair_nodes: dict[tuple[int, str], int] = {}
+    emp_nodes: dict[int, int] = {}
+    emp_units: dict[int, int] = {}
+    block_edges: dict[tuple, list[tuple[int, tuple[int, int]]]] = {}
+    for k, block in _blocks(events).items():
+        if only_blocks is not None and k not in only_blocks:
+            continue
+        qualified = snap["qualified"].get(k[2], set())
+        if not qualified or all(_is_assigned(ev) for ev in block):
+            continue
+        date = k[0]
+        b = g.add_node()
+        g.add_edge(source, b, 1, 0)
+        g.add_edge(b, sink, 1, _CONFLICT_COST)
+        edges = []
+        for eid in sorted(qualified):
+            if date in busy.get(eid, ()) or eid in assigned_dates.get(date, ()):
+                continue
+            p = pair_nodes.get((eid, date))
+            if p is None:
+                p = pair_nodes[(eid, date)] = g.add_node()
+                if eid not in emp_nodes:
+                    emp_nodes[eid] = g.add_node()
+                g.add_edge(p, emp_nodes[eid], 1, 0)
+                emp_units[eid] = emp_units.get(eid, 0) + 1
+            edges.append((eid, g.add_edge(b, p, 1, 0)))
+        block_edges[k] = edges
+    for eid, node in emp_nodes.items():
+        _add_workload_arcs(g, node, sink, days.get(eid, 0), emp_units[eid])
+    g.solve(source, sink, len(block_edges))
+    return {k: next((eid for eid, e in edges if g.flow_on(e)), None) for k, edges in block_edges.items()}
+
+def _solve_duty(snap: dict, events: list[dict], year: int, month: int) -> dict[str, int | None]:
+    """Дежурные по дням: день → сотрудник → сток; нагрузка считается от рабочих дней после назначения исполнителей."""
+    busy = snap["busy"]
+    assigned_dates = _already_assigned_dates_map(events)
+    days: dict[int, int] = {}
+    for ids in assigned_dates.values():
+        for eid in ids:
+            days[eid] = days.get(eid, 0) + 1
+    g = MinCostFlow(2)
+    source, sink = 0, 1
+    emp_nodes = {eid: g.add_node() for eid, _, _, _ in snap["employees"]}
+    emp_units = dict.fromkeys(emp_nodes, 0)
+    day_edges: dict[str, list[tuple[int, tuple[int, int]]]] = {}
+    for d in range(1, calendar.monthrange(year, month)[1] + 1):
+        date_str = f"{year:04d}-{month:02d}-{d:02d}"
+        n = g.add_node()
+        g.add_edge(source, n, 1, 0)
+        g.add_edge(n, sink, 1, _CONFLICT_COST)
+        edges = []
+        for eid, node in emp_nodes.items():
+            if eid in assigned_dates.get(date_str, ()) or date_str in busy.get(eid, ()):
+                continue
+            edges.append((eid, g.add_edge(n, node, 1, 0)))
+            emp_units[eid] += 1
+        day_edges[date_str] = edges
+    for eid, node in emp_nodes.items():
+        _add_workload_arcs(g, node, sink, days.get(eid, 0), emp_units[eid])
+    g.solve(source, sink, len(day_edges))
+    return {ds: next((eid for eid, e in edges if g.flow_on(e)), None) for ds, edges in day_edges.items()}
+
+def _diff(before: list[dict], after: list[dict]) -> list[dict]:
+    """Набор изменений: строки events, у которых поменялся исполнитель или дежурный (id=None — новая запись дня)."""
+    old_by_id = {ev["id"]: ev for ev in before}
+    out = []
+    for ev in after:
+        old = old_by_id.get(ev["id"]) if ev["id"] is not None else None
+        ch = {
+            "id": ev["id"], "date": ev["date"], "type": ev["type"], "title": ev["title"], "time": ev["time"],
+            "old_employee_id": old["employee_id"] if old else None, "old_employee": old["employee"] if old else None,
+            "new_employee_id": ev["employee_id"], "new_employee": ev["employee"],
+            "old_duty_employee_id": old["duty_employee_id"] if old else None, "old_duty_employee": old["duty_employee"] if old else None,
+            "new_duty_employee_id": ev["duty_employee_id"], "new_duty_employee": ev["duty_employee"],
+        }
+        if old is None or any(ch["old_" + f] != ch["new_" + f] for f in ("employee_id", "employee", "duty_employee_id", "duty_employee")):
+            out.append(ch)
+    return out
+
+def _solve_or_greedy(solver, *args):
+    try:
+        return solver(*args)
+    except Exception as e:
+        # оптимизатор не должен ронять построение графика — откатываемся на жадный выбор
+        print(f"{solver.__name__} failed, falling back to greedy:", e)
+        return None
+
+def plan_month(snap: dict, *, main: bool = True, duty: bool = True, mode: str | None = None) -> dict:
+    """Строит план по снимку, ничего не пишет в БД.
+    mode: "greedy" (по датам, как раньше) или "optimal" (min-cost flow, только для конкретного месяца);
+    по умолчанию — config.ASSIGN_MODE.
+    Возвращает dict: updated (как раньше — число затронутых строк), changes (см. _diff),
+    summary {employee_id: (исполнитель, дежурства)} на момент до назначения дежурных."""
+    events = [dict(ev) for ev in snap["events"]]
+    main_counts = _main_counts(events)
+    year, month = snap["year"], snap["month"]
+    # баланс в optimal считается помесячно — без месяца работаем жадно
+    optimal = (mode or ASSIGN_MODE) == "optimal" and bool(year and month)
+    updated = 0
+    if main:
+        chosen = _solve_or_greedy(_solve_main, snap, events) if optimal else None
+        updated = _plan_main(snap, events, main_counts, chosen)
+    summary: dict[int, tuple[int, int]] = {}
     if year and month:
-        for eid in all_emp_ids_for_report:
-            main_cnt = DBI.count_assigned_for_month(eid, year, month)
-            duty_cnt = _count_duty_for_month(eid, year, month)
+        ym = f"{year:04d}-{month:02d}"
+        duty_counts = _duty_counts(events)
+        for eid, _, _, _ in snap["employees"]:
+            main_cnt = main_counts.get((eid, ym), 0)
+            duty_cnt = duty_counts.get(eid, 0)
             if (main_cnt + duty_cnt) > 0:
                 summary[eid] = (main_cnt, duty_cnt)
+        # После назначения исполнителей — назначим дежурных на каждый день выбранного месяца
+        if duty:
+            chosen = _solve_or_greedy(_solve_duty, snap, events, year, month) if optimal else None
+            updated += _plan_duty(snap, events, main_counts, year, month, chosen)
+    return {"updated": updated, "changes": _diff(snap["events"], events), "summary": summary}
 
-    if summary and year and month:
-        month_title = f"{RU_MONTHS[month-1]} {year}"
-        lines = [month_title]
-        items = []
-        with DBI._conn() as con:
-            for eid, (main_cnt, duty_cnt) in summary.items():
-                row = con.execute("SELECT last_name, first_name FROM employees WHERE id=?", (eid,)).fetchone()
-                if row:
-                    ln, fn = row
-                    items.append((ln or "", fn or "", main_cnt, duty_cnt))
-        for ln, fn, main_cnt, duty_cnt in sorted(items):
-            total = main_cnt + duty_cnt
-            lines.append(f"{ln} {fn} — {total} (дежурств: {duty_cnt})")
-        text = "\n".join(lines)
-        asyncio.create_task(_notify_admin_summary(text))
-
-    # После назначения исполнителей — назначим дежурных на каждый день выбранного месяца
-    if year and month:
+def apply_changes(changes: list[dict], expect_old: bool = False) -> bool:
+    """Записывает набор изменений одной транзакцией.
+    expect_old=True — применять, только если строки всё ещё в «старом» состоянии набора
+    (набор из предпросмотра мог устареть); иначе откатывает всё и возвращает False."""
+    updates = [
+        (ch["new_employee_id"], ch["new_employee"], ch["new_duty_employee_id"], ch["new_duty_employee"], ch["id"])
+        + ((ch["old_employee_id"], ch["old_employee"], ch["old_duty_employee_id"], ch["old_duty_employee"]) if expect_old else ())
+        for ch in changes if ch["id"] is not None
+    ]
+    inserts = [
+        (ch["date"], ch["new_duty_employee"], ch["new_duty_employee_id"]) + ((ch["date"],) if expect_old else ())
+        for ch in changes if ch["id"] is None
+    ]
+    if not (updates or inserts):
+        return True
+    update_sql = "UPDATE events SET employee_id=?, employee=?, duty_employee_id=?, duty_employee=? WHERE id=?"
+    insert_sql = "INSERT INTO events(date, type, title, time, location, city, employee, info, duty_employee, duty_employee_id) SELECT ?,NULL,NULL,NULL,NULL,NULL,NULL,NULL,?,?"
+    if expect_old:
+        update_sql += " AND employee_id IS ? AND employee IS ? AND duty_employee_id IS ? AND duty_employee IS ?"
+        # пустая запись дня нужна, только если в этот день так и нет событий
+        insert_sql += " WHERE NOT EXISTS (SELECT 1 FROM events WHERE date=?)"
+    with DBI._conn() as con:
+        applied = 0
+        if updates:
+            applied += con.executemany(update_sql, updates).rowcount
+        if inserts:
+            applied += con.executemany(insert_sql, inserts).rowcount
+        if expect_old and applied != len(updates) + len(inserts):
+            con.rollback()
+            return False
+    return True
+
+def replan_snapshot(snap: dict, busy_pairs: set[tuple[int, str]], mode: str | None = None) -> dict:
+    """Инкрементальный план: снимает назначения, ставшие невозможными из-за новых занятых дат
+    busy_pairs {(employee_id, date)}, и перепланирует только эти блоки и дни дежурств.
+    Остальной график не трогает — в том числе блоки, которые админ оставил пустыми
+    или которые ещё не распределялись. Возвращает dict: updated, changes (см. _diff)."""
+    events = [dict(ev) for ev in snap["events"]]
+    stale = [ev for ev in events if (ev["employee_id"], ev["date"]) in busy_pairs]
+    duty_days = {ev["date"] for ev in events if (ev["duty_employee_id"], ev["date"]) in busy_pairs}
+    if not (stale or duty_days):
+        return {"updated": 0, "changes": []}
+    for ev in stale:
+        ev["employee_id"], ev["employee"] = None, None
+    stale_blocks = {_block_key(ev) for ev in stale}
+    main_counts = _main_counts(events)
+    optimal = (mode or ASSIGN_MODE) == "optimal"
+    chosen = _solve_or_greedy(_solve_main, snap, events, stale_blocks) if optimal and stale else None
+    updated = _plan_main(snap, events, main_counts, chosen, only_blocks=stale_blocks) if stale else 0
+    # новый исполнитель не может быть дежурным в тот же день
+    duty_days |= {ev["date"] for ev in stale if ev["employee_id"] is not None and ev["employee_id"] == ev["duty_employee_id"]}
+    if duty_days and snap["year"] and snap["month"]:
+        updated += _plan_duty(snap, events, main_counts, snap["year"], snap["month"], only_days=duty_days)
+    return {"updated": updated, "changes": _diff(snap["events"], events)}
+
+def replan_for_busy_changes(busy_pairs: list[tuple[int, str]], mode: str | None = None) -> dict:
+    """Пересчитывает уже построенный график после добавления занятых дат и пишет изменения.
+    busy_pairs — [(employee_id, 'YYYY-MM-DD')]. Месяцы, где эти люди в эти дни не стоят
+    в графике, не загружаются вовсе. Возвращает dict: updated, changes (по всем месяцам)."""
+    with DBI._read_conn() as con:
+        hit = {
+            (eid, ds) for eid, ds in busy_pairs
+            if con.execute(
+                "SELECT 1 FROM events WHERE date=? AND (employee_id=? OR duty_employee_id=?) LIMIT 1",
+                (ds, eid, eid),
+            ).fetchone()
+        }
+    months: dict[tuple[int, int], set[tuple[int, str]]] = {}
+    for eid, ds in hit:
+        months.setdefault((int(ds[0:4]), int(ds[5:7])), set()).add((eid, ds))
+    updated, changes = 0, []
+    for (year, month), pairs in sorted(months.items()):
+        plan = replan_snapshot(load_month_snapshot(year, month), pairs, mode=mode)
+        apply_changes(plan["changes"])
+        updated += plan["updated"]
+        changes += plan["changes"]
+    return {"updated": updated, "changes": changes}
+
+def format_changes(changes: list[dict], limit: int = 40) -> str:
+    """Короткий текст изменений для админа: кто куда переехал по исполнителям и дежурствам."""
+    def who(name):
+        return name or "—"
+
+    lines = []
+    duty_days: dict[str, tuple[str | None, str | None]] = {}
+    for ch in sorted(changes, key=lambda c: (c["date"], c["title"] or "", c["time"] or "")):
+        if ch["old_employee"] != ch["new_employee"] or ch["old_employee_id"] != ch["new_employee_id"]:
+            what = " ".join(x for x in (ch["type"], f"«{ch['title']}»" if ch["title"] else None, ch["time"]) if x)
+            lines.append(f"{human_ru_date(ch['date'])}, {what}: {who(ch['old_employee'])} → {who(ch['new_employee'])}")
+        if ch["old_duty_employee"] != ch["new_duty_employee"]:
+            duty_days.setdefault(ch["date"], (ch["old_duty_employee"], ch["new_duty_employee"]))
+    for ds, (old, new) in sorted(duty_days.items()):
+        lines.append(f"{human_ru_date(ds)}, дежурный: {who(old)} → {who(new)}")
+    if len(lines) > limit:
+        lines = lines[:limit] + [f"… и ещё {len(lines) - limit}"]
+    return "\n".join(lines)
+
+def _summary_text(snap: dict, summary: dict[int, tuple[int, int]]) -> str:
+    names = {eid: (ln or "", fn or "") for eid, _, ln, fn in snap["employees"]}
+    lines = [f"{RU_MONTHS[snap['month']-1]} {snap['year']}"]
+    items = sorted((*names[eid], main_cnt, duty_cnt) for eid, (main_cnt, duty_cnt) in summary.items())
+    for ln, fn, main_cnt, duty_cnt in items:
+        total = main_cnt + duty_cnt
+        lines.append(f"{ln} {fn} — {total} (дежурств: {duty_cnt})")
+    return "\n".join(lines)
+
+def assign_duty_for_month(year: int, month: int, mode: str | None = None) -> int:
+    """Назначает дежурного сотрудника на КАЖДЫЙ день месяца.
+    Правила:
+      - дежурный ≠ любой из назначенных по employee в этот день;
+      - учитывать занятость (employee_busy);
+      - не зависит от спектаклей/связок;
+      - балансировать суммарные рабочие дни за месяц (employee + дежурства).
+    Возвращает число затронутых строк events."""
+    plan = plan_month(load_month_snapshot(year, month), main=False, mode=mode)
+    apply_changes(plan["changes"])
+    return plan["updated"]
+
+async def _notify_admin_summary(text: str):
+    token = os.getenv("BOT_TOKEN")
+    if not (token and ADMIN_ID):
+        return
+    # Open and close client session properly
+    async with Bot(token=token) as bot:
         try:
-            duty_updated = assign_duty_for_month(year, month)
-            updated += duty_updated
-        except Exception as _e:
-            # не валим общий процесс, просто логируем
-            print("assign_duty_for_month failed:", _e)
+            await bot.send_message(ADMIN_ID, text)
+        except Exception as e:
+            print("Failed to send summary to admin:", e)
+
+# Loop бота: планировщик работает в потоке ADBI, а сводку надо отправить из loop'а.
+_notify_loop: asyncio.AbstractEventLoop | None = None
+
+def set_notify_loop(loop: asyncio.AbstractEventLoop | None) -> None:
+    """Запоминает event loop бота для отправки сводок (вызывается один раз при старте)."""
+    global _notify_loop
+    _notify_loop = loop
+
+def _spawn_admin_summary(text: str) -> None:
+    """Отправляет сводку админу в фоне — и из event loop, и из потока ADBI."""
+    coro = _notify_admin_summary(text)
+    try:
+        asyncio.get_running_loop().create_task(coro)
+        return
+    except RuntimeError:
+        pass
+    loop = _notify_loop
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(coro, loop)
+    else:
+        coro.close()
 
-    return updated
\ No newline at end of file
+def auto_assign_events_for_month(year: int | None = None, month: int | None = None, mode: str | None = None, dry_run: bool = False) -> int | dict:
+    """Назначает исполнителей и дежурных; возвращает число затронутых строк.
+    dry_run=True — ничего не пишет (можно звать из потока чтения) и возвращает план:
+    dict updated, changes (см. _diff), conflicts (изменения с «НАКЛАДКА!!!»), summary."""
+    snap = load_month_snapshot(year, month)
+    plan = plan_month(snap, mode=mode)
+    if dry_run:
+        plan["conflicts"] = [ch for ch in plan["changes"] if CONFLICT in (ch["new_employee"], ch["new_duty_employee"])]
+        return plan
+    apply_changes(plan["changes"])
+    # Отчёт по загруженности: исполнители + дежурства (до назначения дежурных)
+    if plan["summary"]:
+        _spawn_admin_summary(_summary_text(snap, plan["summary"]))
+    return plan["updated"]
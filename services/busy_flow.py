@@ -2,10 +2,11 @@
 from typing import Union
 from aiogram.types import Message, CallbackQuery
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from db import DBI
+from db import ADBI
 from config import ADMIN_ID
 from datetime import date
 from utils.dates import next_month_and_year
+from services.auto_assign import replan_for_busy_changes, format_changes
 
 async def ensure_known_user_or_report_message(event: Union[Message, CallbackQuery]) -> int | None:
     """
@@ -18,7 +19,7 @@ async def ensure_known_user_or_report_message(event: Union[Message, CallbackQuer
     user = event.from_user
     bot = event.bot
 
-    row = DBI.get_employee_by_tg(user.id)
+    row = await ADBI.get_employee_by_tg(user.id)
     if row:
         return row[0]
 
@@ -31,7 +32,7 @@ async def ensure_known_user_or_report_message(event: Union[Message, CallbackQuer
             f"Username: @{user.username if user.username else '-'}"
         )
         kb = InlineKeyboardBuilder()
-        for eid, disp in DBI.list_employees_full():
+        for eid, disp in await ADBI.list_employees_full():
             kb.button(text=disp, callback_data=f"maptg:{eid}:{user.id}")
         kb.button(text="➕ Добавить сотрудника", callback_data=f"emp:add_unknown:{user.id}")
         kb.adjust(1)
@@ -54,9 +55,7 @@ async def ensure_known_user_or_report_message(event: Union[Message, CallbackQuer
 async def notify_admin_busy_change(bot, employee_id: int, action: str, items: list[str], user: Message | CallbackQuery):
     if not ADMIN_ID:
         return
-    with DBI._conn() as con:
-        row = con.execute("SELECT display FROM employees WHERE id=?", (employee_id,)).fetchone()
-        disp = row[0] if row else str(employee_id)
+    disp = await ADBI.get_employee_display_by_id(employee_id) or str(employee_id)
     who = user.from_user
     payload = ", ".join(items) if items else "—"
     text = f"[BUSY] {action} — {disp}: {payload}\nby: {who.id} @{who.username if who.username else '-'}"
@@ -65,6 +64,36 @@ async def notify_admin_busy_change(bot, employee_id: int, action: str, items: li
     except Exception:
         pass
 
+async def replan_after_busy_add(bot, employee_id: int, added: list[str]) -> None:
+    """Новые занятые даты после «Сделать график»: перепланируем задетые блоки и дежурства
+    и присылаем админу, что переехало. Если человек в эти дни не стоит в графике — ничего не делает."""
+    if not added:
+        return
+    try:
+        plan = await ADBI.run_write(replan_for_busy_changes, [(employee_id, ds) for ds in added])
+    except Exception as e:
+        # даты уже сохранены — сотрудник своё подтверждение получит, а график админ поправит сам
+        print(f"[busy] replan after busy add failed for employee {employee_id}: {e!r}", flush=True)
+        if ADMIN_ID:
+            try:
+                disp = await ADBI.get_employee_display_by_id(employee_id) or str(employee_id)
+                await bot.send_message(
+                    ADMIN_ID,
+                    f"[ГРАФИК] {disp} занят(а): {', '.join(added)}\n"
+                    f"Не удалось перепланировать график: {e}\nПроверьте эти дни вручную."
+                )
+            except Exception:
+                pass
+        return
+    if not plan["changes"] or not ADMIN_ID:
+        return
+    disp = await ADBI.get_employee_display_by_id(employee_id) or str(employee_id)
+    text = f"[ГРАФИК] {disp} занят(а): {', '.join(added)}\nПерепланировано:\n{format_changes(plan['changes'])}"
+    try:
+        await bot.send_message(ADMIN_ID, text)
+    except Exception:
+        pass
+
 # --- PERIODIC REMINDERS (12th and 24th of each month) ---
 _last_reminder_stamp: tuple[int, int, int] | None = None  # (YYYY, MM, DD)
 
@@ -96,10 +125,10 @@ async def monthly_reminders_task(bot):
                         # Who hasn't submitted yet for next month
                         to_notify = []
                         try:
-                            rows = DBI.list_employees_with_tg()  # [(id, display, tg_id_int)]
+                            rows = await ADBI.list_employees_with_tg()  # [(id, display, tg_id_int)]
                             for eid, disp, tg in rows:
                                 try:
-                                    if not DBI.has_submitted(eid, next_y, next_m):
+                                    if not await ADBI.has_submitted(eid, next_y, next_m):
                                         to_notify.append((eid, disp, tg))
                                 except Exception:
                                     continue
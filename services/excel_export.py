@@ -1,153 +1,230 @@
 # services/excel_export.py
+import hashlib
+import io
+import os
 import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
-import pandas as pd
-from aiogram.types import FSInputFile
-from db import DBI
-from config import RU_MONTHS
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, FSInputFile, Message
+from db import ADBI, DBI
+from config import RU_MONTHS, EXPORT_SPILL_BYTES, EXPORT_CACHE_BYTES, SENT_DOCUMENT_TTL_DAYS
 from utils.dates import human_ru_date
-from openpyxl.styles import Alignment
-from openpyxl import load_workbook
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
 
-def _auto_width(ws, min_width: int = 10, max_width: int = 80, wrap: bool = False):
+MONTH_HEADER = ["Дата", "Тип", "Название", "Время", "Локация", "Город", "Сотрудник", "Дежурный сотрудник", "Инфо"]
+SPECTACLES_HEADER = ["Спектакль", "Сотрудники"]
 
+# Оформление как у прежнего pandas.to_excel + автофита: жирная шапка в рамке,
+# данные с переносом и выравниванием по верху.
+_THIN = Side(style="thin")
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+_HEADER_ALIGN = Alignment(horizontal="center", vertical="top")
+_DATA_ALIGN = Alignment(wrap_text=True, vertical="top")
+_BASE_ROW_HEIGHT = 15  # Excel default row height is ~15 pt
+
+
+def _text_metrics(value) -> tuple[int, int]:
+    """(длина самой длинной видимой строки, число строк) для значения ячейки."""
+    s = "" if value is None else str(value)
+    lines = s.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return max(len(line.expandtabs(4)) for line in lines), len(lines)
+
+
+def write_xlsx(target, sheet_name: str, header: list[str], rows: list[tuple], *, min_width: int = 10, max_width: int = 80) -> None:
     """
-    Auto-fit column widths by scanning headers + data (legacy helper).
-    NOTE: The new logic below (_post_save_autofit) strictly follows the
-    requirement: first save, then re-open and scan content-only.
-    Kept for backward compatibility in case it's used elsewhere.
+    Пишет один лист в target (путь или file-like) через openpyxl write-only — каждая ячейка
+    сериализуется ровно один раз, без повторного открытия файла.
+    Ширина колонки = самая длинная строка в данных (+1), в пределах [min_width, max_width];
+    высота строки = 15 pt × число строк в самой «высокой» ячейке. Шапка в расчёт не входит.
     """
-    for col in ws.columns:
-        try:
-            letter = col[0].column_letter
-        except Exception:
-            continue
-
-        max_len = 0
-        for cell in list(col)[1:]:  # skip header row
-            val = cell.value
-            if val is None:
-                ln = 0
-            else:
-                s = str(val)
-                ln = max((len(line) for line in s.splitlines()), default=len(s))
-            if ln > max_len:
-                max_len = ln
-            if wrap:
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-        width = max(min_width, min(max_len + 2, max_width))
-        ws.column_dimensions[letter].width = width
-
-def _post_save_autofit(xlsx_path: Path, sheet_name: str, *, min_width: int = 10, max_width: int = 80, wrap: bool = True) -> None:
+    # ширины колонок в XLSX идут до данных, поэтому сначала меряем тексты, потом пишем
+    col_max = [0] * len(header)
+    row_lines = []
+    for row in rows:
+        lines = 1
+        for i, value in enumerate(row):
+            longest, n = _text_metrics(value)
+            if longest > col_max[i]:
+                col_max[i] = longest
+            if n > lines:
+                lines = n
+        row_lines.append(lines)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    for i, longest in enumerate(col_max, start=1):
+        ws.column_dimensions[get_column_letter(i)].width = max(min_width, min(longest + 1, max_width))
+
+    head = []
+    for title in header:
+        cell = WriteOnlyCell(ws, value=title)
+        cell.font, cell.border, cell.alignment = _HEADER_FONT, _HEADER_BORDER, _HEADER_ALIGN
+        head.append(cell)
+    ws.append(head)
+    for row_idx, (row, lines) in enumerate(zip(rows, row_lines), start=2):
+        ws.row_dimensions[row_idx].height = _BASE_ROW_HEIGHT * lines
+        cells = []
+        for value in row:
+            cell = WriteOnlyCell(ws, value=None if value == "" else value)
+            cell.alignment = _DATA_ALIGN
+            cells.append(cell)
+        ws.append(cells)
+    wb.save(target)
+
+
+def month_schedule_rows(year: int, month: int) -> list[tuple]:
+    """Строки листа «График» (даты уже в человеческом виде), в порядке MONTH_HEADER."""
+    with DBI._read_conn() as con:
+        # Имена сотрудников берём из employees по id (актуальные после переименования);
+        # текст в events — только для пометок вроде «НАКЛАДКА!!!» и неопознанных имён.
+        evs = con.execute("""
+            SELECT ev.date, COALESCE(ev.type,''), COALESCE(ev.title,''), COALESCE(ev.time,''),
+                   COALESCE(ev.location,''), COALESCE(ev.city,''),
+                   COALESCE(e.display, ev.employee, ''), COALESCE(d.display, ev.duty_employee, ''),
+                   COALESCE(ev.info,'')
+            FROM events ev
+            LEFT JOIN employees e ON e.id = ev.employee_id
+            LEFT JOIN employees d ON d.id = ev.duty_employee_id
+            WHERE ev.date BETWEEN ? AND ? ORDER BY ev.date, ev.title, ev.time
+        """, DBI.month_range(year, month)).fetchall()
+    return [(human_ru_date(r[0]), *r[1:]) for r in evs]
+
+
+# --- Кэш готовых книг ---
+# Ключ — (имя файла, sha256 строк листа). В строки уже попадают актуальные имена
+# сотрудников (JOIN по id), так что переименование тоже меняет отпечаток. Выгрузки
+# строятся в пуле чтения из нескольких потоков — отсюда блокировка.
+_cache: "OrderedDict[tuple[str, str], bytes]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_bytes = 0
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+# Меняется вместе с оформлением листа (write_xlsx) — чтобы старые книги и file_id не переиспользовались
+_EXPORT_FORMAT = b"xlsx-v1"
+
+
+def _fingerprint(rows: list[tuple]) -> str:
+    h = hashlib.sha256(_EXPORT_FORMAT)
+    for row in rows:
+        h.update(repr(row).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+def _cache_get(key: tuple[str, str]) -> bytes | None:
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is None:
+            _cache_stats["misses"] += 1
+            return None
+        _cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+        return hit
+
+
+def _cache_put(key: tuple[str, str], data: bytes) -> None:
+    global _cache_bytes
+    if len(data) > EXPORT_CACHE_BYTES:
+        return
+    with _cache_lock:
+        old = _cache.pop(key, None)
+        if old is not None:
+            _cache_bytes -= len(old)
+        _cache[key] = data
+        _cache_bytes += len(data)
+        while _cache_bytes > EXPORT_CACHE_BYTES:
+            _, evicted = _cache.popitem(last=False)
+            _cache_bytes -= len(evicted)
+            _cache_stats["evictions"] += 1
+
+
+def export_cache_stats() -> dict:
+    with _cache_lock:
+        return {**_cache_stats, "entries": len(_cache), "bytes": _cache_bytes, "limit": EXPORT_CACHE_BYTES}
+
+
+def clear_export_cache() -> None:
+    global _cache_bytes
+    with _cache_lock:
+        _cache.clear()
+        _cache_bytes = 0
+
+
+def _finish_export(filename: str, sheet_name: str, header: list[str], rows: list[tuple]) -> dict:
     """
-    Strict post-save auto-fit by content only:
-    - Column width = longest visible line length among rows 2..max_row * 1.2 (+2 padding), clamped to [min_width, max_width]
-    - Optional wrap + vertical top for all data cells
-    - Row height = base_height * max_lines_in_that_row (approx), so multiline is readable
+    Собирает книгу в памяти или берёт её из кэша, если строки листа не менялись.
+    Результат — {"filename", "data", "path", "sha256"}: обычно data (bytes), а если файл
+    больше EXPORT_SPILL_BYTES — он сбрасывается в уникальный временный файл (path), чтобы
+    не держать его в памяти, пока идёт отправка. Такой файл удаляет release_export.
+    sha256 — отпечаток содержимого листа: байты XLSX сами по себе каждый раз разные
+    (openpyxl пишет время сохранения), а содержимое — нет.
     """
-    print("ok")
-    try:
-        wb = load_workbook(filename=str(xlsx_path))
-        ws = wb[sheet_name]
-        print(f"Обрабатываем лист: {sheet_name}, строк: {ws.max_row}, столбцов: {ws.max_column}")
-
-        header_cells = list(ws[1]) if ws.max_row >= 1 else []
-        n_cols = len(header_cells)
-
-        # First pass: compute max line length per column and max line count per row
-        col_max_len: dict[int, int] = {c: 0 for c in range(1, n_cols + 1)}
-        row_max_lines: dict[int, int] = {}
-
-        for row_idx in range(2, ws.max_row + 1):
-            max_lines_in_row = 1
-            for col_idx in range(1, n_cols + 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                val = cell.value
-                if val is None:
-                    lines = [""]
-                else:
-                    s = str(val)
-                    # normalize Windows/mac newlines to '\n'
-                    s = s.replace("\r\n", "\n").replace("\r", "\n")
-                    lines = s.split("\n")
-
-                # longest visible line length in this cell
-                longest = 0
-                for line in lines:
-                    # consider multiple spaces and tabs visually wider
-                    l = len(line.expandtabs(4))
-                    if l > longest:
-                        longest = l
-
-                if longest > col_max_len[col_idx]:
-                    col_max_len[col_idx] = longest
-
-                if len(lines) > max_lines_in_row:
-                    max_lines_in_row = len(lines)
-
-                if wrap:
-                    cell.alignment = Alignment(wrap_text=True, vertical="top")
-
-            row_max_lines[row_idx] = max_lines_in_row
-
-        # Second pass: set column widths
-        for col_idx in range(1, n_cols + 1):
-            # small scale factor to better approximate Excel width metrics
-            scaled = int(col_max_len[col_idx]) + 1
-            width = max(min_width, min(scaled, max_width))
-            letter = ws.cell(row=1, column=col_idx).column_letter if n_cols else None
-            if letter:
-                ws.column_dimensions[letter].width = width
-
-        # Third pass: set row heights (approx)
-        base_height = 15  # Excel default row height is ~15 pt
-        for row_idx, lines in row_max_lines.items():
-            ws.row_dimensions[row_idx].height = base_height * max(1, lines)
-
-        wb.save(str(xlsx_path))
-        print("Автофит применён успешно")
-    except Exception as e:
-        print(f"Ошибка в _post_save_autofit: {e}")
-        raise
-
-
-def export_month_schedule(year: int, month: int) -> tuple[Path, int]:
-    prefix = f"{year:04d}-{month:02d}-"
-    with DBI._conn() as con:
-        evs = con.execute("""
-            SELECT date, COALESCE(type,''), COALESCE(title,''), COALESCE(time,''),
-                   COALESCE(location,''), COALESCE(city,''), COALESCE(employee,''), COALESCE(duty_employee,''), COALESCE(info,'')
-            FROM events WHERE date LIKE ? ORDER BY date, title, time
-        """, (prefix+'%',)).fetchall()
-    df = pd.DataFrame(evs, columns=["date","type","title","time","location","city","employee","duty_employee","info"])
-    df["date"] = df["date"].map(human_ru_date)
-    df = df.rename(columns={
-        "date":"Дата","type":"Тип","title":"Название","time":"Время",
-        "location":"Локация","city":"Город","employee":"Сотрудник","duty_employee":"Дежурный сотрудник","info":"Инфо"
-    })
-    out_path = Path(tempfile.gettempdir()) / f"График_{year}-{month:02d}.xlsx"
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        sheet_name = "График"
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
-    # Post-save auto-fit strictly by content (skip headers)
-    _post_save_autofit(out_path, sheet_name, min_width=10, max_width=80, wrap=True)
-    return out_path, len(df)
-
-def file_as_input(path: Path) -> FSInputFile:
-    return FSInputFile(str(path))
+    digest = _fingerprint(rows)
+    key = (filename, digest)
+    cached = _cache_get(key)
+    if cached is not None:
+        return {"filename": filename, "data": cached, "path": None, "sha256": digest}
+    buf = io.BytesIO()
+    write_xlsx(buf, sheet_name, header, rows)
+    data = buf.getvalue()
+    if EXPORT_SPILL_BYTES and len(data) > EXPORT_SPILL_BYTES:
+        fd, tmp = tempfile.mkstemp(prefix="pultovik_export_", suffix=".xlsx")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return {"filename": filename, "data": None, "path": Path(tmp), "sha256": digest}
+    _cache_put(key, data)
+    return {"filename": filename, "data": data, "path": None, "sha256": digest}
+
+
+def export_month_schedule(year: int, month: int) -> tuple[dict, int]:
+    rows = month_schedule_rows(year, month)
+    return _finish_export(f"График_{year}-{month:02d}.xlsx", "График", MONTH_HEADER, rows), len(rows)
+
+def file_as_input(export: dict) -> BufferedInputFile | FSInputFile:
+    if export["data"] is not None:
+        return BufferedInputFile(export["data"], filename=export["filename"])
+    return FSInputFile(str(export["path"]), filename=export["filename"])
+
+def release_export(export: dict | None) -> None:
+    """Удаляет временный файл выгрузки, если она была сброшена на диск."""
+    if export and export.get("path") is not None:
+        export["path"].unlink(missing_ok=True)
+
+async def send_export(message: Message, export: dict, caption: str | None = None) -> Message:
+    """
+    Отправляет выгрузку в чат. Если такой же документ уже загружался в Telegram, шлёт его
+    по file_id без повторной загрузки; если Telegram этот file_id больше не принимает —
+    забывает его и загружает файл заново.
+    """
+    digest, filename = export["sha256"], export["filename"]
+    file_id = await ADBI.get_sent_document(digest, filename, SENT_DOCUMENT_TTL_DAYS)
+    if file_id:
+        try:
+            return await message.answer_document(file_id, caption=caption)
+        except TelegramBadRequest:
+            await ADBI.forget_sent_document(digest, filename)
+    sent = await message.answer_document(file_as_input(export), caption=caption)
+    if sent.document:
+        await ADBI.remember_sent_document(digest, filename, sent.document.file_id, SENT_DOCUMENT_TTL_DAYS)
+    return sent
 
 def month_caption(year: int, month: int, updated: int) -> str:
     return f"График на {RU_MONTHS[month-1]} {year}. Обновлено назначений: {updated}"
 
 
 # --- Export spectacles table ---
-def export_spectacles_table() -> tuple[Path, int]:
+def export_spectacles_table() -> dict:
     """
     Выгружает таблицу вида:
     Спектакль | Сотрудники (через запятую)
     """
-    with DBI._conn() as con:
+    with DBI._read_conn() as con:
         rows = con.execute(
             """
             SELECT
@@ -161,21 +238,9 @@ def export_spectacles_table() -> tuple[Path, int]:
             """
         ).fetchall()
 
-    df = pd.DataFrame(rows, columns=["title", "employees"]).rename(columns={
-        "title": "Спектакль",
-        "employees": "Сотрудники",
-    })
-    # Make employees appear one per line for better readability and wrapping
-    df["Сотрудники"] = df["Сотрудники"].astype(str).str.replace(", ", "\n")
-    out_path = Path(tempfile.gettempdir()) / "Спектакли_и_кто_ведёт.xlsx"
-    with pd.ExcelWriter(out_path, engine="openpyxl") as writer:
-        sheet_name = "Спектакли"
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
-
-    # Post-save auto-fit strictly by content (headers ignored)
-    _post_save_autofit(out_path, sheet_name, min_width=10, max_width=80, wrap=True)
-
-    return out_path
+    # Сотрудники по одному на строку — так читаемее и переносится
+    rows = [(title, str(employees).replace(", ", "\n")) for title, employees in rows]
+    return _finish_export("Спектакли_и_кто_ведёт.xlsx", "Спектакли", SPECTACLES_HEADER, rows)
 
 
 def spectacles_caption(total: int) -> str:
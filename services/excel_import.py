@@ -1,8 +1,12 @@
 # services/excel_import.py
+import calendar
+import re
 from pathlib import Path
-import pandas as pd
+from openpyxl import load_workbook
+from config import RU_MONTHS
 from db import DBI
-import sqlite3
+from services.titles import load_title_index, normalize_title
+from utils.dates import human_ru_date
 
 EXPECTED_EVENT_COLUMNS = {
     'id': 'id',
@@ -18,87 +22,340 @@ EXPECTED_EVENT_COLUMNS = {
     'инфо': 'info',
 }
 
-def _normalize_event_columns(df: pd.DataFrame) -> pd.DataFrame:
-    mapping = {}
-    for col in df.columns:
-        key = str(col).strip().lower()
-        if key in EXPECTED_EVENT_COLUMNS:
-            mapping[col] = EXPECTED_EVENT_COLUMNS[key]
-    return df.rename(columns=mapping)
+EVENT_KEYS = ('date', 'type', 'title', 'time', 'location', 'city', 'employee', 'duty_employee', 'info')
 
-def _known_spectacle_titles_lower() -> set[str]:
-    try:
-        with DBI._conn() as con:
-            cur = con.execute("SELECT title FROM spectacles")
-            return {str(r[0]).strip().lower() for r in cur.fetchall() if r and r[0]}
-    except Exception:
-        return set()
-
-def import_events_from_excel(path: Path, year: int, month: int) -> tuple[int, int, list[str]]:
-    df = pd.read_excel(path)
-    df = _normalize_event_columns(df)
-    if 'date' not in df.columns:
-        raise ValueError("В Excel нет колонки 'Дата'")
-    keep = ['date','type','title','time','location','city','employee','duty_employee','info']
-    for k in keep:
-        if k not in df.columns:
-            df[k] = None
-
-    import re, calendar as _cal
-    max_day = _cal.monthrange(year, month)[1]
-    def _to_day(v):
-        if pd.isna(v): return None
-        if hasattr(v, 'day'):
-            d = int(getattr(v, 'day', 0));  return d if 1 <= d <= max_day else None
-        if isinstance(v, (int, float)) and not isinstance(v, bool):
-            d = int(v); return d if 1 <= d <= max_day else None
-        s = str(v).strip(); m = re.search(r"\d+", s)
-        if m:
-            d = int(m.group(0)); return d if 1 <= d <= max_day else None
+def _header_index(header: tuple) -> dict[str, int]:
+    """Номера колонок по EXPECTED_EVENT_COLUMNS; при повторе (Дежурный / Дежурный сотрудник) берётся первая."""
+    idx: dict[str, int] = {}
+    for i, col in enumerate(header):
+        key = EXPECTED_EVENT_COLUMNS.get(str(col).strip().lower()) if col is not None else None
+        if key and key not in idx:
+            idx[key] = i
+    return idx
+
+def _cell_text(v) -> str | None:
+    if v is None or v == "":
         return None
+    # openpyxl отдаёт целые числа из Excel как float/int — «19.0» в базе ни к чему
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v)
 
-    df = df.assign(_day=df['date'].map(_to_day)).query("_day.notna()")
-    df['date'] = df['_day'].astype(int).map(lambda d: f"{year:04d}-{month:02d}-{d:02d}")
-    df = df.drop(columns=['_day'])
+_DAY_RE = re.compile(r"\d+")
 
-    known = _known_spectacle_titles_lower()
+def _to_day(v, max_day: int) -> int | None:
+    if v is None or isinstance(v, bool):
+        return None
+    if hasattr(v, 'day'):
+        d = int(v.day)
+    elif isinstance(v, (int, float)):
+        d = int(v)
+    else:
+        m = _DAY_RE.search(str(v))
+        if not m:
+            return None
+        d = int(m.group(0))
+    return d if 1 <= d <= max_day else None
 
-    titles: list[str] = []
-    unknown_titles: list[str] = []
-    seen_lower: set[str] = set()
-    for v in df['title']:
-        if pd.isna(v):
+def _events_from_rows(header: tuple | None, rows, year: int, month: int):
+    if header is None:
+        raise ValueError("В Excel нет колонки 'Дата'")
+    idx = _header_index(header)
+    if 'date' not in idx:
+        raise ValueError("В Excel нет колонки 'Дата'")
+    max_day = calendar.monthrange(year, month)[1]
+    cols = [(k, idx.get(k)) for k in EVENT_KEYS if k != 'date']
+    di = idx['date']
+    for r in rows:
+        day = _to_day(r[di], max_day) if di < len(r) else None
+        if day is None:
             continue
-        s = str(v).strip()
-        if not s:
+        ev = {'date': f"{year:04d}-{month:02d}-{day:02d}"}
+        for k, i in cols:
+            ev[k] = _cell_text(r[i]) if i is not None and i < len(r) else None
+        yield ev
+
+def _sheet_rows(ws):
+    # размеры из файла не доверяем: сторонние редакторы пишут туда что попало
+    ws.reset_dimensions()
+    rows = ws.iter_rows(values_only=True)
+    return next(rows, None), rows
+
+def iter_sheet_events(ws, year: int, month: int):
+    """
+    Построчно выдаёт события листа (read-only openpyxl) в виде dict для DB.insert_events.
+    Первая строка — шапка; строки без распознаваемого дня месяца пропускаются.
+    """
+    header, rows = _sheet_rows(ws)
+    yield from _events_from_rows(header, rows, year, month)
+
+def _unknown_titles(rows: list[dict]) -> list[str]:
+    """Названия, которых нет среди спектаклей ни точно (после normalize_title), ни как псевдоним."""
+    index = load_title_index()
+    unknown: list[str] = []
+    seen: set[str] = set()
+    for ev in rows:
+        s = (ev['title'] or '').strip()
+        key = normalize_title(s)
+        if not key or key in seen:
             continue
-        s_l = s.lower()
-        if s_l in seen_lower:
+        seen.add(key)
+        if index.resolve(s) is None:
+            unknown.append(s)
+    return unknown
+
+def parse_events_excel(path: Path, year: int, month: int) -> tuple[list[dict], list[str]]:
+    """Разбирает первый лист Excel в строки events за месяц, ничего не пишет в БД.
+    Возвращает (rows, unknown_titles) — незнакомые названия спектаклей."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = list(iter_sheet_events(wb.worksheets[0], year, month))
+    finally:
+        wb.close()
+    return rows, _unknown_titles(rows)
+
+# Корни названий месяцев: «Сентябрь», «сентября», «СЕНТЯБРЬ 2025»
+_MONTH_ROOTS = ("январ", "феврал", "март", "апрел", "ма[йя]", "июн", "июл", "август", "сентябр", "октябр", "ноябр", "декабр")
+_MONTH_NAME_RE = re.compile("|".join(f"(?P<m{i}>{root})" for i, root in enumerate(_MONTH_ROOTS, start=1)), re.IGNORECASE)
+_YEAR_RE = re.compile(r"(?<!\d)(20\d\d)(?!\d)")
+_NUMERIC_MONTH_RE = re.compile(r"(?<!\d)(?:(?P<m1>\d{1,2})[./-](?P<y1>20\d\d)|(?P<y2>20\d\d)[./-](?P<m2>\d{1,2}))(?!\d)")
+
+def detect_sheet_month(title: str) -> tuple[int | None, int] | None:
+    """(year, month) по названию листа: «Сентябрь», «сентябрь 2025», «09.2025», «2025-09».
+    Если года в названии нет — year None (его определит parse_season_excel)."""
+    m = _NUMERIC_MONTH_RE.search(title)
+    if m:
+        month = int(m.group('m1') or m.group('m2'))
+        if 1 <= month <= 12:
+            return int(m.group('y1') or m.group('y2')), month
+    m = _MONTH_NAME_RE.search(title)
+    if not m:
+        return None
+    y = _YEAR_RE.search(title)
+    return (int(y.group(1)) if y else None), int(m.lastgroup[1:])
+
+def _month_from_dates(header: tuple | None, rows: list[tuple]) -> tuple[int, int] | None:
+    """Самый частый (year, month) среди настоящих дат в колонке «Дата»."""
+    idx = _header_index(header or ())
+    if 'date' not in idx:
+        return None
+    di = idx['date']
+    seen: dict[tuple[int, int], int] = {}
+    for r in rows:
+        v = r[di] if di < len(r) else None
+        if hasattr(v, 'year') and hasattr(v, 'month'):
+            seen[(v.year, v.month)] = seen.get((v.year, v.month), 0) + 1
+    return max(seen, key=seen.get) if seen else None
+
+def _fill_season_years(sheets: list[list], default_year: int) -> None:
+    """
+    Проставляет год листам, у которых его нет ни в названии, ни в датах: листы идут
+    по порядку сезона, и месяц меньше предыдущего (декабрь → январь) — это следующий год.
+    Листы до первого с известным годом считаются назад от него; если год не известен
+    ни у одного — первый лист получает default_year. sheets — [[year | None, month, origin], ...].
+    """
+    known = [i for i, sh in enumerate(sheets) if sh[0] is not None]
+    if not sheets:
+        return
+    if not known:
+        sheets[0][0], sheets[0][2] = default_year, "не указан — взят текущий, проверьте"
+        known = [0]
+    for i in range(known[0] - 1, -1, -1):
+        nxt = sheets[i + 1]
+        sheets[i][0] = nxt[0] - 1 if sheets[i][1] > nxt[1] else nxt[0]
+        sheets[i][2] = "по порядку листов"
+    for i in range(known[0] + 1, len(sheets)):
+        if sheets[i][0] is None:
+            prev = sheets[i - 1]
+            sheets[i][0] = prev[0] + 1 if sheets[i][1] < prev[1] else prev[0]
+            sheets[i][2] = "по порядку листов"
+
+def parse_season_excel(path: Path, default_year: int) -> tuple[dict[tuple[int, int], list[dict]], list[str], list[str], dict[tuple[int, int], str]]:
+    """
+    Разбирает все листы книги за один проход. Месяц листа — по его названию, а если там
+    его нет — по датам в колонке «Дата». Год — из названия, иначе из настоящих дат листа,
+    иначе по порядку листов (см. _fill_season_years); default_year — только если ни у
+    одного листа года нет.
+    Возвращает ({(year, month): rows}, unknown_titles, skipped, {(year, month): откуда год}) —
+    skipped: листы, для которых месяц не определился или нет колонки «Дата».
+    Ничего не пишет: сезон админ подтверждает перед импортом.
+    """
+    sheets: list[list] = []
+    parsed: list[tuple[tuple | None, list[tuple]]] = []
+    skipped: list[str] = []
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for ws in wb.worksheets:
+            header, rows = _sheet_rows(ws)
+            rows = list(rows)
+            by_title = detect_sheet_month(ws.title)
+            by_dates = _month_from_dates(header, rows)
+            if by_title is not None and by_title[0] is not None:
+                ym, origin = by_title, "из названия листа"
+            elif by_title is not None:
+                # месяц из названия, год — из дат того же месяца, если они есть
+                ym, origin = (by_dates if by_dates and by_dates[1] == by_title[1] else (None, by_title[1])), "по датам"
+            else:
+                ym, origin = by_dates, "по датам"
+            if ym is None or 'date' not in _header_index(header or ()):
+                skipped.append(ws.title)
+                continue
+            sheets.append([ym[0], ym[1], origin])
+            parsed.append((header, rows))
+    finally:
+        wb.close()
+    _fill_season_years(sheets, default_year)
+    months: dict[tuple[int, int], list[dict]] = {}
+    origins: dict[tuple[int, int], str] = {}
+    for (year, month, origin), (header, rows) in zip(sheets, parsed):
+        months.setdefault((year, month), []).extend(_events_from_rows(header, rows, year, month))
+        origins.setdefault((year, month), origin)
+    return months, _unknown_titles([ev for rows in months.values() for ev in rows]), skipped, origins
+
+def format_season_preview(months: dict[tuple[int, int], list[dict]], origins: dict[tuple[int, int], str], skipped: list[str] | None = None) -> str:
+    """Что будет импортировано: месяцы с годом и откуда год взят — для подтверждения админом."""
+    lines = ["В книге найдены месяцы:"]
+    for (year, month), rows in sorted(months.items()):
+        lines.append(f"{RU_MONTHS[month-1]} {year} — событий {len(rows)} (год {origins.get((year, month), '—')})")
+    if skipped:
+        lines.append("Пропущены листы (месяц не определён): " + ", ".join(skipped))
+    lines.append("События этих месяцев будут приведены к файлу (лишние — удалены). Импортировать?")
+    return "\n".join(lines)
+
+def _match_key(ev: dict) -> tuple[str, str, str, str]:
+    return (ev['date'], normalize_title(ev['title']), " ".join((ev['time'] or "").split()),
+            " ".join((ev['location'] or "").lower().split()))
+
+# Поля, которые приходят из файла расписания; назначения из файла берём, только если они там заполнены
+_IMPORT_FIELDS = ('type', 'title', 'time', 'location', 'city', 'info')
+
+def _sync_month(con, year: int, month: int, rows: list[dict]) -> dict:
+    """
+    Приводит события месяца к rows, не трогая уже сделанные назначения.
+    Строки сопоставляются по (дата, нормализованное название, время, локация): совпавшие
+    обновляются только в изменившихся полях, новые вставляются, пропавшие удаляются —
+    на переданном соединении, коммитит вызывающий. Пустые строки-«дни» планировщика
+    (только дежурный) остаются, пока в этот день нет событий; иначе их дежурный
+    переносится на события дня.
+    Возвращает {"inserted": [...], "updated": [...], "deleted": [...], "unchanged": n},
+    где элементы — (date, title, time).
+    """
+    first, last = DBI.month_range(year, month)
+    existing = [dict(zip(("id", "date", *_IMPORT_FIELDS, "employee", "duty_employee", "duty_employee_id"), r)) for r in con.execute(
+        "SELECT id, date, type, title, time, location, city, info, employee, duty_employee, duty_employee_id "
+        "FROM events WHERE date BETWEEN ? AND ? ORDER BY id", (first, last)
+    )]
+    placeholders = {ev['date']: ev for ev in existing if ev['title'] is None and ev['type'] is None}
+    by_key: dict[tuple, list[dict]] = {}
+    for ev in existing:
+        if ev['date'] not in placeholders or placeholders[ev['date']] is not ev:
+            by_key.setdefault(_match_key(ev), []).append(ev)
+    # дежурный — один на день; новые события дня получают того же
+    day_duty: dict[str, tuple[str | None, int | None]] = {}
+    for ev in existing:
+        if ev['duty_employee'] is not None:
+            day_duty.setdefault(ev['date'], (ev['duty_employee'], ev['duty_employee_id']))
+
+    inserts, updates, unchanged = [], [], 0
+    for row in rows:
+        same = by_key.get(_match_key(row))
+        if not same:
+            ins = {k: row.get(k) for k in EVENT_KEYS}
+            if ins['duty_employee'] is None and row['date'] in day_duty:
+                ins['duty_employee'] = day_duty[row['date']][0]
+            inserts.append(ins)
             continue
-        seen_lower.add(s_l)
-        titles.append(s)
-        if s_l not in known:
-            unknown_titles.append(s)
-
-    rows = []
-    for _, r in df.iterrows():
-        rows.append({
-            'date': r['date'],
-            'type': None if pd.isna(r['type']) else str(r['type']),
-            'title': None if pd.isna(r['title']) else str(r['title']),
-            'time': None if pd.isna(r['time']) else str(r['time']),
-            'location': None if pd.isna(r['location']) else str(r['location']),
-            'city': None if pd.isna(r['city']) else str(r['city']),
-            'employee': None if pd.isna(r['employee']) else str(r['employee']),
-            'duty_employee': None if pd.isna(r['duty_employee']) else str(r['duty_employee']),
-            'info': None if pd.isna(r['info']) else str(r['info']),
-        })
+        ev = same.pop(0)
+        changed = {k: row.get(k) for k in _IMPORT_FIELDS if row.get(k) != ev[k]}
+        for k in ('employee', 'duty_employee'):
+            if row.get(k) is not None and row[k] != ev[k]:
+                changed[k] = row[k]
+        if changed:
+            updates.append((ev, changed))
+        else:
+            unchanged += 1
+    deleted = [ev for evs in by_key.values() for ev in evs]
+    new_days = {r['date'] for r in rows}
+    deleted += [ev for ds, ev in placeholders.items() if ds in new_days]
 
+    if deleted:
+        con.executemany("DELETE FROM events WHERE id=?", [(ev['id'],) for ev in deleted])
+    for ev, changed in updates:
+        sets = [f"{k}=:{k}" for k in changed]
+        if 'employee' in changed:
+            sets.append("employee_id=(SELECT id FROM employees WHERE display=:employee)")
+        if 'duty_employee' in changed:
+            sets.append("duty_employee_id=(SELECT id FROM employees WHERE display=:duty_employee)")
+        con.execute(f"UPDATE events SET {', '.join(sets)} WHERE id=:id", {**changed, 'id': ev['id']})
+    if inserts:
+        con.executemany(DBI.INSERT_EVENT_SQL, inserts)
+
+    def brief(ev: dict) -> tuple:
+        return ev['date'], ev['title'], ev['time']
+    return {
+        "inserted": [brief(ev) for ev in inserts],
+        "updated": [brief({**ev, **changed}) for ev, changed in updates],
+        "deleted": [brief(ev) for ev in deleted if ev['title'] is not None or ev['type'] is not None],
+        "unchanged": unchanged,
+    }
+
+def sync_events(months: dict[tuple[int, int], list[dict]]) -> dict[tuple[int, int], dict]:
+    """Применяет импорт сразу нескольких месяцев {(year, month): rows} одной транзакцией."""
+    with DBI._conn() as con:
+        return {ym: _sync_month(con, ym[0], ym[1], rows) for ym, rows in sorted(months.items())}
+
+def sync_month_events(year: int, month: int, rows: list[dict]) -> dict:
+    """Импорт одного месяца, см. _sync_month."""
+    return sync_events({(year, month): rows})[(year, month)]
+
+def format_import_diff(diff: dict, limit: int = 30) -> str:
+    """Короткий отчёт об импорте для админа."""
+    head = (f"Добавлено: {len(diff['inserted'])}, изменено: {len(diff['updated'])}, "
+            f"удалено: {len(diff['deleted'])}, без изменений: {diff['unchanged']}")
+    lines = []
+    for mark, key in (("+", "inserted"), ("~", "updated"), ("−", "deleted")):
+        for ds, title, tm in sorted(diff[key], key=lambda x: (x[0], x[1] or "", x[2] or "")):
+            lines.append(f"{mark} {human_ru_date(ds)}, {' '.join(x for x in (f'«{title}»' if title else None, tm) if x)}")
+    if len(lines) > limit:
+        lines = lines[:limit] + [f"… и ещё {len(lines) - limit}"]
+    return "\n".join([head, *lines])
+
+def commit_staged_import(upload_id: str | None, months: list[tuple[int, int]]) -> dict[tuple[int, int], dict]:
+    """Применяет ранее разобранные строки (staged_events) без повторного чтения файла:
+    все месяцы импорта одной транзакцией вместе с удалением отложенных строк. Возвращает {(year, month): diff}.
+    Если строк нет (вычищены через 2 дня, состояние диалога потерялось при рестарте) —
+    ValueError: пустой импорт стёр бы все события этих месяцев."""
+    with DBI._conn() as con:
+        staged = DBI.pop_staged_events(upload_id)
+        if not staged:
+            raise ValueError("отложенные строки импорта не найдены (устарели или бот перезапускался) — загрузите файл заново")
+        by_month: dict[tuple[int, int], list[dict]] = {tuple(ym): [] for ym in months}
+        for ev in staged:
+            ym = (int(ev['date'][:4]), int(ev['date'][5:7]))
+            if ym in by_month:
+                by_month[ym].append(ev)
+        return {ym: _sync_month(con, ym[0], ym[1], rows) for ym, rows in sorted(by_month.items())}
+
+def format_import_report(diffs: dict[tuple[int, int], dict], skipped: list[str] | None = None) -> str:
+    """Отчёт по импорту одного или нескольких месяцев: для одного — с перечнем изменений."""
+    if len(diffs) == 1:
+        (year, month), diff = next(iter(diffs.items()))
+        text = f"Импорт завершён: {RU_MONTHS[month-1]} {year}\n{format_import_diff(diff)}"
+    else:
+        lines = ["Импорт сезона завершён:"]
+        for (year, month), diff in sorted(diffs.items()):
+            total = len(diff['inserted']) + len(diff['updated']) + diff['unchanged']
+            lines.append(f"{RU_MONTHS[month-1]} {year}: событий {total} (+{len(diff['inserted'])}, "
+                         f"~{len(diff['updated'])}, −{len(diff['deleted'])})")
+        text = "\n".join(lines)
+    if skipped:
+        text += "\nПропущены листы (месяц не определён): " + ", ".join(skipped)
+    return text
+
+def import_events_from_excel(path: Path, year: int, month: int) -> tuple[int, dict | None, list[str]]:
+    rows, unknown_titles = parse_events_excel(path, year, month)
     # Если в таблице есть незнакомые названия — НЕ вносим изменения в БД.
     # Хендлер должен по очереди запросить у админа назначение сотрудников и создание записей спектаклей.
     if unknown_titles:
-        return (len(unknown_titles), 0, unknown_titles)
-
-    DBI.delete_events_for_month(year, month)
-    DBI.insert_events(rows)
-    return (0, len(rows), [])
\ No newline at end of file
+        return (len(unknown_titles), None, unknown_titles)
+    return (0, sync_month_events(year, month, rows), [])
@@ -0,0 +1,79 @@
+# services/flow.py
+"""Min-cost flow для планировщика: последовательные кратчайшие пути с потенциалами.
+
+Чистый Python, без внешних зависимостей. Рассчитан на графы размера «месяц
+театра» (сотни блоков × десятки сотрудников); все стоимости рёбер неотрицательны,
+поэтому начальные потенциалы нулевые и на каждом шаге хватает Дейкстры.
+"""
+import heapq
+
+
+class MinCostFlow:
+    def __init__(self, n: int):
+        self.n = n
+        # ребро: [куда, остаточная ёмкость, стоимость, индекс обратного ребра]
+        self.graph: list[list[list[int]]] = [[] for _ in range(n)]
+
+    def add_node(self) -> int:
+        self.graph.append([])
+        self.n += 1
+        return self.n - 1
+
+    def add_edge(self, u: int, v: int, cap: int, cost: int) -> tuple[int, int]:
+        """Добавляет ребро u→v; возвращает ссылку для :meth:`flow_on`."""
+        if cost < 0:
+            raise ValueError("отрицательная стоимость ребра")
+        self.graph[u].append([v, cap, cost, len(self.graph[v])])
+        self.graph[v].append([u, 0, -cost, len(self.graph[u]) - 1])
+        return u, len(self.graph[u]) - 1
+
+    def flow_on(self, edge: tuple[int, int]) -> int:
+        u, i = edge
+        v, _, _, rev = self.graph[u][i]
+        return self.graph[v][rev][1]
+
+    def solve(self, s: int, t: int, max_flow: int) -> tuple[int, int]:
+        """Пускает до max_flow единиц из s в t минимальной стоимости. Возвращает (поток, стоимость)."""
+        n, graph = self.n, self.graph
+        potential = [0] * n
+        flow = cost = 0
+        inf = float("inf")
+        while flow < max_flow:
+            dist = [inf] * n
+            prev: list[tuple[int, int] | None] = [None] * n
+            dist[s] = 0
+            heap = [(0, s)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                pu = potential[u]
+                for i, (v, cap, c, _) in enumerate(graph[u]):
+                    if cap <= 0:
+                        continue
+                    nd = d + c + pu - potential[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        prev[v] = (u, i)
+                        heapq.heappush(heap, (nd, v))
+            if dist[t] == inf:
+                break
+            for v in range(n):
+                if dist[v] < inf:
+                    potential[v] += dist[v]
+            push = max_flow - flow
+            v = t
+            while v != s:
+                u, i = prev[v]
+                push = min(push, graph[u][i][1])
+                v = u
+            v = t
+            while v != s:
+                u, i = prev[v]
+                e = graph[u][i]
+                e[1] -= push
+                graph[v][e[3]][1] += push
+                cost += push * e[2]
+                v = u
+            flow += push
+        return flow, cost
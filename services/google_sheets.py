@@ -2,15 +2,20 @@
 from __future__ import annotations
 import os
 import json
+import time
+import difflib
 import base64
+import threading
+from contextlib import contextmanager
 from typing import Optional, Tuple
 
-import pandas as pd
+from config import SHEETS_REQUESTS_PER_MINUTE
 
 # -------------------------
-# Нормализация DataFrame расписания
+# Колонки листа расписания
 # -------------------------
-_EXPECTED_ORDER = [
+# Тот же порядок, что у excel_export.MONTH_HEADER / month_schedule_rows
+SCHEDULE_HEADER = [
     "Дата",
     "Тип",
     "Название",
@@ -22,58 +27,10 @@ _EXPECTED_ORDER = [
     "Инфо",
 ]
 
-# Возможные внутренние названия -> русские заголовки
-_CANON_MAP = {
-    "date": "Дата",
-    "type": "Тип",
-    "title": "Название",
-    "time": "Время",
-    "location": "Локация",
-    "city": "Город",
-    "employee": "Сотрудник",
-    "duty_employee": "Дежурный сотрудник",
-    "info": "Инфо",
-}
-
-def _normalize_schedule_df(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Приводит колонки к ожидаемым русским заголовкам и гарантирует наличие
-    столбца «Дежурный сотрудник». Также старается сохранить порядок.
-    """
-    if df is None or df.empty:
-        # даже для пустого — вернём каркас с нужными заголовками
-        return pd.DataFrame(columns=_EXPECTED_ORDER)
-
-    # 1) Попробовать переименовать известные внутренние имена -> русские
-    rename_map = {}
-    lower_to_col = {str(c).strip().lower(): c for c in df.columns}
-
-    # Вариант 1: внутренние имена -> русские заголовки
-    for k_lower, ru in _CANON_MAP.items():
-        if k_lower in lower_to_col:
-            rename_map[lower_to_col[k_lower]] = ru
-
-    # Вариант 2: русские алиасы -> канонический русский заголовок
-    # Поддержим «Дежурный сотрудник» и короткий «Дежурный»
-    for alias in ("дежурный сотрудник", "дежурный"):
-        if alias in lower_to_col and "Дежурный сотрудник" not in rename_map.values():
-            rename_map[lower_to_col[alias]] = "Дежурный сотрудник"
-
-    df2 = df.rename(columns=rename_map)
-
-    # 2) Гарантировать наличие столбца «Дежурный сотрудник»
-    if "Дежурный сотрудник" not in df2.columns:
-        df2["Дежурный сотрудник"] = ""
-
-    # 3) Собрать финальный порядок: сначала ожидаемые, затем остальные
-    ordered_cols = [c for c in _EXPECTED_ORDER if c in df2.columns]
-    tail_cols = [c for c in df2.columns if c not in ordered_cols]
-    df2 = df2[ordered_cols + tail_cols]
-
-    return df2
-
 # gspread + creds
 import gspread
+import requests
+from gspread.utils import rowcol_to_a1
 from google.oauth2.service_account import Credentials
 
 
@@ -128,9 +85,191 @@ def _load_service_account_credentials() -> Credentials:
     )
 
 
+class TokenBucket:
+    """
+    Ведро токенов для квоты Sheets API: per_minute запросов в минуту, подряд —
+    не больше burst. acquire() блокирует вызывающий поток, пока не появится токен
+    (вызовы Sheets и так идут в потоках, не на event loop).
+    """
+
+    def __init__(self, per_minute: int, burst: int | None = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or max(1, per_minute // 6))
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Забирает токен; возвращает, сколько секунд пришлось ждать."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def is_retryable_sheets_error(e: BaseException) -> bool:
+    """Стоит ли повторять: квота (429), сбой на стороне Google (5xx) или сеть."""
+    if isinstance(e, gspread.exceptions.APIError):
+        code = getattr(e.response, "status_code", None)
+        return code == 429 or (code is not None and code >= 500)
+    return isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TimeoutError))
+
+
+def retry_after_seconds(e: BaseException) -> float | None:
+    """Retry-After из ответа Google, если он его прислал."""
+    response = getattr(e, "response", None)
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class SheetsClientManager:
+    """
+    Один gspread-клиент на процесс.
+
+    Учётка сервис-аккаунта читается и авторизуется один раз; токен обновляет
+    сама google-auth сессия, когда он истекает (лениво, перед запросом).
+    Открытые Spreadsheet/Worksheet кэшируются по (id) и (id, название листа),
+    поэтому повторные публикации и чтения не тратят запросы на метаданные.
+    Каждый вызов API считается в stats(): число, ошибки, суммарное и
+    максимальное время. Перед каждым вызовом берётся токен из limiter, чтобы
+    публикации и чтения вместе не выходили за минутную квоту.
+    Вызовы идут из потоков (asyncio.to_thread) — отсюда блокировка.
+    """
+
+    def __init__(self, limiter: TokenBucket | None = None):
+        self.limiter = limiter
+        self._limiter_wait = {"waits": 0, "ms": 0.0}
+        self._lock = threading.RLock()
+        self._client: gspread.Client | None = None
+        self._spreadsheets: dict[str, gspread.Spreadsheet] = {}
+        self._worksheets: dict[tuple[str, str], gspread.Worksheet] = {}
+        self._ops: dict[str, dict] = {}
+        self._handles = {"hits": 0, "misses": 0}
+
+    @contextmanager
+    def timed(self, op: str):
+        """Замеряет один вызов API под именем op. «Листа нет» ошибкой не считается."""
+        if self.limiter is not None and op != "authorize":
+            waited = self.limiter.acquire()
+            if waited:
+                with self._lock:
+                    self._limiter_wait["waits"] += 1
+                    self._limiter_wait["ms"] += waited * 1000
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        except gspread.exceptions.WorksheetNotFound:
+            ok = True
+            raise
+        finally:
+            ms = (time.perf_counter() - t0) * 1000
+            with self._lock:
+                st = self._ops.setdefault(op, {"calls": 0, "errors": 0, "ms": 0.0, "max_ms": 0.0})
+                st["calls"] += 1
+                st["errors"] += 0 if ok else 1
+                st["ms"] += ms
+                st["max_ms"] = max(st["max_ms"], ms)
+
+    def client(self) -> gspread.Client:
+        with self._lock:
+            if self._client is None:
+                with self.timed("authorize"):
+                    self._client = gspread.authorize(_load_service_account_credentials())
+            return self._client
+
+    def spreadsheet(self, key: str) -> gspread.Spreadsheet:
+        with self._lock:
+            sh = self._spreadsheets.get(key)
+            self._handles["hits" if sh is not None else "misses"] += 1
+        if sh is None:
+            gc = self.client()
+            with self.timed("open_by_key"):
+                sh = gc.open_by_key(key)
+            with self._lock:
+                sh = self._spreadsheets.setdefault(key, sh)
+        return sh
+
+    def worksheet(self, key: str, title: str) -> gspread.Worksheet:
+        """Лист по названию; WorksheetNotFound пробрасывается (и не кэшируется)."""
+        with self._lock:
+            ws = self._worksheets.get((key, title))
+            self._handles["hits" if ws is not None else "misses"] += 1
+        if ws is None:
+            sh = self.spreadsheet(key)
+            with self.timed("worksheet"):
+                ws = sh.worksheet(title)
+            with self._lock:
+                ws = self._worksheets.setdefault((key, title), ws)
+        return ws
+
+    def add_worksheet(self, key: str, title: str, rows: int, cols: int) -> gspread.Worksheet:
+        sh = self.spreadsheet(key)
+        with self.timed("add_worksheet"):
+            ws = sh.add_worksheet(title=title, rows=rows, cols=cols)
+        with self._lock:
+            self._worksheets[(key, title)] = ws
+        return ws
+
+    def forget_worksheet(self, key: str, title: str) -> None:
+        with self._lock:
+            self._worksheets.pop((key, title), None)
+
+    def call(self, key: str, title: str, op: str, fn):
+        """
+        fn(worksheet) с замером. Если закэшированный лист удалили или пересоздали
+        руками в таблице (API отвечает 400/404), handle забывается и вызов повторяется один раз.
+        """
+        ws = self.worksheet(key, title)
+        try:
+            with self.timed(op):
+                return fn(ws)
+        except gspread.exceptions.APIError as e:
+            if getattr(e.response, "status_code", None) not in (400, 404):
+                raise
+            self.forget_worksheet(key, title)
+        ws = self.worksheet(key, title)
+        with self.timed(op):
+            return fn(ws)
+
+    def reset(self) -> None:
+        """Забыть клиента и все handles (например, после смены учётки)."""
+        with self._lock:
+            self._client = None
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "authorized": self._client is not None,
+                "handles": {**self._handles, "spreadsheets": len(self._spreadsheets), "worksheets": len(self._worksheets)},
+                "ops": {op: dict(st) for op, st in self._ops.items()},
+                "limiter": dict(self._limiter_wait),
+            }
+
+
+SHEETS = SheetsClientManager(TokenBucket(SHEETS_REQUESTS_PER_MINUTE))
+
+
 def get_gspread_client() -> gspread.Client:
-    creds = _load_service_account_credentials()
-    return gspread.authorize(creds)
+    return SHEETS.client()
+
+
+def sheets_stats() -> dict:
+    return SHEETS.stats()
 
 
 # -------------------------
@@ -150,191 +289,243 @@ def _resolve_spreadsheet_id() -> str:
     raise RuntimeError("Не задан ID Google Sheet. Укажите GOOGLE_SHEET_ID (или GOOGLE_SHEETS_ID).")
 
 
-def _dataframe_to_rows(df: pd.DataFrame) -> list[list]:
+def schedule_sheet_rows(rows: list) -> list[list[str]]:
     """
-    Преобразует DataFrame в список списков с первой строкой заголовков.
-    Все значения приводятся к str (Google Sheets любит явные строки).
+    Ровно те строки, которые publish_schedule_to_sheets кладёт на лист: шапка
+    SCHEDULE_HEADER + строки событий в её порядке, все значения — str
+    (Google Sheets любит явные строки), None → "".
     """
-    headers = list(df.columns)
-    values = df.astype(object).where(pd.notnull(df), "").values.tolist()
-    # строка заголовков + данные
-    rows = [headers] + [[str(v) for v in row] for row in values]
-    return rows
-
+    return [list(SCHEDULE_HEADER)] + [["" if v is None else str(v) for v in r] for r in rows]
 
-def _delete_worksheet_if_exists(sh: gspread.Spreadsheet, title: str) -> None:
-    try:
-        ws = sh.worksheet(title)
-        sh.del_worksheet(ws)
-    except gspread.exceptions.WorksheetNotFound:
-        pass  # нет листа — ок
 
-
-def _create_worksheet(sh: gspread.Spreadsheet, title: str, rows: int = 1000, cols: int = 26) -> gspread.Worksheet:
+def _create_worksheet(spreadsheet_id: str, title: str, rows: int = 1000, cols: int = 26) -> gspread.Worksheet:
     # Ограничение на длину заголовка листа у Google: <= 100 символов
     if len(title) > 100:
         title = title[:100]
-    return sh.add_worksheet(title=title, rows=rows, cols=cols)
+    return SHEETS.add_worksheet(spreadsheet_id, title, rows=rows, cols=cols)
 
 
-# -------------------------
-# Публичная функция
-# -------------------------
-def publish_schedule_to_sheets(year: int, month: int, df: pd.DataFrame, sheet_id: Optional[str] = None) -> Tuple[str, str]:
-    """
-    Публикует расписание в Google Sheets.
+def _pad(row: list, width: int) -> tuple[str, ...]:
+    cells = ["" if c is None else str(c) for c in row[:width]]
+    return tuple(cells + [""] * (width - len(cells)))
 
-    - Открывает таблицу по ID (из env или аргумента).
-    - Лист называется 'Месяц Год' (например, 'Сентябрь 2025').
-    - Если лист уже есть — удаляет, создаёт заново.
-    - Заливает весь DataFrame.
 
-    Возвращает кортеж: (URL Google Sheet, title листа).
+def plan_sheet_update(sheet_id: int, old: list[list], new: list[list]) -> Optional[dict]:
     """
-    title = month_title_ru(year, month)
-    spreadsheet_id = sheet_id or _resolve_spreadsheet_id()
-
-    # Нормализуем DF, чтобы точно была колонка «Дежурный сотрудник»
-    df = _normalize_schedule_df(df)
-
-    gc = get_gspread_client()
-    sh = gc.open_by_key(spreadsheet_id)
-
-    # Пересоздаём лист
-    _delete_worksheet_if_exists(sh, title)
-    ws = _create_worksheet(sh, title, rows=max(len(df) + 10, 100), cols=max(len(df.columns) + 2, 10))
+    План обновления листа со значениями old до new (обе — с шапкой в первой строке).
 
-    # Загрузка данных
-    rows = _dataframe_to_rows(df)
-    # Google API допускает 5 млн ячеек — мы отправляем одним update()
-    ws.update("A1", rows, value_input_option="USER_ENTERED")
+    Строки данных выравниваются difflib'ом: совпавшие не трогаем, у строк на
+    месте пишем только изменившиеся ячейки, лишние удаляем, новые вставляем
+    (deleteDimension/insertDimension — фильтры, ссылки и заметки на остальных
+    строках остаются на своих строках). Колонки правее шапки не сравниваются.
 
+    Возвращает {"requests": [...], "ranges": [...], "updated", "inserted", "deleted", "cells"}
+    или None, если нужна полная перезапись: лист пуст или изменилась шапка.
+    """
+    if not old or not new:
+        return None
+    width = max(len(old[0]), len(new[0]))
+    if _pad(old[0], width) != _pad(new[0], width):
+        return None
+    width = len(new[0])
+    a = [_pad(r, width) for r in old[1:]]
+    b = [_pad(r, width) for r in new[1:]]
+
+    plan = {"requests": [], "ranges": [], "updated": 0, "inserted": 0, "deleted": 0, "cells": 0}
+    shift = 0  # сколько строк уже вставлено минус удалено выше текущего места
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        n, m = i2 - i1, j2 - j1
+        common = min(n, m)
+        # строки на месте: только изменившиеся ячейки (от первой до последней изменённой)
+        for k in range(common):
+            changed = [c for c in range(width) if a[i1 + k][c] != b[j1 + k][c]]
+            if not changed:
+                continue
+            lo, hi = changed[0], changed[-1]
+            row = j1 + k + 2  # номер строки на листе (1 — шапка), в итоговой раскладке
+            plan["ranges"].append({
+                "range": f"{rowcol_to_a1(row, lo + 1)}:{rowcol_to_a1(row, hi + 1)}",
+                "values": [list(b[j1 + k][lo:hi + 1])],
+            })
+            plan["updated"] += 1
+            plan["cells"] += hi - lo + 1
+        start = 1 + i1 + shift + common  # 0-based индекс строки листа сейчас
+        if m > n:
+            plan["requests"].append({"insertDimension": {
+                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start, "endIndex": start + m - n},
+                "inheritFromBefore": start > 1,
+            }})
+            plan["ranges"].append({
+                "range": f"{rowcol_to_a1(j1 + common + 2, 1)}:{rowcol_to_a1(j2 + 1, width)}",
+                "values": [list(r) for r in b[j1 + common:j2]],
+            })
+            plan["inserted"] += m - n
+            plan["cells"] += (m - n) * width
+        elif n > m:
+            plan["requests"].append({"deleteDimension": {
+                "range": {"sheetId": sheet_id, "dimension": "ROWS", "startIndex": start, "endIndex": start + n - m},
+            }})
+            plan["deleted"] += n - m
+        shift += m - n
+    return plan
+
+
+def _autoresize(sh: gspread.Spreadsheet, ws: gspread.Worksheet, width: int) -> None:
     # Небольшой бонус: автоширина колонок (через batch_update)
     try:
-        sh.batch_update({
-            "requests": [{
-                "autoResizeDimensions": {
-                    "dimensions": {
-                        "sheetId": ws.id,
-                        "dimension": "COLUMNS",
-                        "startIndex": 0,
-                        "endIndex": len(df.columns)
+        with SHEETS.timed("batch_update"):
+            sh.batch_update({
+                "requests": [{
+                    "autoResizeDimensions": {
+                        "dimensions": {
+                            "sheetId": ws.id,
+                            "dimension": "COLUMNS",
+                            "startIndex": 0,
+                            "endIndex": width
+                        }
                     }
-                }
-            }]
-        })
+                }]
+            })
     except Exception:
         # Автоширина — nice-to-have; молча глотаем ошибки
         pass
 
-    return sh.url, title
-
 
 # -------------------------
-# Чтение расписания на определённую дату
+# Публичная функция
 # -------------------------
-
-def fetch_schedule_for_date(day, sheet_id: Optional[str] = None) -> str:
-    """Читает расписание на конкретную дату из Google Sheets.
-
-    Использует тот же Spreadsheet, что и publish_schedule_to_sheets:
-    - ID берётся из env (через _resolve_spreadsheet_id) или аргументом sheet_id.
-    - Название листа берётся через month_title_ru(day.year, day.month), т.е. "Сентябрь 2025".
-
-    Ожидаемый формат листа:
-      - первая строка: заголовки
-      - есть колонка "Дата" (если нет — берём первую колонку)
+def publish_schedule_to_sheets(year: int, month: int, rows: list, sheet_id: Optional[str] = None) -> Tuple[str, str, dict]:
     """
-    from datetime import date as _date
+    Публикует расписание в Google Sheets.
 
-    if not isinstance(day, _date):
-        raise TypeError("day must be datetime.date")
+    rows — строки событий в порядке SCHEDULE_HEADER, как их отдаёт
+    excel_export.month_schedule_rows (без pandas и промежуточного XLSX).
 
+    - Открывает таблицу по ID (из env или аргумента).
+    - Лист называется 'Месяц Год' (например, 'Сентябрь 2025').
+    - Листа нет — создаёт и заливает целиком.
+    - Лист есть — читает его один раз и отправляет только разницу
+      (plan_sheet_update): вставки/удаления строк одним batch_update,
+      изменённые ячейки одним values batch_update. Лист не пересоздаётся.
+    - Изменилась шапка — перезаписывает значения целиком на том же листе.
+
+    Возвращает кортеж: (URL Google Sheet, title листа, сводка).
+    Сводка: {"mode": "created" | "rewritten" | "diff", "updated", "inserted", "deleted", "cells"}.
+    """
+    title = month_title_ru(year, month)
     spreadsheet_id = sheet_id or _resolve_spreadsheet_id()
-    title = month_title_ru(day.year, day.month)
 
-    gc = get_gspread_client()
-    sh = gc.open_by_key(spreadsheet_id)
+    rows = schedule_sheet_rows(rows)
+    width = len(rows[0])
 
+    sh = SHEETS.spreadsheet(spreadsheet_id)
     try:
-        ws = sh.worksheet(title)
+        old = SHEETS.call(spreadsheet_id, title, "get_all_values", lambda ws: ws.get_all_values())
     except gspread.exceptions.WorksheetNotFound:
-        return f"{day.strftime('%d.%m.%Y')}: графика на  {title} пока нет"
+        old = None
+
+    if old is None:
+        ws = _create_worksheet(spreadsheet_id, title, rows=max(len(rows) + 10, 100), cols=max(width + 2, 10))
+        # Google API допускает 5 млн ячеек — мы отправляем одним update()
+        with SHEETS.timed("update"):
+            ws.update("A1", rows, value_input_option="USER_ENTERED")
+        _autoresize(sh, ws, width)
+        return sh.url, title, {"mode": "created", "updated": 0, "inserted": len(rows) - 1, "deleted": 0, "cells": len(rows) * width}
+
+    ws = SHEETS.worksheet(spreadsheet_id, title)
+    plan = plan_sheet_update(ws.id, old, rows)
+    if plan is None:
+        # Шапка другая — раскладка колонок поменялась, построчная разница не имеет смысла
+        with SHEETS.timed("clear"):
+            ws.clear()
+        with SHEETS.timed("resize"):
+            ws.resize(rows=max(len(rows) + 10, 100), cols=max(width + 2, 10))
+        with SHEETS.timed("update"):
+            ws.update("A1", rows, value_input_option="USER_ENTERED")
+        _autoresize(sh, ws, width)
+        return sh.url, title, {"mode": "rewritten", "updated": 0, "inserted": len(rows) - 1,
+                               "deleted": max(len(old) - 1, 0), "cells": len(rows) * width}
+
+    if plan["requests"]:
+        with SHEETS.timed("batch_update"):
+            sh.batch_update({"requests": plan["requests"]})
+    if plan["ranges"]:
+        with SHEETS.timed("values_batch_update"):
+            ws.batch_update(plan["ranges"], value_input_option="USER_ENTERED")
+    return sh.url, title, {"mode": "diff", **{k: plan[k] for k in ("updated", "inserted", "deleted", "cells")}}
+
+
+def format_publish_summary(summary: dict) -> str:
+    if summary["mode"] == "created":
+        return f"Лист создан: {summary['inserted']} строк."
+    if summary["mode"] == "rewritten":
+        return f"Шапка изменилась — лист перезаписан: {summary['inserted']} строк."
+    if not (summary["updated"] or summary["inserted"] or summary["deleted"]):
+        return "Изменений нет — лист не тронут."
+    return (f"Обновлено строк: {summary['updated']}, добавлено: {summary['inserted']}, "
+            f"удалено: {summary['deleted']} (ячеек записано: {summary['cells']}).")
 
-    values = ws.get_all_values()
-    if not values:
-        return f"{day.strftime('%d.%m.%Y')}: нет данных"
 
-    header = values[0]
-    rows = values[1:]
+# -------------------------
+# Чтение расписания на определённую дату
+# -------------------------
 
-    # индекс колонки даты
-    date_idx = 0
-    for i, h in enumerate(header):
-        hh = (h or '').strip().lower()
-        if hh in {"дата", "date", "day"}:
-            date_idx = i
-            break
-
-    target_a = day.strftime('%d.%m.%Y')
-    target_b = day.strftime('%Y-%m-%d')
-
-    # Поддержим даты, записанные словами: "2 января 2026"
-    _ru_months = {
-        "января": 1,
-        "февраля": 2,
-        "марта": 3,
-        "апреля": 4,
-        "мая": 5,
-        "июня": 6,
-        "июля": 7,
-        "августа": 8,
-        "сентября": 9,
-        "октября": 10,
-        "ноября": 11,
-        "декабря": 12,
-    }
-
-    def _cell_matches_day(cell_text: str) -> bool:
-        s = (cell_text or '').strip()
-        if not s:
-            return False
-
-        # прямые форматы
-        if s in {target_a, target_b}:
-            return True
-
-        # попробуем распарсить dd.mm.yyyy
-        try:
-            if len(s) >= 8 and '.' in s:
-                dd, mm, yy = s.split('.', 2)
-                if dd.isdigit() and mm.isdigit() and yy.isdigit():
-                    if int(yy) == day.year and int(mm) == day.month and int(dd) == day.day:
-                        return True
-        except Exception:
-            pass
+# Даты словами: "2 января 2026"
+_RU_MONTHS_GEN = {
+    "января": 1, "февраля": 2, "марта": 3, "апреля": 4, "мая": 5, "июня": 6,
+    "июля": 7, "августа": 8, "сентября": 9, "октября": 10, "ноября": 11, "декабря": 12,
+}
+
+
+def parse_sheet_date(cell_text: str):
+    """Дата из ячейки «Дата»: dd.mm.yyyy, yyyy-mm-dd или «2 января 2026». Иначе None."""
+    from datetime import date as _date
 
+    s = (cell_text or '').strip()
+    if not s:
+        return None
+    try:
+        # dd.mm.yyyy
+        if len(s) >= 8 and '.' in s:
+            dd, mm, yy = s.split('.', 2)
+            if dd.isdigit() and mm.isdigit() and yy.isdigit():
+                return _date(int(yy), int(mm), int(dd))
+        # yyyy-mm-dd (в том числе с хвостом времени из Excel)
+        if len(s) >= 10 and s[4] == '-' and s[7] == '-' and s[:4].isdigit():
+            return _date(int(s[:4]), int(s[5:7]), int(s[8:10]))
         # формат "2 января 2026" (и похожие)
-        s_low = ' '.join(s.lower().split())
-        parts = s_low.split(' ')
+        parts = ' '.join(s.lower().split()).split(' ')
         if len(parts) >= 3 and parts[0].isdigit() and parts[2].isdigit():
-            dd = int(parts[0])
-            yy = int(parts[2])
-            mm = _ru_months.get(parts[1])
-            if mm and yy == day.year and mm == day.month and dd == day.day:
-                return True
+            mm = _RU_MONTHS_GEN.get(parts[1])
+            if mm:
+                return _date(int(parts[2]), mm, int(parts[0]))
+    except ValueError:
+        pass
+    return None
 
-        return False
 
-    matched = []
-    for r in rows:
-        if date_idx >= len(r):
-            continue
-        cell = (r[date_idx] or '').strip()
-        if _cell_matches_day(cell):
-            matched.append(r)
+def sheet_date_index(header: list[str]) -> int:
+    """Индекс колонки даты ("Дата"/"date"/"day"); если такой нет — первая колонка."""
+    for i, h in enumerate(header):
+        if (h or '').strip().lower() in {"дата", "date", "day"}:
+            return i
+    return 0
+
 
-    if not matched:
+def fetch_month_values(year: int, month: int, sheet_id: Optional[str] = None) -> Optional[list[list[str]]]:
+    """Все значения листа 'Месяц Год' (первая строка — заголовки); None, если листа нет."""
+    spreadsheet_id = sheet_id or _resolve_spreadsheet_id()
+    try:
+        return SHEETS.call(spreadsheet_id, month_title_ru(year, month), "get_all_values", lambda ws: ws.get_all_values())
+    except gspread.exceptions.WorksheetNotFound:
+        return None
+
+
+def format_day_schedule(day, header: list[str], rows: list[list[str]]) -> str:
+    """Текст для «Посмотреть расписание»: события дня (rows — уже отобранные строки листа)."""
+    if not rows:
         return f"{day.strftime('%d.%m.%Y')}\nНет событий"
 
     out_lines = [day.strftime('%d.%m.%Y')]
@@ -353,7 +544,7 @@ def fetch_schedule_for_date(day, sheet_id: Optional[str] = None) -> str:
     idx_duty = col_idx('Дежурный сотрудник')
     idx_info = col_idx('Инфо')
 
-    for r in matched:
+    for r in rows:
         if idx_type is not None and idx_type < len(r) and r[idx_type]:
             out_lines.append(f"Тип: {r[idx_type]}")
 
@@ -376,4 +567,35 @@ def fetch_schedule_for_date(day, sheet_id: Optional[str] = None) -> str:
 
         out_lines.append("")  # пустая строка между событиями
 
-    return "\n".join(out_lines).rstrip()
\ No newline at end of file
+    return "\n".join(out_lines).rstrip()
+
+
+def fetch_schedule_for_date(day, sheet_id: Optional[str] = None) -> str:
+    """Читает расписание на конкретную дату прямо из Google Sheets.
+
+    Использует тот же Spreadsheet, что и publish_schedule_to_sheets:
+    - ID берётся из env (через _resolve_spreadsheet_id) или аргументом sheet_id.
+    - Название листа берётся через month_title_ru(day.year, day.month), т.е. "Сентябрь 2025".
+
+    Ожидаемый формат листа:
+      - первая строка: заголовки
+      - есть колонка "Дата" (если нет — берём первую колонку)
+
+    Бот отвечает из локальной копии (services.schedule_replica); эта функция —
+    запасной путь и ручная проверка.
+    """
+    from datetime import date as _date
+
+    if not isinstance(day, _date):
+        raise TypeError("day must be datetime.date")
+
+    values = fetch_month_values(day.year, day.month, sheet_id)
+    if values is None:
+        return f"{day.strftime('%d.%m.%Y')}: графика на  {month_title_ru(day.year, day.month)} пока нет"
+    if not values:
+        return f"{day.strftime('%d.%m.%Y')}: нет данных"
+
+    header, rows = values[0], values[1:]
+    date_idx = sheet_date_index(header)
+    matched = [r for r in rows if date_idx < len(r) and parse_sheet_date(r[date_idx]) == day]
+    return format_day_schedule(day, header, matched)
@@ -0,0 +1,156 @@
+# services/pdf_extract.py
+"""Локальный разбор PDF-репертуара без LLM.
+
+pdfminer раскладывает страницу на текстовые строки с координатами; ячейки
+таблицы становятся отдельными строками (между колонками большой зазор), их
+группируем по вертикали в строки таблицы и раскладываем по смыслу: день месяца,
+время, название, площадка. Правила те же, что в SYSTEM_PROMPT для GPT: тип по
+названию, «/» — несколько событий в один день, Поварская — это Москва.
+
+extract_schedule_pdf возвращает строки в порядке CSV_HEADERS и уверенность
+0..1; при низкой уверенности вызывающий отправляет файл в GPT, как раньше.
+"""
+from __future__ import annotations
+import re
+from pathlib import Path
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams, LTTextContainer, LTTextLine
+
+_MONTHS_GEN = ("января", "февраля", "марта", "апреля", "мая", "июня",
+               "июля", "августа", "сентября", "октября", "ноября", "декабря")
+_MONTH_ROOTS = ("январ", "феврал", "март", "апрел", "ма[йя]", "июн", "июл", "август", "сентябр", "октябр", "ноябр", "декабр")
+_MONTH_YEAR_RE = re.compile(
+    r"(?:" + "|".join(f"(?P<m{i}>{root})" for i, root in enumerate(_MONTH_ROOTS, start=1)) + r")[а-я]*\s*(?P<year>20\d\d)",
+    re.IGNORECASE,
+)
+_WEEKDAYS = r"(?:пн|вт|ср|чт|пт|сб|вс|понедельник|вторник|среда|четверг|пятница|суббота|воскресенье)"
+_DAY_RE = re.compile(
+    rf"^(\d{{1,2}})(?:\s*[./]\s*\d{{1,2}}(?:[./]\d{{2,4}})?|\s+(?:{'|'.join(_MONTHS_GEN)}))?(?:\s*[.,]?\s*{_WEEKDAYS}\.?)?$",
+    re.IGNORECASE,
+)
+_WEEKDAY_RE = re.compile(rf"^{_WEEKDAYS}\.?$", re.IGNORECASE)
+_TIME_RE = re.compile(r"^(\d{1,2})[:.](\d{2})(?:\s*[-–—]\s*\d{1,2}[:.]\d{2})?$")
+_HEADER_WORDS = {"дата", "число", "спектакль", "событие", "название", "время", "место", "площадка", "локация", "день"}
+
+
+def _cells(path: Path) -> list[tuple[int, float, float, float, str]]:
+    """Текстовые ячейки: (страница, x0, центр по y сверху, высота, текст)."""
+    out = []
+    laparams = LAParams(line_margin=0.3, char_margin=1.5)
+    for page_no, page in enumerate(extract_pages(str(path), laparams=laparams)):
+        for box in page:
+            if not isinstance(box, LTTextContainer):
+                continue
+            for line in box:
+                if not isinstance(line, LTTextLine):
+                    continue
+                text = " ".join(line.get_text().split())
+                if text:
+                    out.append((page_no, line.x0, page.height - (line.y0 + line.y1) / 2, line.height, text))
+    return out
+
+
+def _table_rows(cells: list[tuple[int, float, float, float, str]]) -> list[list[tuple[float, str]]]:
+    """Группирует ячейки в строки таблицы по странице и вертикали, внутри строки — слева направо."""
+    rows: list[list[tuple[float, str]]] = []
+    last = None
+    for page_no, x0, yc, h, text in sorted(cells, key=lambda c: (c[0], c[2], c[1])):
+        if last is not None and last[0] == page_no and abs(yc - last[1]) <= max(h, last[2]) * 0.5:
+            rows[-1].append((x0, text))
+        else:
+            rows.append([(x0, text)])
+            last = (page_no, yc, h)
+    return [sorted(r) for r in rows]
+
+
+def _split_slash(title: str, location: str) -> list[tuple[str, str]]:
+    titles = [t.strip() for t in title.split("/")] if "/" in title else [title]
+    locations = [loc.strip() for loc in location.split("/")] if "/" in location else [location]
+    if len(titles) > 1 and len(locations) > 1:
+        return list(zip(titles, locations + [locations[-1]] * (len(titles) - len(locations))))
+    if len(titles) > 1:
+        return [(t, location) for t in titles]
+    return [(title, loc) for loc in locations]
+
+
+def _event_type(title: str) -> str:
+    low = title.lower()
+    if "репетиция" in low:
+        return "Репетиция"
+    if "монтаж" in low:
+        return "Монтаж"
+    return "Спектакль"
+
+
+def _location_city(location: str) -> tuple[str, str]:
+    loc = location.strip()
+    if loc.isupper():
+        loc = loc.capitalize()
+    if not loc:
+        return "", ""
+    if loc.lower() == "поварская":
+        return loc, "Москва"
+    # на выезде в колонке места театр пишет сам город
+    return loc, loc
+
+
+def extract_schedule_pdf(path: Path, year: int | None = None, month: int | None = None) -> tuple[list[list[str]], float]:
+    """
+    Разбирает PDF-репертуар. Возвращает (строки в порядке CSV_HEADERS, уверенность 0..1).
+    Месяц и год берутся из текста («Сентябрь 2025»), иначе из аргументов; без них — уверенность 0.
+    """
+    cells = _cells(path)
+    full_text = " ".join(c[4] for c in cells)
+    m = _MONTH_YEAR_RE.search(full_text)
+    if m:
+        month = int(next(k for k, v in m.groupdict().items() if v and k != "year")[1:])
+        year = int(m.group("year"))
+    if not (year and month):
+        return [], 0.0
+
+    events: list[list[str]] = []
+    day = day_x = None
+    parsed = noise = 0
+    backwards = False
+    for row in _table_rows(cells):
+        row = [(x, t) for x, t in row if not _WEEKDAY_RE.match(t)]
+        if not row:
+            continue
+        x0, first = row[0]
+        dm = _DAY_RE.match(first)
+        # день — только в колонке дат: спектакль «12» в колонке названий днём не считается
+        row_day = int(dm.group(1)) if dm and 1 <= int(dm.group(1)) <= 31 and (day_x is None or abs(x0 - day_x) < 20) else None
+        texts = [t for _, t in row]
+        if row_day is not None:
+            texts = texts[1:]
+            if day is not None and row_day < day:
+                backwards = True
+            day, day_x = row_day, x0 if day_x is None else day_x
+        elif day is None:
+            continue  # шапка документа до первой строки с датой
+        times = [t for t in texts if _TIME_RE.match(t)]
+        rest = [t for t in texts if not _TIME_RE.match(t)]
+        # строка без даты — продолжение дня, только если в ней есть время; иначе это подписи и прочий текст
+        if not rest or (row_day is None and not times):
+            if row_day is None:
+                noise += 1
+            continue
+        if row_day is None and sum(t.lower().strip(" :") in _HEADER_WORDS for t in rest) >= 2:
+            continue  # повтор шапки таблицы на новой странице
+        tm = _TIME_RE.match(times[0]) if times else None
+        time_str = f"{int(tm.group(1)):02d}:{tm.group(2)}" if tm else ""
+        title, location = rest[0], " ".join(rest[1:])
+        for t, loc in _split_slash(title, location):
+            loc, city = _location_city(loc)
+            events.append([f"{day} {_MONTHS_GEN[month-1]} {year}", _event_type(t), t, time_str, loc, city, "", "", ""])
+        parsed += 1
+
+    if not events:
+        return [], 0.0
+    confidence = parsed / (parsed + noise)
+    if backwards:
+        confidence *= 0.5
+    if parsed < 3:
+        confidence = min(confidence, 0.5)
+    return events, round(confidence, 3)
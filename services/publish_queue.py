@@ -0,0 +1,132 @@
+# services/publish_queue.py
+"""Фоновая очередь публикаций в Google Sheets.
+
+Раньше публикация шла прямо в обработчике нажатия: медленный или упёршийся в
+квоту Sheets держал бота, а любой 429/5xx заканчивался «Ошибкой публикации».
+Теперь обработчик только ставит задачу в publish_jobs (переживает рестарт),
+а publish_worker, запущенный из main.py, выполняет их по одной:
+
+- повторные публикации одного месяца, пока задача ждёт, склеиваются в одну —
+  строки месяца читаются из БД в момент запуска, так что уйдёт последняя версия;
+- 429/5xx и сетевые сбои повторяются с экспоненциальной паузой (с разбросом,
+  Retry-After от Google — как нижняя граница), до PUBLISH_MAX_ATTEMPTS попыток;
+- сами вызовы Sheets ограничены ведром токенов в google_sheets.SHEETS;
+- админ получает сообщения: в очереди → публикую → готово / повтор / ошибка.
+"""
+from __future__ import annotations
+import asyncio
+import random
+from datetime import datetime, timedelta, UTC
+
+from config import RU_MONTHS, PUBLISH_MAX_ATTEMPTS, PUBLISH_BACKOFF_BASE_SECONDS, PUBLISH_BACKOFF_MAX_SECONDS
+from db import ADBI
+from services.excel_export import month_schedule_rows
+from services.google_sheets import (
+    publish_schedule_to_sheets, schedule_sheet_rows, format_publish_summary,
+    is_retryable_sheets_error, retry_after_seconds,
+)
+from services.schedule_replica import store_month
+
+_wakeup: asyncio.Event | None = None
+
+
+def _event() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+async def enqueue_publish(year: int, month: int, chat_id: int | None) -> tuple[int, bool]:
+    """Ставит месяц в очередь и будит воркер. (id задачи, склеена ли с уже ждущей)."""
+    job_id, coalesced = await ADBI.enqueue_publish_job(year, month, chat_id)
+    _event().set()
+    return job_id, coalesced
+
+
+def backoff_seconds(attempt: int, retry_after: float | None = None) -> float:
+    """Пауза перед попыткой attempt+1: base·2^(attempt-1) с разбросом ±20%, не больше max."""
+    delay = min(PUBLISH_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), PUBLISH_BACKOFF_MAX_SECONDS)
+    delay *= random.uniform(0.8, 1.2)
+    return max(delay, retry_after or 0)
+
+
+async def _notify(bot, chat_id: int | None, text: str) -> None:
+    if not chat_id:
+        return
+    try:
+        await bot.send_message(chat_id, text)
+    except Exception:
+        pass
+
+
+async def _run_job(bot, job: dict) -> None:
+    year, month, chat_id, attempt = job["year"], job["month"], job["chat_id"], job["attempts"]
+    label = f"{RU_MONTHS[month-1]} {year}"
+    await _notify(bot, chat_id, f"Публикую {label}…" if attempt == 1 else f"Публикую {label}… (попытка {attempt} из {PUBLISH_MAX_ATTEMPTS})")
+
+    rows = await ADBI.run_read(month_schedule_rows, year, month)
+    try:
+        sheet_url, sheet_title, summary = await asyncio.to_thread(publish_schedule_to_sheets, year, month, rows)
+    except Exception as e:
+        if is_retryable_sheets_error(e) and attempt < PUBLISH_MAX_ATTEMPTS:
+            delay = backoff_seconds(attempt, retry_after_seconds(e))
+            due = (datetime.now(UTC) + timedelta(seconds=delay)).isoformat()
+            if await ADBI.retry_publish_job(job["id"], due, repr(e)):
+                await _notify(bot, chat_id, f"Google Sheets не ответил ({e}). Повторю через {delay:.0f} с.")
+            else:
+                await _notify(bot, chat_id, f"Google Sheets не ответил ({e}). {label} уже снова в очереди — опубликую оттуда.")
+            return
+        await ADBI.finish_publish_job(job["id"], "failed", repr(e))
+        await _notify(bot, chat_id, f"Ошибка публикации в Google Sheets: {e}")
+        return
+
+    await ADBI.finish_publish_job(job["id"], "done")
+    # «Посмотреть расписание» дальше читает опубликованное из локальной копии
+    try:
+        await store_month(year, month, schedule_sheet_rows(rows))
+    except Exception as e:
+        print(f"[publish] replica {year}-{month:02d} not updated: {e!r}", flush=True)
+
+    caption = f"Опубликовано: {label} — {len(rows)} событ."
+    caption += "\n" + format_publish_summary(summary)
+    if sheet_url:
+        caption += f"\nЛист: {sheet_title} — {sheet_url}"
+    await _notify(bot, chat_id, caption)
+
+
+async def _idle_timeout() -> float:
+    """Сколько спать до ближайшей отложенной попытки (enqueue разбудит раньше)."""
+    due = await ADBI.next_publish_due()
+    if not due:
+        return 60.0
+    left = (datetime.fromisoformat(due) - datetime.now(UTC)).total_seconds()
+    return min(max(left, 0.5), 60.0)
+
+
+async def publish_worker(bot):
+    """Фоновая задача: выполняет publish_jobs по одной, пока бот работает."""
+    await ADBI.requeue_interrupted_publish_jobs()
+    wakeup = _event()
+    while True:
+        try:
+            wakeup.clear()
+            job = await ADBI.claim_publish_job()
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), await _idle_timeout())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await _run_job(bot, job)
+            except asyncio.CancelledError:
+                raise  # останов бота: задача останется running и вернётся в очередь при старте
+            except Exception as e:
+                await ADBI.finish_publish_job(job["id"], "failed", repr(e))
+                await _notify(bot, job["chat_id"], f"Ошибка публикации: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[publish] worker error: {e!r}", flush=True)
+            await asyncio.sleep(5)
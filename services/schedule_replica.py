@@ -0,0 +1,84 @@
+# services/schedule_replica.py
+"""Локальная копия опубликованного расписания для «Посмотреть расписание».
+
+Раньше каждое нажатие на день в календаре авторизовалось в Google, скачивало
+весь лист месяца и перебирало строки — синхронно, на event loop. Теперь лист
+месяца хранится в БД (schedule_replica*, строки проиндексированы по дню):
+пишется при публикации, а если копия старше SCHEDULE_REPLICA_TTL_MINUTES —
+отдаётся как есть и перечитывается из Sheets в фоне (правки руками в таблице
+тоже подтянутся). В Sheets синхронно идём только за месяцем, которого ещё нет.
+"""
+from __future__ import annotations
+import asyncio
+from datetime import date, datetime, timedelta, UTC
+
+from config import SCHEDULE_REPLICA_TTL_MINUTES
+from db import ADBI
+from services.google_sheets import (
+    fetch_month_values, format_day_schedule, month_title_ru, parse_sheet_date, sheet_date_index,
+)
+
+# перечитывание месяца из Sheets, не больше одного на месяц одновременно
+_inflight: dict[tuple[int, int], asyncio.Task] = {}
+
+
+def replica_rows(header: list[str], rows: list[list]) -> list[tuple[str | None, list[str]]]:
+    """Строки листа с днём ('YYYY-MM-DD') из колонки даты; нераспознанная дата — None."""
+    idx = sheet_date_index(header)
+    out = []
+    for r in rows:
+        d = parse_sheet_date(str(r[idx])) if idx < len(r) else None
+        out.append((d.isoformat() if d else None, ["" if c is None else str(c) for c in r]))
+    return out
+
+
+async def store_month(year: int, month: int, values: list[list] | None) -> None:
+    """Записывает лист месяца (первая строка — заголовки) в копию. None/пустой — «графика нет»."""
+    header = [str(h) for h in values[0]] if values else []
+    rows = replica_rows(header, values[1:]) if values else []
+    await ADBI.replace_schedule_replica(year, month, header, rows)
+
+
+async def _pull_month(year: int, month: int) -> None:
+    values = await asyncio.to_thread(fetch_month_values, year, month)
+    await store_month(year, month, values)
+
+
+def _done(key: tuple[int, int], task: asyncio.Task) -> None:
+    _inflight.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"[replica] refresh {key[0]}-{key[1]:02d} failed: {task.exception()!r}", flush=True)
+
+
+def refresh_month(year: int, month: int) -> asyncio.Task:
+    """Перечитывает месяц из Sheets; параллельные запросы одного месяца ждут одну задачу."""
+    key = (year, month)
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_pull_month(year, month))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _done(key, t))
+    return task
+
+
+def _is_stale(synced_at: str) -> bool:
+    try:
+        synced = datetime.fromisoformat(synced_at)
+    except ValueError:
+        return True
+    return datetime.now(UTC) - synced > timedelta(minutes=SCHEDULE_REPLICA_TTL_MINUTES)
+
+
+async def day_schedule_text(day: date) -> str:
+    """Текст расписания на день из локальной копии (Sheets — только если месяца в копии нет)."""
+    cached = await ADBI.get_schedule_replica_day(day.isoformat())
+    if cached is None:
+        await refresh_month(day.year, day.month)
+        cached = await ADBI.get_schedule_replica_day(day.isoformat())
+    elif _is_stale(cached[2]):
+        refresh_month(day.year, day.month)  # ответим сейчас из копии, обновим в фоне
+
+    header, rows, _ = cached
+    if not header:
+        return f"{day.strftime('%d.%m.%Y')}: графика на  {month_title_ru(day.year, day.month)} пока нет"
+    return format_day_schedule(day, header, rows)
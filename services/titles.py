@@ -0,0 +1,75 @@
+# services/titles.py
+"""Нормализация названий спектаклей и нечёткий поиск по ним.
+
+Театр пишет одно и то же по-разному: «Гамлет», ГАМЛЕТ, Репетиция «Гамлет»,
+Гамлет. (с опечаткой). normalize_title сводит такие варианты к одному ключу,
+TitleIndex ищет по триграммам ближайшие известные спектакли, а подтверждённые
+админом варианты хранятся в spectacle_aliases и дальше узнаются сразу.
+"""
+import re
+from db import DBI
+
+_GUILLEMETS_RE = re.compile(r"«([^»]+)»")
+_PREFIX_RE = re.compile(r"^(?:генеральная репетиция|репетиция|прогон|монтаж|демонтаж|спектакль|премьера)\b\s*")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_title(title: str | None) -> str:
+    """Ключ названия: без регистра, кавычек, пунктуации, различия е/ё и служебных
+    приставок вроде «Репетиция»; если название в «ёлочках» — берётся то, что внутри."""
+    s = (title or "").lower().replace("ё", "е")
+    m = _GUILLEMETS_RE.search(s)
+    if m:
+        s = m.group(1)
+    s = " ".join(_PUNCT_RE.sub(" ", s).split())
+    return _PREFIX_RE.sub("", s)
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Триграммный индекс по названиям спектаклей (плюс сохранённые псевдонимы)."""
+
+    def __init__(self, titles: list[tuple[int, str]], aliases: list[tuple[str, int]] = ()):
+        self.titles = dict(titles)
+        self.exact: dict[str, int] = {}
+        for sid, title in titles:
+            self.exact.setdefault(normalize_title(title), sid)
+        for alias, sid in aliases:
+            if sid in self.titles:
+                self.exact.setdefault(alias, sid)
+        self._grams: dict[int, set[str]] = {sid: _trigrams(normalize_title(t)) for sid, t in titles}
+        self._postings: dict[str, list[int]] = {}
+        for sid, grams in self._grams.items():
+            for g in grams:
+                self._postings.setdefault(g, []).append(sid)
+
+    def resolve(self, title: str | None) -> int | None:
+        """id спектакля для точного (после нормализации) совпадения или псевдонима."""
+        return self.exact.get(normalize_title(title))
+
+    def candidates(self, title: str | None, limit: int = 3, min_score: float = 0.35) -> list[tuple[int, str, float]]:
+        """Ближайшие спектакли [(id, title, score)] по коэффициенту Дайса на триграммах."""
+        grams = _trigrams(normalize_title(title))
+        shared: dict[int, int] = {}
+        for g in grams:
+            for sid in self._postings.get(g, ()):
+                shared[sid] = shared.get(sid, 0) + 1
+        scored = [
+            (sid, self.titles[sid], 2 * n / (len(grams) + len(self._grams[sid])))
+            for sid, n in shared.items()
+        ]
+        scored = [c for c in scored if c[2] >= min_score]
+        scored.sort(key=lambda c: (-c[2], c[1]))
+        return scored[:limit]
+
+
+def load_title_index() -> TitleIndex:
+    return TitleIndex(DBI.list_spectacles_with_ids(), DBI.list_spectacle_aliases())
+
+
+def title_candidates(title: str, limit: int = 3) -> list[tuple[int, str, float]]:
+    return load_title_index().candidates(title, limit)